@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Benchmark: cold-start import time per entry point
+
+Every measurement runs in a fresh interpreter, so module caches of the
+benchmark itself do not interfere. For each entry point it reports the
+median import time (from python -X importtime), the median wall time of
+'<script> --help' minus a bare interpreter start, and which of the heavy
+packages (pyvisa, gpiozero, numpy) the import pulled in.
+
+Usage:
+    python3 benchmarks/bench_import.py [--repeat 5]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+HEAVY = ('pyvisa', 'gpiozero', 'numpy')
+
+# (module, directory, script accepts --help without hardware)
+ENTRY_POINTS = [
+    ('power', ROOT, True),
+    ('power_mp', ROOT, False),
+    ('channel_scheduler', ROOT, True),
+    ('command_queue', ROOT, False),
+    ('cycle_config', ROOT, True),
+    ('scpi_session', ROOT, True),
+    ('settle_calibration', ROOT, True),
+    ('fastlog', ROOT, True),
+    ('ngp800_control', os.path.join(ROOT, 'reference'), False),
+    ('ngp800_simple_control', os.path.join(ROOT, 'reference'), True),
+]
+
+
+def run(args, cwd):
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable] + args, cwd=cwd, capture_output=True,
+                            text=True)
+    return time.perf_counter() - start, result
+
+
+def import_time(module, cwd):
+    """Cumulative import time in ms and the heavy packages loaded"""
+    code = (f"import sys, {module}; "
+            f"print(','.join(m for m in {HEAVY!r} if m in sys.modules))")
+    _, result = run(['-X', 'importtime', '-c', code], cwd)
+    if result.returncode:
+        return None, result.stderr.strip().splitlines()[-1]
+    for line in reversed(result.stderr.splitlines()):
+        fields = line.split('|')
+        if len(fields) == 3 and fields[2].strip() == module:
+            return int(fields[1]) / 1000, result.stdout.strip()
+    return None, 'module not found in -X importtime output'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Cold-start import benchmark')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per entry point')
+    args = parser.parse_args()
+
+    baseline = statistics.median(run(['-c', 'pass'], ROOT)[0]
+                                 for _ in range(args.repeat))
+    print(f"Interpreter start: {baseline * 1000:.1f} ms (subtracted from --help)\n")
+    print(f"{'Entry point':<24} {'import':>9} {'--help':>9}  heavy modules loaded")
+    for module, cwd, has_help in ENTRY_POINTS:
+        times = []
+        heavy = ''
+        for _ in range(args.repeat):
+            ms, heavy = import_time(module, cwd)
+            if ms is None:
+                break
+            times.append(ms)
+        if not times:
+            print(f"{module:<24} {'failed':>9}            {heavy}")
+            continue
+        help_time = '-'
+        if has_help:
+            wall = statistics.median(run([f'{module}.py', '--help'], cwd)[0]
+                                     for _ in range(args.repeat))
+            help_time = f"{(wall - baseline) * 1000:.1f}ms"
+        print(f"{module:<24} {statistics.median(times):>7.1f}ms {help_time:>9}  "
+              f"{heavy or '-'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: measurement reply parsing
+
+Compares the read_measurement() path (strip/split/float per channel)
+with the bulk parsers in scpi_parse.py, for a sweep over N channels:
+
+    text    - per-channel 'v,i' replies parsed with split() and float()
+    ascii   - one chained reply parsed with parse_ascii_values()
+    binary  - one chained REAL,32 reply parsed with parse_read_blocks()
+
+A second section runs full sweeps against the offline simulator with a
+simulated per-message latency, to show the round-trip saving of chained
+queries.
+
+Usage:
+    python3 benchmarks/bench_parse.py [--channels 4] [--number 20000] [--latency 0.0005]
+"""
+
+import argparse
+import os
+import struct
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import numpy as np
+
+from scpi_parse import parse_ascii_values, parse_read_blocks
+
+
+def legacy_parse(responses):
+    """The read_measurement() path, once per channel"""
+    results = []
+    for response in responses:
+        values = response.strip().split(',')
+        results.append((float(values[0]), float(values[1])))
+    return results
+
+
+def report(name, seconds, number, baseline=None):
+    per_call = seconds / number * 1e6
+    ratio = f"  ({baseline / seconds:.1f}x)" if baseline else ''
+    print(f"  {name:<28} {per_call:8.2f} us/sweep{ratio}")
+
+
+def bench_parsing(channels, number):
+    readings = [(25.0 + ch * 0.001, 0.1 + ch * 0.0001) for ch in range(channels)]
+    text_replies = [f'{v:.4f},{i:.6f}\n' for v, i in readings]
+    ascii_reply = ';'.join(f'{v:.4f},{i:.6f}' for v, i in readings).encode() + b'\n'
+    binary_reply = b';'.join(b'#18' + struct.pack('<2f', v, i)
+                             for v, i in readings) + b'\n'
+    out = np.empty(channels * 2)
+
+    print(f"Parsing one sweep of {channels} channels ({number} iterations):")
+    base = timeit.timeit(lambda: legacy_parse(text_replies), number=number)
+    report('split/float (current)', base, number)
+    t = timeit.timeit(lambda: parse_ascii_values(ascii_reply, out=out), number=number)
+    report('parse_ascii_values', t, number, base)
+    t = timeit.timeit(lambda: parse_read_blocks(binary_reply), number=number)
+    report('parse_read_blocks (binary)', t, number, base)
+
+
+def bench_simulator(channels, number, latency):
+    from power import NGP800Controller
+
+    ngx = NGP800Controller('SIM::NGP804')
+    ngx.instrument.latency = latency
+    chs = list(range(1, channels + 1))
+    for ch in chs:
+        ngx.select_channel(ch)
+        ngx.set_voltage(25.0)
+        ngx.set_current(6.0)
+        ngx.set_output_select(True)
+    ngx.set_general_output_state(True)
+
+    def per_channel():
+        for ch in chs:
+            ngx.select_channel(ch)
+            ngx.read_measurement()
+
+    number = max(int(number * 1e-6 / max(latency, 1e-6)), 1)
+    print(f"\nFull sweep against the simulator, {latency * 1000:.1f} ms per message "
+          f"({number} iterations):")
+    base = timeit.timeit(per_channel, number=number)
+    report('select + read_measurement', base, number)
+    t = timeit.timeit(lambda: ngx.measure_channels(chs), number=number)
+    report('measure_channels (ascii)', t, number, base)
+    ngx.set_binary_format(True)
+    t = timeit.timeit(lambda: ngx.measure_channels(chs), number=number)
+    report('measure_channels (binary)', t, number, base)
+    ngx.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measurement parsing benchmark')
+    parser.add_argument('--channels', type=int, default=4, help='Channels per sweep')
+    parser.add_argument('--number', type=int, default=20000, help='Iterations')
+    parser.add_argument('--latency', type=float, default=0.0005,
+                        help='Simulated seconds per message (default: 0.0005)')
+    args = parser.parse_args()
+
+    bench_parsing(args.channels, args.number)
+    if args.channels <= 4:
+        bench_simulator(args.channels, args.number, args.latency)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,555 @@
+#!/usr/bin/env python3
+"""
+Power-cycle test campaigns with resumable progress and SQLite results
+
+A campaign is a parameter sweep described in JSON; every combination of
+the swept values is one run of N cycles, executed with the power.py cycle
+functions (initialize_system, turn_on_outputs, turn_off_outputs):
+
+    {
+        "name": "dut42-endurance",
+        "dut": "DUT-42",
+        "resource": "TCPIP0::192.168.0.10::inst0::INSTR",
+        "led_pin": 17,
+        "cycles": 1000,
+        "channels": [1, 2, 3, 4],
+        "settle": 0.5,
+        "sweep": {
+            "on_time": [5, 30],
+            "off_time": [1, 5],
+            "voltage": [24.0, 25.0],
+            "current": [6.0]
+        },
+        "limits": {"voltage_tolerance": 0.02, "max_current": 5.5}
+    }
+
+"settle" is seconds for all channels or {"channel": seconds}.
+
+Results go to an SQLite database (WAL mode): one row per cycle with the
+ON latency (the OUTP:GEN:STAT ON exchange alone, without the settle
+delay and readback) and pass/fail, one row per cycle and channel with the settled
+V/I. Rows are buffered and written with executemany in one transaction
+together with the run's progress, so the stored checkpoint always matches
+the stored results. Only finished cycles (outputs switched off again) are
+committed; an interrupted campaign resumes at the first cycle that was
+not, and finished runs are skipped. The resource must be given in the
+spec or with --resource; there is no fallback to the simulator.
+
+CampaignStore answers pass/fail and trend questions with indexed SQL
+aggregates, without loading rows into Python.
+
+Usage:
+    python3 campaign.py run campaign.json --db results.db
+    python3 campaign.py run campaign.json --db results.db --resource SIM::NGP804
+    python3 campaign.py report --db results.db --campaign dut42-endurance
+    python3 campaign.py trend --db results.db --run 3 --channel 1 --bucket 100
+"""
+
+import argparse
+import itertools
+import json
+import os
+import sqlite3
+import sys
+import time
+
+
+# Swept parameters and their defaults
+PARAMETERS = {
+    'on_time': 5.0,
+    'off_time': 1.0,
+    'voltage': 25.0,
+    'current': 6.0,
+}
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS campaigns (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    dut TEXT,
+    spec TEXT NOT NULL,
+    created REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    campaign_id INTEGER NOT NULL REFERENCES campaigns(id),
+    run_index INTEGER NOT NULL,
+    on_time REAL NOT NULL,
+    off_time REAL NOT NULL,
+    voltage REAL NOT NULL,
+    current REAL NOT NULL,
+    cycles INTEGER NOT NULL,
+    completed_cycles INTEGER NOT NULL DEFAULT 0,
+    failed_cycles INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'pending',
+    started REAL,
+    finished REAL,
+    UNIQUE (campaign_id, run_index)
+);
+CREATE TABLE IF NOT EXISTS cycles (
+    run_id INTEGER NOT NULL,
+    cycle INTEGER NOT NULL,
+    t REAL NOT NULL,
+    on_latency REAL NOT NULL,
+    passed INTEGER NOT NULL,
+    PRIMARY KEY (run_id, cycle)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS measurements (
+    run_id INTEGER NOT NULL,
+    cycle INTEGER NOT NULL,
+    channel INTEGER NOT NULL,
+    voltage REAL NOT NULL,
+    current REAL NOT NULL,
+    passed INTEGER NOT NULL,
+    PRIMARY KEY (run_id, cycle, channel)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS runs_by_status ON runs (campaign_id, status, run_index);
+CREATE INDEX IF NOT EXISTS runs_by_parameters ON runs (campaign_id, voltage, on_time, off_time);
+CREATE INDEX IF NOT EXISTS failed_cycles ON cycles (run_id, cycle) WHERE passed = 0;
+CREATE INDEX IF NOT EXISTS failed_measurements ON measurements (run_id, cycle, channel) WHERE passed = 0;
+'''
+
+
+def expand_sweep(spec):
+    """
+    Parameter combinations of a campaign, in a fixed order
+
+    Args:
+        spec: Campaign specification (see module docstring)
+
+    Returns:
+        list: One {parameter: value} dict per run
+    """
+    sweep = spec.get('sweep', {})
+    unknown = set(sweep) - set(PARAMETERS)
+    if unknown:
+        raise ValueError(f"Unknown sweep parameters {sorted(unknown)}, "
+                         f"expected some of {sorted(PARAMETERS)}")
+    values = [[float(v) for v in sweep[name]] if name in sweep else [default]
+              for name, default in PARAMETERS.items()]
+    return [dict(zip(PARAMETERS, combination))
+            for combination in itertools.product(*values)]
+
+
+def check_channels(readings, voltage, limits):
+    """
+    Pass/fail of each channel's settled reading
+
+    Args:
+        readings: {channel: (voltage, current)}
+        voltage: Voltage setpoint of the run
+        limits: 'voltage_tolerance' (relative) and 'max_current' (A), both
+                optional
+
+    Returns:
+        dict: {channel: True if within limits}
+    """
+    tolerance = limits.get('voltage_tolerance')
+    max_current = limits.get('max_current')
+    results = {}
+    for channel, (v, i) in readings.items():
+        ok = True
+        if tolerance is not None and abs(v - voltage) > tolerance * voltage:
+            ok = False
+        if max_current is not None and i > max_current:
+            ok = False
+        results[channel] = ok
+    return results
+
+
+def load_settle(settle):
+    """
+    Settle delay of a campaign spec for turn_on_outputs()
+
+    Args:
+        settle: Seconds, or {channel: seconds} with JSON's string keys
+
+    Returns:
+        float or dict: Seconds, or {channel number: seconds}
+    """
+    if isinstance(settle, dict):
+        return {int(channel): float(seconds) for channel, seconds in settle.items()}
+    return float(settle)
+
+
+class CampaignStore:
+    """
+    SQLite storage and reporting of campaign results
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path: Database file, created if needed
+        """
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        # Durable at every checkpoint commit except on power loss of the host
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.executescript(SCHEMA)
+
+    def open_campaign(self, spec):
+        """
+        Create a campaign and its runs, or find the existing one
+
+        Args:
+            spec: Campaign specification; a campaign of the same name must
+                  have an identical specification to be resumed
+
+        Returns:
+            int: Campaign id
+        """
+        text = json.dumps(spec, sort_keys=True)
+        row = self.db.execute('SELECT id, spec FROM campaigns WHERE name = ?',
+                              (spec['name'],)).fetchone()
+        if row is not None:
+            if row[1] != text:
+                raise ValueError(f"Campaign '{spec['name']}' exists with a different "
+                                 f"specification; rename it to start a new one")
+            return row[0]
+        with self.db:
+            campaign_id = self.db.execute(
+                'INSERT INTO campaigns (name, dut, spec, created) VALUES (?, ?, ?, ?)',
+                (spec['name'], spec.get('dut'), text, time.time())).lastrowid
+            cycles = int(spec.get('cycles', 100))
+            self.db.executemany(
+                'INSERT INTO runs (campaign_id, run_index, on_time, off_time, voltage, '
+                'current, cycles) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                [(campaign_id, index, p['on_time'], p['off_time'], p['voltage'],
+                  p['current'], cycles) for index, p in enumerate(expand_sweep(spec))])
+        return campaign_id
+
+    def pending_runs(self, campaign_id):
+        """
+        Runs not finished yet, in sweep order
+
+        Returns:
+            list: dicts with id, run_index, parameters, cycles, completed_cycles
+        """
+        cursor = self.db.execute(
+            "SELECT id, run_index, on_time, off_time, voltage, current, cycles, "
+            "completed_cycles FROM runs WHERE campaign_id = ? AND status != 'done' "
+            "ORDER BY run_index", (campaign_id,))
+        columns = [d[0] for d in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor]
+
+    def start_run(self, run_id):
+        with self.db:
+            self.db.execute("UPDATE runs SET status = 'running', "
+                            "started = COALESCE(started, ?) WHERE id = ?",
+                            (time.time(), run_id))
+
+    def commit_cycles(self, run_id, cycles, measurements, done=False):
+        """
+        Write buffered results and advance the run's checkpoint atomically
+
+        Args:
+            run_id: Run id
+            cycles: (run_id, cycle, t, on_latency, passed) rows
+            measurements: (run_id, cycle, channel, voltage, current, passed) rows
+            done: Mark the run finished
+        """
+        failed = sum(1 for row in cycles if not row[4])
+        last = cycles[-1][1] if cycles else None
+        with self.db:
+            self.db.executemany('INSERT OR REPLACE INTO cycles VALUES (?, ?, ?, ?, ?)',
+                                cycles)
+            self.db.executemany('INSERT OR REPLACE INTO measurements '
+                                'VALUES (?, ?, ?, ?, ?, ?)', measurements)
+            if last is not None:
+                self.db.execute('UPDATE runs SET completed_cycles = ?, '
+                                'failed_cycles = failed_cycles + ? WHERE id = ?',
+                                (last, failed, run_id))
+            if done:
+                self.db.execute("UPDATE runs SET status = 'done', finished = ? "
+                                "WHERE id = ?", (time.time(), run_id))
+
+    # Reporting
+
+    def campaign_id(self, name=None):
+        """Id of the named campaign, or of the most recent one"""
+        if name is None:
+            row = self.db.execute('SELECT id FROM campaigns ORDER BY id DESC LIMIT 1').fetchone()
+        else:
+            row = self.db.execute('SELECT id FROM campaigns WHERE name = ?', (name,)).fetchone()
+        if row is None:
+            raise KeyError(f"No campaign {name!r} in {self.path}")
+        return row[0]
+
+    def run_summary(self, campaign_id):
+        """
+        Progress and pass/fail per run, from the run rows alone
+
+        Returns:
+            list: dicts with run id, parameters, status, completed and
+                  failed cycles and the pass rate
+        """
+        cursor = self.db.execute(
+            'SELECT id, run_index, on_time, off_time, voltage, current, status, '
+            'cycles, completed_cycles, failed_cycles, '
+            'CASE WHEN completed_cycles > 0 '
+            '     THEN 1.0 - CAST(failed_cycles AS REAL) / completed_cycles END AS pass_rate '
+            'FROM runs WHERE campaign_id = ? ORDER BY run_index', (campaign_id,))
+        columns = [d[0] for d in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor]
+
+    def pass_rate(self, campaign_id, by='voltage'):
+        """
+        Pass rate grouped by one swept parameter
+
+        Args:
+            campaign_id: Campaign id
+            by: One of PARAMETERS
+
+        Returns:
+            list: (value, runs, cycles, failed cycles, pass rate) tuples
+        """
+        if by not in PARAMETERS:
+            raise ValueError(f"Cannot group by {by!r}, expected one of {sorted(PARAMETERS)}")
+        return self.db.execute(
+            f'SELECT {by}, COUNT(*), SUM(completed_cycles), SUM(failed_cycles), '
+            f'1.0 - CAST(SUM(failed_cycles) AS REAL) / MAX(SUM(completed_cycles), 1) '
+            f'FROM runs WHERE campaign_id = ? GROUP BY {by} ORDER BY {by}',
+            (campaign_id,)).fetchall()
+
+    def failures(self, run_id, limit=100):
+        """
+        Failed channel readings of a run (uses the partial failure index)
+
+        Returns:
+            list: (cycle, channel, voltage, current) tuples
+        """
+        return self.db.execute(
+            'SELECT cycle, channel, voltage, current FROM measurements '
+            'WHERE run_id = ? AND passed = 0 ORDER BY cycle, channel LIMIT ?',
+            (run_id, limit)).fetchall()
+
+    def trend(self, run_id, channel, bucket=100):
+        """
+        Settled V/I and ON latency of one channel over a run, per bucket of cycles
+
+        Args:
+            run_id: Run id
+            channel: Channel number
+            bucket: Cycles aggregated per row
+
+        Returns:
+            list: (first cycle, cycles, mean V, min V, max V, mean I, max I,
+                   mean ON latency, failed) tuples
+        """
+        return self.db.execute(
+            'SELECT MIN(m.cycle), COUNT(*), AVG(m.voltage), MIN(m.voltage), '
+            'MAX(m.voltage), AVG(m.current), MAX(m.current), AVG(c.on_latency), '
+            'SUM(1 - m.passed) '
+            'FROM measurements m JOIN cycles c ON c.run_id = m.run_id AND c.cycle = m.cycle '
+            'WHERE m.run_id = ? AND m.channel = ? '
+            'GROUP BY (m.cycle - 1) / ? ORDER BY 1', (run_id, channel, bucket)).fetchall()
+
+    def close(self):
+        self.db.close()
+
+
+class CampaignRunner:
+    """
+    Executes the pending runs of a campaign on real or simulated hardware
+    """
+
+    def __init__(self, store, spec, ngx, led, batch_size=50):
+        """
+        Args:
+            store: CampaignStore
+            spec: Campaign specification
+            ngx: NGP800Controller instance
+            led: LED instance
+            batch_size: Cycles buffered per database commit (the work lost
+                        at most when the campaign is interrupted)
+        """
+        self.store = store
+        self.spec = spec
+        self.ngx = ngx
+        self.led = led
+        self.batch_size = batch_size
+        self.channels = [int(ch) for ch in spec.get('channels', (1, 2, 3, 4))]
+        self.settle = load_settle(spec.get('settle', 0.5))
+        self.limits = spec.get('limits', {})
+        self.campaign_id = store.open_campaign(spec)
+
+    def run(self, on_cycle=None):
+        """
+        Run every pending run to completion
+
+        Args:
+            on_cycle: Optional callable(run, cycle, passed)
+        """
+        for run in self.store.pending_runs(self.campaign_id):
+            self.run_one(run, on_cycle)
+
+    def run_one(self, run, on_cycle=None):
+        """Execute one run from its checkpoint"""
+        from power import initialize_system, turn_off_outputs, turn_on_outputs
+
+        run_id = run['id']
+        setpoints = {channel: (run['voltage'], run['current']) for channel in self.channels}
+        self.store.start_run(run_id)
+        initialize_system(self.ngx, self.led, setpoints)
+
+        cycles = []
+        measurements = []
+        completed = run['completed_cycles']
+        next_edge = time.monotonic()
+        try:
+            for cycle in range(run['completed_cycles'] + 1, run['cycles'] + 1):
+                started = time.time()
+                edge = _OnEdge()
+                readings = turn_on_outputs(self.ngx, self.led, self.settle,
+                                           capture=edge, channels=self.channels)
+                on_latency = edge.latency
+                results = check_channels(readings, run['voltage'], self.limits)
+                passed = all(results.values())
+                next_edge = _hold_until(next_edge + run['on_time'])
+                turn_off_outputs(self.ngx, self.led)
+                # Buffered only once the outputs are off again: a cycle
+                # interrupted while ON is repeated on resume
+                cycles.append((run_id, cycle, started, on_latency, int(passed)))
+                measurements.extend((run_id, cycle, ch, v, i, int(results[ch]))
+                                    for ch, (v, i) in readings.items())
+                completed = cycle
+                if on_cycle is not None:
+                    on_cycle(run, cycle, passed)
+                if len(cycles) >= self.batch_size:
+                    self.store.commit_cycles(run_id, cycles, measurements)
+                    cycles, measurements = [], []
+                next_edge = _hold_until(next_edge + run['off_time'])
+        finally:
+            # Finished cycles are kept even when the run is interrupted
+            self.store.commit_cycles(run_id, cycles, measurements,
+                                     done=completed >= run['cycles'])
+
+
+class _OnEdge:
+    """turn_on_outputs() capture hook keeping the ON command's duration"""
+
+    latency = 0.0
+
+    def mark_power_on(self, sent_ns, done_ns):
+        self.latency = (done_ns - sent_ns) / 1e9
+
+
+def _hold_until(deadline):
+    """Sleep until a monotonic deadline; if already past, continue from now"""
+    remaining = deadline - time.monotonic()
+    if remaining > 0:
+        time.sleep(remaining)
+        return deadline
+    return time.monotonic()
+
+
+def print_report(store, campaign_id, by=None):
+    runs = store.run_summary(campaign_id)
+    print(f"{'run':>4} {'on s':>6} {'off s':>6} {'V':>6} {'A':>5} {'status':>8} "
+          f"{'cycles':>11} {'failed':>7} {'pass':>7}")
+    for r in runs:
+        rate = '-' if r['pass_rate'] is None else f"{r['pass_rate'] * 100:.1f}%"
+        print(f"{r['id']:>4} {r['on_time']:>6g} {r['off_time']:>6g} {r['voltage']:>6g} "
+              f"{r['current']:>5g} {r['status']:>8} "
+              f"{r['completed_cycles']:>5}/{r['cycles']:<5} {r['failed_cycles']:>7} {rate:>7}")
+    if by:
+        print(f"\nPass rate by {by}:")
+        for value, count, cycles, failed, rate in store.pass_rate(campaign_id, by):
+            print(f"  {value:>8g}: {count} runs, {cycles or 0} cycles, "
+                  f"{failed or 0} failed, {rate * 100:.2f}% pass")
+
+
+def run_campaign(store, args):
+    with open(args.spec) as f:
+        spec = json.load(f)
+    if 'name' not in spec:
+        sys.exit(f"{args.spec}: campaign 'name' is required")
+    resource_string = args.resource or spec.get('resource')
+    if not resource_string:
+        sys.exit(f"{args.spec}: no 'resource' in the campaign and no --resource given "
+                 "(use SIM::NGP804 for the simulator)")
+    if resource_string.startswith('SIM::'):
+        # The simulator has no LED to drive either
+        os.environ.setdefault('GPIOZERO_PIN_FACTORY', 'mock')
+
+    from gpiozero import LED
+    from event_log import LEVELS
+    from power import NGP800Controller, log, turn_off_outputs
+
+    if not args.verbose:
+        log.level = LEVELS['WARNING']
+    led = LED(spec.get('led_pin', 17))
+    ngx = NGP800Controller(resource_string)
+    ngx.set_error_policy('batch')
+    runner = CampaignRunner(store, spec, ngx, led, batch_size=args.batch)
+    pending = store.pending_runs(runner.campaign_id)
+    print(f"Campaign '{spec['name']}': {len(pending)} run(s) pending "
+          f"({ngx.get_idn()}), results in {args.db}")
+
+    def on_cycle(run, cycle, passed):
+        if cycle % 100 == 0 or cycle == run['cycles'] or not passed:
+            state = 'ok' if passed else 'FAIL'
+            print(f"  run {run['id']}: cycle {cycle}/{run['cycles']} {state}")
+
+    try:
+        runner.run(on_cycle)
+    except KeyboardInterrupt:
+        print("\nInterrupted; progress saved, run the same command to resume")
+    finally:
+        try:
+            turn_off_outputs(ngx, led)
+        finally:
+            ngx.close()
+            led.close()
+            log.close()
+    print_report(store, runner.campaign_id)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run and report power-cycle campaigns')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='Run (or resume) a campaign')
+    run_parser.add_argument('spec', help='Campaign JSON file')
+    run_parser.add_argument('--db', default='campaign.db', help='Results database')
+    run_parser.add_argument('--resource', help="VISA resource string, overrides the "
+                            "spec's 'resource' (SIM::NGP804 for the simulator)")
+    run_parser.add_argument('--batch', type=int, default=50,
+                            help='Cycles per database commit (default: 50)')
+    run_parser.add_argument('--verbose', action='store_true', help='Log every cycle step')
+
+    report_parser = commands.add_parser('report', help='Pass/fail per run')
+    report_parser.add_argument('--db', default='campaign.db', help='Results database')
+    report_parser.add_argument('--campaign', help='Campaign name (default: latest)')
+    report_parser.add_argument('--by', choices=sorted(PARAMETERS),
+                               help='Also group the pass rate by a parameter')
+
+    trend_parser = commands.add_parser('trend', help='V/I trend of one run and channel')
+    trend_parser.add_argument('--db', default='campaign.db', help='Results database')
+    trend_parser.add_argument('--run', type=int, required=True, help='Run id')
+    trend_parser.add_argument('--channel', type=int, default=1, help='Channel (default: 1)')
+    trend_parser.add_argument('--bucket', type=int, default=100,
+                              help='Cycles per row (default: 100)')
+    args = parser.parse_args()
+
+    store = CampaignStore(args.db)
+    try:
+        if args.command == 'report':
+            print_report(store, store.campaign_id(args.campaign), args.by)
+        elif args.command == 'trend':
+            print(f"{'cycle':>7} {'n':>5} {'mean V':>9} {'min V':>9} {'max V':>9} "
+                  f"{'mean A':>9} {'max A':>9} {'on ms':>7} {'failed':>6}")
+            for first, n, v, v_min, v_max, i, i_max, latency, failed in \
+                    store.trend(args.run, args.channel, args.bucket):
+                print(f"{first:>7} {n:>5} {v:>9.4f} {v_min:>9.4f} {v_max:>9.4f} "
+                      f"{i:>9.5f} {i_max:>9.5f} {latency * 1000:>7.1f} {failed:>6}")
+        else:
+            run_campaign(store, args)
+    finally:
+        store.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Independent ON/OFF schedules per NGP800 channel
+
+power.py switches all channels together with the master switch. Here each
+channel follows its own ON/OFF period and start offset, switched with
+its own output state (INSTrument:SELect n;:OUTPut:STATe ON/OFF).
+
+All schedules share one heap ordered by the next edge time, served by a
+single thread. Edges falling within `coincidence` seconds of each other
+are sent as one chained SCPI message, so four channels switching
+together cost one round trip, the same as one channel.
+
+Usage:
+    scheduler = ChannelScheduler(ngx, [
+        ChannelSchedule(1, on_time=55, off_time=5),
+        ChannelSchedule(2, on_time=10, off_time=2),
+        ChannelSchedule(3, on_time=10, off_time=2, offset=5),   # staggered
+    ])
+    scheduler.start()
+    ...
+    scheduler.stop()
+
+    python3 channel_scheduler.py --resource SIM::NGP804 \\
+        --schedule 1:55:5 --schedule 2:10:2 --schedule 3:10:2:5
+"""
+
+import argparse
+import heapq
+import threading
+import time
+
+from event_log import default_log
+
+
+class ChannelSchedule:
+    """
+    Periodic ON/OFF pattern of one channel
+    """
+
+    def __init__(self, channel, on_time, off_time, offset=0.0, cycles=None):
+        """
+        Args:
+            channel: Channel number
+            on_time: Seconds ON per cycle
+            off_time: Seconds OFF per cycle
+            offset: Seconds from scheduler start to the first ON edge
+            cycles: Number of ON/OFF cycles, or None to run until stopped
+        """
+        if on_time <= 0 or off_time <= 0:
+            raise ValueError("on_time and off_time must be positive")
+        self.channel = channel
+        self.on_time = on_time
+        self.off_time = off_time
+        self.offset = offset
+        self.cycles = cycles
+        self.completed = 0
+
+    @classmethod
+    def parse(cls, text):
+        """Create from 'channel:on:off[:offset[:cycles]]'"""
+        parts = text.split(':')
+        if not 3 <= len(parts) <= 5:
+            raise ValueError(f"Expected channel:on:off[:offset[:cycles]], got '{text}'")
+        return cls(int(parts[0]), float(parts[1]), float(parts[2]),
+                   float(parts[3]) if len(parts) > 3 else 0.0,
+                   int(parts[4]) if len(parts) > 4 else None)
+
+
+class ChannelScheduler:
+    """
+    Heap-based scheduler merging coincident edges into one message
+    """
+
+    def __init__(self, ngx, schedules=(), coincidence=0.001, on_edge=None, log=None):
+        """
+        Args:
+            ngx: NGP800Controller instance
+            schedules: ChannelSchedule instances
+            coincidence: Edges this close together (seconds) share a message
+            on_edge: Optional callable (timestamp, {channel: state}) invoked
+                     on the scheduler thread after every message; keep it cheap
+            log: EventLog receiving errors (default: event_log.default_log())
+        """
+        self.ngx = ngx
+        self.log = log if log is not None else default_log()
+        self.schedules = {}
+        self.coincidence = coincidence
+        self.on_edge = on_edge
+        self.states = {}
+        self.edges = 0
+        self.messages = 0
+        self.late_max = 0.0
+        self.error_count = 0
+        self._heap = []
+        self._stop = threading.Event()
+        self._thread = None
+        for schedule in schedules:
+            self.add(schedule)
+
+    def add(self, schedule):
+        """Register a schedule; must be called before start()"""
+        if schedule.channel in self.schedules:
+            raise ValueError(f"Channel {schedule.channel} already has a schedule")
+        self.schedules[schedule.channel] = schedule
+        self.states[schedule.channel] = False
+
+    def _switch(self, states):
+        """Send all state changes as one chained message"""
+        self.ngx.send_settings([(channel, 'output_state', state)
+                                for channel, state in sorted(states.items())])
+        self.states.update(states)
+        self.messages += 1
+        self.edges += len(states)
+
+    def _run(self, start):
+        self._heap = [(start + s.offset, channel, True)
+                      for channel, s in self.schedules.items()]
+        heapq.heapify(self._heap)
+        while self._heap and not self._stop.is_set():
+            due = self._heap[0][0]
+            delay = due - time.monotonic()
+            if delay > 0 and self._stop.wait(delay):
+                break
+
+            # Collect every edge due within the coincidence window
+            batch = {}
+            while self._heap and self._heap[0][0] <= due + self.coincidence:
+                edge_time, channel, state = heapq.heappop(self._heap)
+                batch[channel] = state
+                schedule = self.schedules[channel]
+                if state:
+                    heapq.heappush(self._heap, (edge_time + schedule.on_time, channel, False))
+                else:
+                    schedule.completed += 1
+                    if schedule.cycles is None or schedule.completed < schedule.cycles:
+                        heapq.heappush(self._heap,
+                                       (edge_time + schedule.off_time, channel, True))
+
+            self.late_max = max(self.late_max, time.monotonic() - due)
+            try:
+                self._switch(batch)
+            except Exception as e:
+                self.error_count += 1
+                self.log.warning('schedule', "Scheduler error: {error}", error=str(e))
+                continue
+            if self.on_edge:
+                self.on_edge(time.monotonic(), batch)
+
+    def start(self, delay=0.0):
+        """
+        Start all schedules on a daemon thread
+
+        Args:
+            delay: Seconds until the schedules' time zero
+        """
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='channel-scheduler',
+                                        args=(time.monotonic() + delay,), daemon=True)
+        self._thread.start()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def stop(self, turn_off=True, timeout=1.0):
+        """
+        Stop scheduling
+
+        Args:
+            turn_off: Switch every scheduled channel OFF in one message
+            timeout: Maximum seconds to wait for an in-flight message
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        if turn_off and self.schedules:
+            self._switch({channel: False for channel in self.schedules})
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Per-channel NGP800 ON/OFF schedules')
+    parser.add_argument('--ip', help='NGP800 IP address')
+    parser.add_argument('--resource', help='VISA resource string (e.g. SIM::NGP804)')
+    parser.add_argument('--schedule', action='append', required=True,
+                        type=ChannelSchedule.parse,
+                        help='channel:on:off[:offset[:cycles]] in seconds, repeatable')
+    parser.add_argument('--duration', type=float, help='Seconds to run (default: until Ctrl+C)')
+    args = parser.parse_args()
+
+    from power import NGP800Controller
+
+    if args.resource:
+        resource_string = args.resource
+    elif args.ip:
+        resource_string = f'TCPIP0::{args.ip}::inst0::INSTR'
+    else:
+        parser.error('--ip or --resource is required')
+
+    ngx = NGP800Controller(resource_string)
+    ngx.set_error_policy('timer')
+    print(f"Connected to: {ngx.get_idn()}")
+
+    def report(timestamp, states):
+        edges = ', '.join(f"Ch{ch} {'ON' if on else 'OFF'}" for ch, on in sorted(states.items()))
+        print(f"{timestamp:12.3f}  {edges}")
+
+    scheduler = ChannelScheduler(ngx, args.schedule, on_edge=report)
+    scheduler.start()
+    try:
+        end = time.monotonic() + args.duration if args.duration else None
+        while scheduler.running and (end is None or time.monotonic() < end):
+            time.sleep(0.1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        scheduler.stop()
+        print(f"{scheduler.edges} edges in {scheduler.messages} messages, "
+              f"worst lateness {scheduler.late_max * 1000:.2f} ms")
+        ngx.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Write-coalescing command queue in front of NGP800Controller
+
+A control loop may call set_voltage() far faster than the instrument can
+apply setpoints. CommandQueue keeps only the latest pending value per
+(channel, parameter) and sends each round as one chained SCPI message,
+so throughput follows the instrument's rate rather than the caller's.
+
+Output-state changes are ordering barriers: setpoints queued before a
+barrier are always sent before it, and are never merged with setpoints
+queued after it.
+
+Usage:
+    cq = CommandQueue(ngx)
+    cq.start()
+    for v in setpoints:
+        cq.set_voltage(1, v)       # returns immediately
+    cq.set_general_output_state(True)
+    cq.flush()
+    print(cq.stats())
+    cq.stop()
+"""
+
+import threading
+import time
+
+from event_log import default_log
+
+
+class _Segment:
+    """Coalesced setpoints followed by an optional barrier setting"""
+
+    def __init__(self):
+        self.setpoints = {}
+        self.barrier = None
+
+    def settings(self):
+        """(channel, key, value) tuples for NGP800Controller.send_settings()"""
+        settings = [(channel, parameter, value)
+                    for (channel, parameter), value in self.setpoints.items()]
+        if self.barrier is not None:
+            settings.append(self.barrier)
+        return settings
+
+
+class CommandQueue:
+    """
+    Background writer coalescing setpoints per channel and parameter
+    """
+
+    def __init__(self, ngx, sync=True, log=None):
+        """
+        Args:
+            ngx: NGP800Controller instance
+            sync: Append *OPC? to every round so the next round starts only
+                  after the instrument has applied this one (default: True)
+            log: EventLog receiving errors (default: event_log.default_log())
+        """
+        self.ngx = ngx
+        self.log = log if log is not None else default_log()
+        self.sync = sync
+        self.submitted = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.rounds = 0
+        self.sent = 0
+        self.last_round_time = None
+        self.last_error = None
+        self._segments = []
+        self._in_flight = False
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def _setpoint(self, channel, parameter, value):
+        with self._cond:
+            self.submitted += 1
+            if self._closed:
+                self.dropped += 1
+                return
+            if not self._segments or self._segments[-1].barrier is not None:
+                self._segments.append(_Segment())
+            setpoints = self._segments[-1].setpoints
+            key = (channel, parameter)
+            if key in setpoints:
+                # Last write wins; the dict keeps the original position
+                self.coalesced += 1
+            setpoints[key] = value
+            self._cond.notify()
+
+    def _barrier(self, setting):
+        with self._cond:
+            self.submitted += 1
+            if self._closed:
+                self.dropped += 1
+                return
+            if not self._segments or self._segments[-1].barrier is not None:
+                self._segments.append(_Segment())
+            self._segments[-1].barrier = setting
+            self._cond.notify()
+
+    def set_voltage(self, channel, voltage):
+        """
+        Queue a voltage setpoint (replaces a pending one for the channel)
+
+        Args:
+            channel: Channel number
+            voltage: Voltage in Volts
+        """
+        self._setpoint(channel, 'voltage', voltage)
+
+    def set_current(self, channel, current):
+        """
+        Queue a current limit (replaces a pending one for the channel)
+
+        Args:
+            channel: Channel number
+            current: Current in Amperes
+        """
+        self._setpoint(channel, 'current', current)
+
+    def set_output_select(self, channel, state):
+        """
+        Queue a channel output selection change (ordering barrier)
+
+        Args:
+            channel: Channel number
+            state: True for ON, False for OFF
+        """
+        self._barrier((channel, 'output_select', bool(state)))
+
+    def set_general_output_state(self, state):
+        """
+        Queue a master switch change (ordering barrier)
+
+        Args:
+            state: True for ON, False for OFF
+        """
+        self._barrier((None, 'general', bool(state)))
+
+    @property
+    def depth(self):
+        """Number of commands waiting to be sent"""
+        with self._cond:
+            return sum(len(segment.setpoints) + (segment.barrier is not None)
+                       for segment in self._segments)
+
+    def stats(self):
+        """
+        Snapshot of the queue counters
+
+        Returns:
+            dict: depth, submitted, coalesced, dropped, rounds, sent and
+                  last_round_time (seconds)
+        """
+        return {
+            'depth': self.depth,
+            'submitted': self.submitted,
+            'coalesced': self.coalesced,
+            'dropped': self.dropped,
+            'rounds': self.rounds,
+            'sent': self.sent,
+            'last_round_time': self.last_round_time,
+        }
+
+    def _send_round(self, segments):
+        settings = []
+        for segment in segments:
+            settings.extend(segment.settings())
+        start = time.perf_counter()
+        try:
+            self.ngx.send_settings(settings, sync=self.sync)
+            self.sent += len(settings)
+        except Exception as e:
+            self.dropped += len(settings)
+            self.last_error = e
+            self.log.warning('command_queue', "Command queue error: {error}", error=str(e))
+        self.last_round_time = time.perf_counter() - start
+        self.rounds += 1
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._segments and not self._closed:
+                    self._cond.wait()
+                if not self._segments:
+                    break
+                segments, self._segments = self._segments, []
+                self._in_flight = True
+            self._send_round(segments)
+            with self._cond:
+                self._in_flight = False
+                self._cond.notify_all()
+
+    def start(self):
+        """Start the writer thread"""
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='command-queue',
+                                        daemon=True)
+        self._thread.start()
+
+    def flush(self, timeout=None):
+        """
+        Wait until every queued command has been sent
+
+        Args:
+            timeout: Maximum seconds to wait (None waits forever)
+
+        Returns:
+            bool: True if the queue drained in time
+        """
+        with self._cond:
+            return self._cond.wait_for(
+                lambda: not self._segments and not self._in_flight, timeout)
+
+    def stop(self, timeout=None):
+        """
+        Send what is still queued, then stop the writer thread
+
+        Args:
+            timeout: Maximum seconds to wait for the thread
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Supervised NGP800 connection: dead-link detection and automatic recovery
+
+A LAN blip used to end power.py with a VisaIOError, losing a multi-day
+test. ConnectionSupervisor keeps the session alive instead:
+
+    1. While nothing else talks to the instrument for `interval` seconds,
+       a cheap *OPC? keep-alive checks the link
+    2. On a failure (its own keep-alive or an error reported by the cycle
+       loop through recover()), NGP800Controller.reconnect() reopens the
+       session with exponential backoff, reusing the ResourceManager
+    3. Only the cached intended state (setpoints, output selection, master
+       switch, status routing, data format) is re-applied, in one message
+    4. The time to recover is measured and reported as an event
+
+The sampler and status monitor share the session lock, so they simply
+wait while a recovery is in progress.
+
+Usage:
+    supervisor = ConnectionSupervisor(ngx, on_event=print)
+    supervisor.start()
+    ...
+    generation = ngx.generation
+    try:
+        turn_on_outputs(ngx, led)
+    except connection_errors() as e:
+        supervisor.recover(generation, e)
+"""
+
+import threading
+import time
+
+from event_log import default_log
+
+
+class ConnectionEvent:
+    """
+    Loss or recovery of the instrument link
+    """
+
+    def __init__(self, timestamp, name, error=None, recovery_time=None, count=0):
+        """
+        Args:
+            timestamp: time.monotonic() of the event
+            name: 'lost' or 'recovered'
+            error: Exception that revealed the loss
+            recovery_time: Seconds from detection until the state was restored
+            count: Number of recoveries so far
+        """
+        self.timestamp = timestamp
+        self.name = name
+        self.error = error
+        self.recovery_time = recovery_time
+        self.count = count
+
+    def __str__(self):
+        if self.name == 'lost':
+            return f"Connection lost: {self.error}"
+        return (f"Connection recovered in {self.recovery_time:.2f} s "
+                f"(recovery #{self.count})")
+
+
+class ConnectionSupervisor:
+    """
+    Background keep-alive and reconnect handling for an NGP800Controller
+    """
+
+    def __init__(self, ngx, interval=1.0, initial_delay=0.5, max_delay=10.0,
+                 timeout=None, on_event=None, log=None):
+        """
+        Args:
+            ngx: NGP800Controller instance
+            interval: Idle seconds before a keep-alive query (default: 1.0)
+            initial_delay: Seconds between the first reconnect attempts
+            max_delay: Upper bound of the backoff delay (default: 10.0)
+            timeout: Give up a recovery after this many seconds (None: never)
+            on_event: Optional callable receiving each ConnectionEvent
+            log: EventLog receiving errors (default: event_log.default_log())
+        """
+        self.ngx = ngx
+        self.log = log if log is not None else default_log()
+        self.interval = interval
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self.on_event = on_event
+        self.keepalive_count = 0
+        self.events = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _emit(self, event):
+        self.events.append(event)
+        if self.on_event is not None:
+            self.on_event(event)
+
+    def recover(self, generation, error):
+        """
+        Restore the link after an I/O failure
+
+        Safe to call from several threads: only the first caller for a given
+        generation reconnects, the others wait for it and return.
+
+        Args:
+            generation: ngx.generation read before the failed I/O
+            error: The exception raised by the failed I/O
+
+        Raises:
+            The last connection error if the timeout elapsed or the
+            supervisor was stopped before the link came back
+
+        Returns:
+            float: Seconds until recovery (0.0 if already recovered)
+        """
+        if generation != self.ngx.generation:
+            return 0.0
+        self._emit(ConnectionEvent(time.monotonic(), 'lost', error=error))
+        recovery_time = self.ngx.reconnect(
+            generation, initial_delay=self.initial_delay, max_delay=self.max_delay,
+            timeout=self.timeout, stop=self._stop)
+        if recovery_time:
+            self._emit(ConnectionEvent(time.monotonic(), 'recovered',
+                                       recovery_time=recovery_time,
+                                       count=self.ngx.reconnect_count))
+        return recovery_time
+
+    def check(self):
+        """Send a keep-alive if the link was idle, recovering on failure"""
+        if time.monotonic() - self.ngx.last_io < self.interval:
+            return
+        generation = self.ngx.generation
+        try:
+            self.ngx.ping()
+            self.keepalive_count += 1
+        except Exception as e:
+            # Whatever breaks a bare *OPC? leaves the session unusable
+            self.recover(generation, e)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.check()
+            except Exception as e:
+                self.log.warning('connection', "Connection supervisor error: {error}",
+                                 error=str(e))
+            self._stop.wait(self.interval / 2)
+
+    def start(self):
+        """Start supervising on a daemon thread"""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='connection-supervisor',
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=1.0):
+        """
+        Stop supervising; a recovery in progress gives up
+
+        Args:
+            timeout: Maximum seconds to wait for the thread
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""
+Per-cycle analytics over recorded NGP800 measurements
+
+Reads a sample file written by telemetry.SampleRecorder (or an .npz with
+'t', 'channel', 'voltage', 'current' arrays, channel 0 marking output
+edges with voltage 1.0/0.0), splits it into cycles at the ON edges and
+computes per channel and cycle:
+
+    rise_time     - ON edge to the first sample at rise_level of the
+                    steady-state voltage
+    settle_time   - ON edge to the last sample outside settle_band
+                    around the steady-state voltage
+    v_mean, v_std, v_ripple (peak-to-peak) and i_mean over the steady
+                    part of the ON window (its last steady_fraction)
+    i_min, i_max  - over the whole ON window
+    anomaly       - bit mask (ANOMALY_BITS) of metrics deviating from
+                    the median of the neighbouring cycles (excluding the
+                    cycle itself) by more than `threshold` robust
+                    standard deviations; channels with fewer than
+                    MIN_ANOMALY_CYCLES cycles are never flagged
+
+Everything is computed with whole-array NumPy operations (searchsorted,
+bincount, ufunc.reduceat); there is no Python loop over samples or
+cycles, so millions of samples take seconds on a Pi.
+
+Requirements:
+    pip install numpy
+
+Usage:
+    python3 power.py --samples samples.bin
+    python3 cycle_analysis.py samples.bin --output summary.npz --csv summary.csv
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from telemetry import SAMPLE_FIELDS
+
+
+SAMPLE_DTYPE = np.dtype(SAMPLE_FIELDS)
+
+# Summary columns in output order
+COLUMNS = ('channel', 'cycle', 'start', 'on_duration', 'samples', 'rise_time',
+           'settle_time', 'v_mean', 'v_std', 'v_ripple', 'i_mean', 'i_min',
+           'i_max', 'anomaly')
+
+# Metrics checked against neighbouring cycles, with their anomaly bit
+ANOMALY_BITS = {
+    'v_mean': 0x01,
+    'i_mean': 0x02,
+    'v_ripple': 0x04,
+    'rise_time': 0x08,
+    'i_max': 0x10,
+}
+
+# Fewer cycles per channel than this give no reliable spread estimate
+MIN_ANOMALY_CYCLES = 30
+
+
+def load_samples(path):
+    """
+    Load a recording as a SAMPLE_DTYPE array
+
+    Args:
+        path: SampleRecorder file (memory-mapped) or .npz with column arrays
+
+    Returns:
+        numpy.ndarray: Structured array with t, channel, voltage, current
+    """
+    if path.endswith('.npz'):
+        with np.load(path) as data:
+            records = np.empty(len(data['t']), dtype=SAMPLE_DTYPE)
+            for name in SAMPLE_DTYPE.names:
+                records[name] = data[name]
+        return records
+    return np.memmap(path, dtype=SAMPLE_DTYPE, mode='r')
+
+
+def cycle_bounds(records):
+    """
+    ON and OFF time of every cycle from the edge records
+
+    Args:
+        records: SAMPLE_DTYPE array
+
+    Returns:
+        tuple: (on, off) float64 arrays; off is the first OFF edge after
+               the ON edge, else the next ON edge, else the last sample
+    """
+    edges = records[records['channel'] == 0]
+    t = edges['t'].astype(np.float64)
+    is_on = edges['voltage'] > 0.5
+    on = t[is_on]
+    off_edges = t[~is_on]
+    next_on = np.append(on[1:], records['t'].max() if len(records) else np.inf)
+    if off_edges.size:
+        index = np.searchsorted(off_edges, on, side='right')
+        off = np.where(index < off_edges.size,
+                       off_edges[np.minimum(index, off_edges.size - 1)], np.inf)
+        off = np.minimum(off, next_on)
+    else:
+        off = next_on
+    return on, off
+
+
+def _segment_starts(keys):
+    """Start positions of runs of equal values in a nondecreasing array"""
+    return np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+
+
+def _segment_reduce(ufunc, values, keys, size, fill=np.nan):
+    """ufunc over every run of equal keys, scattered to a size-length array"""
+    out = np.full(size, fill)
+    if values.size:
+        starts = _segment_starts(keys)
+        out[keys[starts]] = ufunc.reduceat(values, starts)
+    return out
+
+
+def _first_time(mask, t, keys, size):
+    """Per key, time of the first sample where mask is set"""
+    out = np.full(size, np.nan)
+    index = np.flatnonzero(mask)
+    if index.size:
+        selected = keys[index]
+        starts = _segment_starts(selected)
+        out[selected[starts]] = t[index[starts]]
+    return out
+
+
+def _last_time(mask, t, keys, size):
+    """Per key, time of the last sample where mask is set"""
+    out = np.full(size, np.nan)
+    index = np.flatnonzero(mask)
+    if index.size:
+        selected = keys[index]
+        ends = np.r_[selected[1:] != selected[:-1], True]
+        out[selected[ends]] = t[index[ends]]
+    return out
+
+
+def _mean(keys, values, counts, size):
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.bincount(keys, values, minlength=size) / counts
+
+
+def summarize_channel(t, voltage, current, on, off, rise_level=0.9,
+                      settle_band=0.01, steady_fraction=0.5):
+    """
+    Per-cycle metrics of one channel
+
+    Args:
+        t, voltage, current: Samples of the channel, sorted by t
+        on, off: Cycle bounds from cycle_bounds()
+        rise_level: Fraction of the steady voltage that ends the rise
+        settle_band: Relative band around the steady voltage
+        steady_fraction: Trailing fraction of the ON window taken as steady
+
+    Returns:
+        dict: Column name -> array with one entry per cycle
+    """
+    n = on.size
+    cycle = np.searchsorted(on, t, side='right') - 1
+    inside = cycle >= 0
+    inside[inside] = t[inside] < off[cycle[inside]]
+    t, voltage, current, cycle = t[inside], voltage[inside], current[inside], cycle[inside]
+
+    end = np.minimum(off, t[-1] if t.size else on)
+    duration = np.maximum(end - on, 0.0)
+    elapsed = t - on[cycle]
+    counts = np.bincount(cycle, minlength=n)
+
+    steady = elapsed >= (1.0 - steady_fraction) * duration[cycle]
+    s_cycle, s_voltage = cycle[steady], voltage[steady]
+    s_counts = np.bincount(s_cycle, minlength=n)
+    v_mean = _mean(s_cycle, s_voltage, s_counts, n)
+    v_sq = _mean(s_cycle, s_voltage.astype(np.float64) ** 2, s_counts, n)
+    i_mean = _mean(s_cycle, current[steady], s_counts, n)
+
+    reference = v_mean[cycle]
+    with np.errstate(invalid='ignore'):
+        reached = voltage >= rise_level * reference
+        outside = np.abs(voltage - reference) > settle_band * np.abs(reference)
+    rise = _first_time(reached, t, cycle, n) - on
+    settle = _last_time(outside, t, cycle, n) - on
+    # Never outside the band: settled at the first sample
+    settle = np.where(np.isnan(settle) & (counts > 0),
+                      _first_time(np.ones_like(cycle, dtype=bool), t, cycle, n) - on,
+                      settle)
+
+    return {
+        'cycle': np.arange(n),
+        'start': on,
+        'on_duration': duration,
+        'samples': counts,
+        'rise_time': rise,
+        'settle_time': settle,
+        'v_mean': v_mean,
+        'v_std': np.sqrt(np.maximum(v_sq - v_mean ** 2, 0.0)),
+        'v_ripple': (_segment_reduce(np.maximum, s_voltage, s_cycle, n)
+                     - _segment_reduce(np.minimum, s_voltage, s_cycle, n)),
+        'i_mean': i_mean,
+        'i_min': _segment_reduce(np.minimum, current, cycle, n),
+        'i_max': _segment_reduce(np.maximum, current, cycle, n),
+    }
+
+
+def flag_anomalies(columns, window=5, threshold=6.0, min_cycles=MIN_ANOMALY_CYCLES):
+    """
+    Anomaly bit mask per cycle from leave-one-out rolling-median residuals
+
+    Each cycle is compared with the median of its `window - 1` neighbours
+    (the cycle itself is left out, so an outlier cannot pull the median
+    towards itself and shrink its residual). The scale is the global MAD
+    of those residuals.
+
+    Args:
+        columns: Per-cycle metrics of one channel (summarize_channel)
+        window: Odd number of cycles around and including the tested one
+        threshold: Robust z-score (MAD based) that flags a cycle
+        min_cycles: Fewer cycles than this are never flagged
+
+    Returns:
+        numpy.ndarray: uint8 ANOMALY_BITS mask per cycle
+    """
+    n = columns['cycle'].size
+    flags = np.zeros(n, dtype=np.uint8)
+    window |= 1
+    # Too few cycles for a meaningful spread estimate
+    if n < max(min_cycles, 2 * window + 1):
+        return flags
+    half = window // 2
+    neighbours = np.r_[0:half, half + 1:window]
+    for name, bit in ANOMALY_BITS.items():
+        x = columns[name].astype(np.float64)
+        # NaN padding: cycles near the ends just have fewer neighbours
+        padded = np.pad(x, half, mode='constant', constant_values=np.nan)
+        windows = np.lib.stride_tricks.sliding_window_view(padded, window)
+        with np.errstate(all='ignore'):
+            median = np.nanmedian(windows[:, neighbours], axis=1)
+            residual = np.abs(x - median)
+            scale = 1.4826 * np.nanmedian(residual)
+            # Floor for noise-free data, relative to the metric's magnitude
+            scale = max(scale, 1e-6 * np.nanmedian(np.abs(x)), 1e-12)
+            flags[residual > threshold * scale] |= bit
+    return flags
+
+
+def analyze(records, window=5, threshold=6.0, **options):
+    """
+    Per-cycle summary of every channel of a recording
+
+    Args:
+        records: SAMPLE_DTYPE array
+        window: Rolling median window for anomaly detection
+        threshold: Robust z-score flagging an anomaly
+        **options: rise_level, settle_band, steady_fraction (see
+                   summarize_channel)
+
+    Returns:
+        dict: Column name -> array, rows ordered by channel then cycle
+    """
+    on, off = cycle_bounds(records)
+    channel_numbers = records['channel']
+    order = np.argsort(channel_numbers, kind='stable')
+    # Recordings are appended in time order; only sort if they are not
+    t_all = records['t']
+    if np.any(np.diff(t_all) < 0):
+        order = np.lexsort((t_all, channel_numbers))
+    sorted_channels = channel_numbers[order]
+    starts = _segment_starts(sorted_channels)
+    ends = np.r_[starts[1:], sorted_channels.size]
+
+    parts = []
+    for start, end in zip(starts, ends):
+        channel = int(sorted_channels[start])
+        if channel == 0:
+            continue
+        rows = records[order[start:end]]
+        columns = summarize_channel(rows['t'].astype(np.float64),
+                                    rows['voltage'].astype(np.float64),
+                                    rows['current'].astype(np.float64),
+                                    on, off, **options)
+        columns['anomaly'] = flag_anomalies(columns, window, threshold)
+        columns['channel'] = np.full(on.size, channel, dtype=np.uint8)
+        parts.append(columns)
+
+    if not parts:
+        return {name: np.empty(0) for name in COLUMNS}
+    return {name: np.concatenate([part[name] for part in parts]) for name in COLUMNS}
+
+
+def save_summary(summary, path):
+    """
+    Write the summary columns
+
+    Args:
+        summary: analyze() result
+        path: .npz (compressed columns) or .csv
+    """
+    if path.endswith('.csv'):
+        table = np.column_stack([summary[name].astype(np.float64) for name in COLUMNS])
+        formats = ['%d', '%d', '%.6f', '%.6f', '%d', '%.6f', '%.6f', '%.6f',
+                   '%.6f', '%.6f', '%.6f', '%.6f', '%.6f', '%d']
+        np.savetxt(path, table, fmt=formats, delimiter=',', header=','.join(COLUMNS),
+                   comments='')
+    else:
+        np.savez_compressed(path, **summary)
+
+
+def print_overview(summary):
+    """One line per channel: cycle count, typical metrics, anomaly count"""
+    print(f"{'Ch':>3} {'cycles':>7} {'rise ms':>8} {'settle ms':>10} {'V mean':>9} "
+          f"{'ripple mV':>10} {'I mean':>9} {'I max':>8} {'anomalies':>10}")
+    for channel in np.unique(summary['channel']):
+        rows = summary['channel'] == channel
+        with np.errstate(all='ignore'):
+            print(f"{channel:>3} {rows.sum():>7} "
+                  f"{np.nanmedian(summary['rise_time'][rows]) * 1000:>8.2f} "
+                  f"{np.nanmedian(summary['settle_time'][rows]) * 1000:>10.2f} "
+                  f"{np.nanmedian(summary['v_mean'][rows]):>9.4f} "
+                  f"{np.nanmedian(summary['v_ripple'][rows]) * 1000:>10.2f} "
+                  f"{np.nanmedian(summary['i_mean'][rows]):>9.5f} "
+                  f"{np.nanmax(summary['i_max'][rows]):>8.4f} "
+                  f"{np.count_nonzero(summary['anomaly'][rows]):>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Per-cycle analysis of recorded samples')
+    parser.add_argument('path', help='SampleRecorder file or .npz')
+    parser.add_argument('--output', default='summary.npz', help='Summary .npz file')
+    parser.add_argument('--csv', help='Also write the summary as CSV')
+    parser.add_argument('--rise-level', type=float, default=0.9,
+                        help='Fraction of steady voltage ending the rise (default: 0.9)')
+    parser.add_argument('--settle-band', type=float, default=0.01,
+                        help='Relative settle band (default: 0.01)')
+    parser.add_argument('--steady-fraction', type=float, default=0.5,
+                        help='Trailing fraction of the ON window that is steady (default: 0.5)')
+    parser.add_argument('--window', type=int, default=5,
+                        help='Neighbouring cycles for anomaly detection (default: 5)')
+    parser.add_argument('--threshold', type=float, default=6.0,
+                        help='Robust z-score flagging an anomaly (default: 6)')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    records = load_samples(args.path)
+    summary = analyze(records, window=args.window, threshold=args.threshold,
+                      rise_level=args.rise_level, settle_band=args.settle_band,
+                      steady_fraction=args.steady_fraction)
+    elapsed = time.perf_counter() - start
+
+    save_summary(summary, args.output)
+    if args.csv:
+        save_summary(summary, args.csv)
+    print(f"{len(records)} records, {len(summary['cycle'])} channel-cycles "
+          f"analyzed in {elapsed:.2f} s -> {args.output}")
+    print_overview(summary)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Hot-reloadable cycle configuration for power.py
+
+The connection settings, cycle timing and per-channel setpoints live in a
+JSON file:
+
+    {
+        "power_supply_ip": "192.168.0.10",
+        "led_pin": 17,
+        "on_time": 5,
+        "off_time": 1,
+        "channels": {
+            "1": {"voltage": 25.0, "current": 6.0},
+            "2": {"voltage": 25.0, "current": 6.0},
+            "3": {"voltage": 25.0, "current": 6.0},
+            "4": {"voltage": 25.0, "current": 6.0}
+        }
+    }
+
+ConfigWatcher notices edits with inotify (through ctypes, no extra
+package), falling back to polling the modification time where inotify is
+not available. power.py checks it once per cycle, so changes take effect
+at the next cycle boundary; only setpoints that actually changed are
+sent, over the live session. Channels added to the file are selected for
+the master switch and removed ones deselected. Setpoints are validated
+before anything is sent; if the instrument still rejects part of the
+batch, power.py sends the previous setpoints again, so the instrument,
+the applied configuration and the watchdog limits stay consistent.
+Changing power_supply_ip or led_pin still requires a restart.
+
+Usage:
+    python3 power.py --config power_config.json
+
+    # Write the default configuration
+    python3 cycle_config.py power_config.json
+"""
+
+import argparse
+import json
+import os
+import struct
+
+
+DEFAULTS = {
+    'power_supply_ip': '192.168.0.10',
+    'led_pin': 17,
+    'on_time': 5.0,
+    'off_time': 1.0,
+    'channels': {str(ch): {'voltage': 25.0, 'current': 6.0} for ch in range(1, 5)},
+}
+
+# Keys that cannot change without reconnecting
+RESTART_KEYS = ('power_supply_ip', 'led_pin')
+
+# inotify(7) constants
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+class ConfigError(Exception):
+    """Invalid configuration file"""
+
+
+def load_config(path, channel_count=4):
+    """
+    Read and validate a configuration file, filling in defaults
+
+    Args:
+        path: JSON configuration file
+        channel_count: Outputs of the instrument; higher channel numbers
+                       are rejected
+
+    Returns:
+        dict: Configuration with 'channels' as {channel: (voltage, current)}
+    """
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        raise ConfigError(f"Cannot read {path}: {e}") from e
+    if not isinstance(data, dict):
+        raise ConfigError(f"{path}: expected a JSON object")
+
+    unknown = set(data) - set(DEFAULTS)
+    if unknown:
+        raise ConfigError(f"{path}: unknown keys {sorted(unknown)}")
+    config = {key: data.get(key, value) for key, value in DEFAULTS.items()}
+
+    for key in ('on_time', 'off_time'):
+        if not isinstance(config[key], (int, float)) or config[key] <= 0:
+            raise ConfigError(f"{path}: {key} must be a positive number")
+    channels = {}
+    for channel, setpoints in config['channels'].items():
+        try:
+            number = int(channel)
+            voltage = float(setpoints['voltage'])
+            current = float(setpoints['current'])
+        except (KeyError, TypeError, ValueError) as e:
+            raise ConfigError(f"{path}: invalid setpoints for channel {channel}") from e
+        if not 1 <= number <= channel_count:
+            raise ConfigError(f"{path}: no channel {channel}, the instrument has "
+                              f"{channel_count}")
+        if not (voltage >= 0 and current >= 0):
+            raise ConfigError(f"{path}: negative setpoints for channel {channel}")
+        channels[number] = (voltage, current)
+    config['channels'] = channels
+    return config
+
+
+def diff_config(old, new):
+    """
+    Changes between two loaded configurations
+
+    Args:
+        old: Currently applied configuration
+        new: Newly loaded configuration
+
+    Returns:
+        tuple: (timing, setpoints, restart)
+               timing    - {key: value} of changed on_time/off_time
+               setpoints - {channel: (voltage or None, current or None)},
+                           None where the value is unchanged
+               restart   - changed keys that need a restart
+    """
+    timing = {key: new[key] for key in ('on_time', 'off_time') if new[key] != old[key]}
+    restart = [key for key in RESTART_KEYS if new[key] != old[key]]
+    setpoints = {}
+    for channel, (voltage, current) in new['channels'].items():
+        old_voltage, old_current = old['channels'].get(channel, (None, None))
+        change = (voltage if voltage != old_voltage else None,
+                  current if current != old_current else None)
+        if change != (None, None):
+            setpoints[channel] = change
+    return timing, setpoints, restart
+
+
+def channel_changes(old, new):
+    """
+    Channels added and removed by a new configuration
+
+    Args:
+        old: Currently applied configuration
+        new: Newly loaded configuration
+
+    Returns:
+        tuple: (added, removed) sorted channel lists
+    """
+    return (sorted(set(new['channels']) - set(old['channels'])),
+            sorted(set(old['channels']) - set(new['channels'])))
+
+
+def apply_setpoints(ngx, setpoints, added=(), removed=()):
+    """
+    Send only the changed setpoints, as one checked batch
+
+    Args:
+        ngx: NGP800Controller instance
+        setpoints: {channel: (voltage or None, current or None)}
+        added: Channels to select for the master switch
+        removed: Channels to deselect from the master switch
+    """
+    with ngx.batch():
+        for channel, (voltage, current) in sorted(setpoints.items()):
+            ngx.select_channel(channel)
+            if voltage is not None:
+                ngx.set_voltage(voltage)
+            if current is not None:
+                ngx.set_current(current)
+            if channel in added:
+                ngx.set_output_select(True)
+        for channel in removed:
+            ngx.select_channel(channel)
+            ngx.set_output_select(False)
+
+
+def revert_setpoints(ngx, old, setpoints, added=(), removed=()):
+    """
+    Undo a partly applied apply_setpoints() batch
+
+    The instrument executes the valid commands of a rejected batch, so the
+    previous setpoints of every channel in it are sent again, added
+    channels are deselected and removed ones selected again.
+
+    Args:
+        ngx: NGP800Controller instance
+        old: Configuration applied before the batch
+        setpoints, added, removed: Arguments of the failed apply_setpoints()
+    """
+    previous = {channel: old['channels'][channel] for channel in setpoints
+                if channel in old['channels']}
+    apply_setpoints(ngx, previous, added=removed, removed=added)
+
+
+class ConfigWatcher:
+    """
+    Non-blocking change detection for one file
+
+    The containing directory is watched, so editors that save by writing
+    a new file and renaming it over the old one are detected as well.
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path: File to watch
+        """
+        self.path = os.path.abspath(path)
+        self.method = 'mtime'
+        self._fd = None
+        self._name = os.path.basename(self.path).encode()
+        self._mtime = self._stat()
+        try:
+            self._fd = self._inotify(os.path.dirname(self.path))
+            self.method = 'inotify'
+        except OSError:
+            pass
+
+    @staticmethod
+    def _inotify(directory):
+        import ctypes
+        import ctypes.util
+
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        if not hasattr(libc, 'inotify_init1'):
+            raise OSError("inotify not available")
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if libc.inotify_add_watch(fd, directory.encode(),
+                                  IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE) < 0:
+            errno = ctypes.get_errno()
+            os.close(fd)
+            raise OSError(errno, f"inotify_add_watch failed for {directory}")
+        return fd
+
+    def _stat(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def changed(self):
+        """
+        True if the file was written since the last call; never blocks
+        """
+        if self._fd is None:
+            mtime = self._stat()
+            changed, self._mtime = mtime != self._mtime, mtime
+            return changed
+
+        changed = False
+        while True:
+            try:
+                data = os.read(self._fd, 4096)
+            except BlockingIOError:
+                return changed
+            offset = 0
+            while offset < len(data):
+                _, _, _, length = _EVENT_HEADER.unpack_from(data, offset)
+                start = offset + _EVENT_HEADER.size
+                if data[start:start + length].rstrip(b'\0') == self._name:
+                    changed = True
+                offset = start + length
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Write or check a power.py configuration')
+    parser.add_argument('path', help='Configuration file')
+    args = parser.parse_args()
+
+    if os.path.exists(args.path):
+        config = load_config(args.path)
+        print(f"{args.path}: OK, cycle {config['on_time']} s ON / {config['off_time']} s OFF, "
+              f"{len(config['channels'])} channels")
+    else:
+        with open(args.path, 'w') as f:
+            json.dump(DEFAULTS, f, indent=4)
+            f.write('\n')
+        print(f"Default configuration written to {args.path}")
+
+
+if __name__ == '__main__':
+    main()
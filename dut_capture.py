@@ -0,0 +1,425 @@
+#!/usr/bin/env python3
+"""
+DUT boot-time capture: PSU ON edge to the DUT's "ready" GPIO line
+
+turn_on_outputs() timestamps the OUTP:GEN:STAT ON command right before it
+is sent and right after it completed; the DUT's ready line is watched on
+a GPIO input. Everything is on one clock, CLOCK_MONOTONIC in nanoseconds:
+
+    - libgpiod (python3-libgpiod, v1 or v2 bindings): edge timestamps are
+      taken by the kernel in the interrupt handler, so they do not include
+      scheduling delay of the reading thread
+    - otherwise gpiozero: the edge is timestamped in the callback, adding
+      the callback latency (typically 0.1-1 ms) to every measurement
+
+Per cycle the boot latency (ready edge - command sent) and the command
+latency (completion - sent) are kept and optionally appended to a CSV
+file as soon as the cycle closes. Each capture writes its rows under a new
+run number, and appending to an earlier CSV continues its cycle numbering.
+Only the last cycle and the run statistics are kept in memory; percentiles
+are maintained with the P² algorithm in constant memory.
+
+Requirements:
+    sudo apt install python3-libgpiod     # kernel timestamps (recommended)
+    sudo apt install python3-gpiozero     # fallback
+
+Usage:
+    python3 power.py --dut-ready 27 --dut-csv boot.csv
+
+    capture = DutCapture(27, csv_path='boot.csv')
+    capture.start()
+    turn_on_outputs(ngx, led, capture=capture)
+    ...
+    timing = capture.mark_power_off()
+    print(timing, capture.stats)
+"""
+
+import collections
+import csv
+import math
+import threading
+import time
+
+from event_log import default_log
+
+
+CSV_COLUMNS = ('run', 'cycle', 'sent_ns', 'done_ns', 'ready_ns', 'command_ms', 'boot_ms')
+
+
+class P2Quantile:
+    """
+    Streaming quantile estimate (Jain & Chlamtac P² algorithm)
+
+    Five markers track the minimum, p/2, p, (1+p)/2 quantiles and the
+    maximum; each observation adjusts them with a piecewise-parabolic
+    step. O(1) memory and time per observation.
+    """
+
+    def __init__(self, p):
+        """
+        Args:
+            p: Quantile in (0, 1), e.g. 0.99
+        """
+        self.p = p
+        self.count = 0
+        self._q = []
+        self._n = [0, 1, 2, 3, 4]
+        self._np = [0.0, 2 * p, 4 * p, 2 + 2 * p, 4.0]
+        self._dn = [0.0, p / 2, p, (1 + p) / 2, 1.0]
+
+    def add(self, x):
+        """Add one observation"""
+        self.count += 1
+        q = self._q
+        if self.count <= 5:
+            q.append(x)
+            q.sort()
+            return
+        n = self._n
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = 0
+            while x >= q[k + 1]:
+                k += 1
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self._np[i] += self._dn[i]
+        for i in (1, 2, 3):
+            d = self._np[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                candidate = q[i] + d / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i]) +
+                    (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1]))
+                if not q[i - 1] < candidate < q[i + 1]:
+                    candidate = q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+                q[i] = candidate
+                n[i] += d
+
+    @property
+    def value(self):
+        """Current estimate (exact for up to 5 observations; None if empty)"""
+        if not self._q:
+            return None
+        if self.count <= 5:
+            return self._q[min(int(math.ceil(self.p * len(self._q))) - 1, len(self._q) - 1)]
+        return self._q[2]
+
+
+class StreamingStats:
+    """
+    Count, min, mean, max and P² percentiles of a stream
+    """
+
+    def __init__(self, quantiles=(0.5, 0.9, 0.99)):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.quantiles = {p: P2Quantile(p) for p in quantiles}
+
+    def add(self, x):
+        self.count += 1
+        self.total += x
+        self.min = x if self.min is None else min(self.min, x)
+        self.max = x if self.max is None else max(self.max, x)
+        for estimator in self.quantiles.values():
+            estimator.add(x)
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    def __str__(self):
+        if not self.count:
+            return 'no samples'
+        parts = [f"n={self.count}", f"min {self.min * 1000:.2f}",
+                 f"mean {self.mean * 1000:.2f}"]
+        parts += [f"p{p * 100:g} {estimator.value * 1000:.2f}"
+                  for p, estimator in self.quantiles.items()]
+        parts.append(f"max {self.max * 1000:.2f} ms")
+        return ', '.join(parts)
+
+
+class CycleTiming:
+    """
+    Timestamps of one power-on, CLOCK_MONOTONIC nanoseconds
+    """
+
+    def __init__(self, cycle, sent_ns, done_ns):
+        """
+        Args:
+            cycle: Cycle number (1-based)
+            sent_ns: Right before OUTP:GEN:STAT ON was sent
+            done_ns: Right after the command completed
+        """
+        self.cycle = cycle
+        self.sent_ns = sent_ns
+        self.done_ns = done_ns
+        self.ready_ns = None
+
+    @property
+    def command_latency(self):
+        """Seconds the ON command took"""
+        return (self.done_ns - self.sent_ns) / 1e9
+
+    @property
+    def boot_latency(self):
+        """Seconds from the ON command to the ready edge (None if missed)"""
+        if self.ready_ns is None:
+            return None
+        return (self.ready_ns - self.sent_ns) / 1e9
+
+    def __str__(self):
+        boot = self.boot_latency
+        boot_text = 'no ready edge' if boot is None else f"boot {boot * 1000:.2f} ms"
+        return (f"DUT cycle {self.cycle}: {boot_text} "
+                f"(ON command {self.command_latency * 1000:.2f} ms)")
+
+
+class _GpiodV2Source:
+    """libgpiod 2.x bindings: kernel edge timestamps on CLOCK_MONOTONIC"""
+
+    def __init__(self, gpiod, chip, line):
+        from datetime import timedelta
+        from gpiod.line import Clock, Edge
+
+        self._timeout = timedelta(seconds=0.1)
+        self._rising = gpiod.EdgeEvent.Type.RISING_EDGE
+        self._request = gpiod.request_lines(
+            chip, consumer='dut_capture',
+            config={line: gpiod.LineSettings(edge_detection=Edge.BOTH,
+                                             event_clock=Clock.MONOTONIC)})
+
+    def poll(self, callback):
+        if self._request.wait_edge_events(self._timeout):
+            for event in self._request.read_edge_events():
+                callback(event.timestamp_ns, event.event_type == self._rising)
+
+    def close(self):
+        self._request.release()
+
+
+class _GpiodV1Source:
+    """libgpiod 1.x bindings (Debian Bookworm); monotonic since Linux 5.7"""
+
+    def __init__(self, gpiod, chip, line):
+        self._chip = gpiod.Chip(chip)
+        self._line = self._chip.get_line(line)
+        self._line.request(consumer='dut_capture', type=gpiod.LINE_REQ_EV_BOTH_EDGES)
+        self._rising = gpiod.LineEvent.RISING_EDGE
+
+    def poll(self, callback):
+        if self._line.event_wait(sec=0, nsec=100_000_000):
+            event = self._line.event_read()
+            callback(event.sec * 1_000_000_000 + event.nsec, event.type == self._rising)
+
+    def close(self):
+        self._line.release()
+        self._chip.close()
+
+
+class DutCapture:
+    """
+    Correlates PSU ON commands with the DUT's ready edges
+    """
+
+    def __init__(self, ready_pin, chip='/dev/gpiochip0', active_high=True,
+                 csv_path=None, backend=None, log=None):
+        """
+        Args:
+            ready_pin: GPIO line (BCM number) of the DUT's ready output
+            chip: GPIO chip for libgpiod
+            active_high: True if ready is signalled by a rising edge
+            csv_path: Optional CSV file receiving one row per closed cycle;
+                      rows are appended under the next run number and
+                      continue the file's cycle numbering, the header is
+                      written to a new file
+            backend: 'gpiod', 'gpiozero' or None to pick the best available
+            log: EventLog receiving errors (default: event_log.default_log())
+        """
+        self.ready_pin = ready_pin
+        self.log = log if log is not None else default_log()
+        self.chip = chip
+        self.active_high = active_high
+        self.backend = backend
+        self.run = 1
+        self.cycles = 0
+        self.last = None
+        self._first_cycle = 1
+        self.stats = StreamingStats()
+        self.command_stats = StreamingStats()
+        self.missed = 0
+        self.edge_count = 0
+        self._current = None
+        # Recent edges, for a ready edge handled before mark_power_on()
+        self._edges = collections.deque(maxlen=64)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._source = None
+        self._device = None
+        self._csv_file = None
+        self._csv = None
+        if csv_path:
+            # Appended, so a restarted capture keeps earlier results
+            self._resume(csv_path)
+            self._csv_file = open(csv_path, 'a', newline='')
+            self._csv = csv.writer(self._csv_file)
+            if self._csv_file.tell() == 0:
+                self._csv.writerow(CSV_COLUMNS)
+
+    def _resume(self, csv_path):
+        """Continue the run and cycle numbering of an existing CSV file"""
+        try:
+            with open(csv_path, newline='') as f:
+                rows = list(csv.reader(f))
+        except FileNotFoundError:
+            return
+        if not rows:
+            return
+        if tuple(rows[0]) != CSV_COLUMNS:
+            raise ValueError(f"{csv_path}: unexpected CSV header {rows[0]}, "
+                             f"expected {list(CSV_COLUMNS)}")
+        last_run = last_cycle = 0
+        for row in rows[1:]:
+            try:
+                last_run = max(last_run, int(row[0]))
+                last_cycle = max(last_cycle, int(row[1]))
+            except (IndexError, ValueError):
+                continue    # truncated row of an interrupted run
+        self.run = last_run + 1
+        self._first_cycle = last_cycle + 1
+
+    def start(self):
+        """
+        Start watching the ready line
+
+        Returns:
+            str: Backend in use ('gpiod' or 'gpiozero')
+        """
+        if self.backend in (None, 'gpiod'):
+            try:
+                import gpiod
+                if hasattr(gpiod, 'request_lines'):
+                    self._source = _GpiodV2Source(gpiod, self.chip, self.ready_pin)
+                else:
+                    self._source = _GpiodV1Source(gpiod, self.chip, self.ready_pin)
+            except (ImportError, OSError):
+                if self.backend == 'gpiod':
+                    raise
+        if self._source is not None:
+            self.backend = 'gpiod'
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='dut-capture',
+                                            daemon=True)
+            self._thread.start()
+        else:
+            from gpiozero import DigitalInputDevice
+
+            self.backend = 'gpiozero'
+            self._device = DigitalInputDevice(self.ready_pin)
+            self._device.when_activated = lambda: self._on_edge(time.monotonic_ns(), True)
+            self._device.when_deactivated = lambda: self._on_edge(time.monotonic_ns(), False)
+        return self.backend
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self._source.poll(self._on_edge)
+            except OSError as e:
+                self.log.warning('dut', "DUT capture error: {error}", error=str(e))
+                self._stop.wait(0.1)
+
+    def _on_edge(self, timestamp_ns, rising):
+        """Handle one edge of the ready line (capture thread)"""
+        if rising != self.active_high:
+            return
+        with self._lock:
+            self.edge_count += 1
+            self._edges.append(timestamp_ns)
+            current = self._current
+            if current is not None and current.ready_ns is None and \
+                    timestamp_ns >= current.sent_ns:
+                current.ready_ns = timestamp_ns
+
+    def mark_power_on(self, sent_ns, done_ns):
+        """
+        Register the ON command of a new cycle
+
+        Called again before mark_power_off() (e.g. the command was repeated
+        after a reconnect), it re-arms the open cycle instead.
+
+        Args:
+            sent_ns: time.monotonic_ns() right before sending
+            done_ns: time.monotonic_ns() right after completion
+        """
+        with self._lock:
+            current = self._current
+            if current is not None and current.ready_ns is None:
+                current.sent_ns = sent_ns
+                current.done_ns = done_ns
+            else:
+                if current is not None:
+                    self._close(current)
+                cycle = self._first_cycle + self.cycles
+                current = self._current = CycleTiming(cycle, sent_ns, done_ns)
+            # The capture thread may have handled the edge first
+            for timestamp_ns in self._edges:
+                if timestamp_ns >= sent_ns:
+                    current.ready_ns = timestamp_ns
+                    break
+
+    def mark_power_off(self):
+        """
+        Close the current cycle
+
+        Returns:
+            CycleTiming: The closed cycle, or None if none was open
+        """
+        with self._lock:
+            current, self._current = self._current, None
+            if current is not None:
+                self._close(current)
+            return current
+
+    def _close(self, timing):
+        self.cycles += 1
+        self.last = timing
+        self.command_stats.add(timing.command_latency)
+        if timing.boot_latency is None:
+            self.missed += 1
+        else:
+            self.stats.add(timing.boot_latency)
+        if self._csv is not None:
+            boot = timing.boot_latency
+            self._csv.writerow((self.run, timing.cycle, timing.sent_ns,
+                                timing.done_ns,
+                                timing.ready_ns if timing.ready_ns is not None else '',
+                                f'{timing.command_latency * 1000:.3f}',
+                                '' if boot is None else f'{boot * 1000:.3f}'))
+            self._csv_file.flush()
+
+    def stop(self):
+        """Close the open cycle, stop watching and close the CSV file"""
+        self.mark_power_off()
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(1.0)
+            self._thread = None
+        if self._source is not None:
+            self._source.close()
+            self._source = None
+        if self._device is not None:
+            self._device.close()
+            self._device = None
+        if self._csv_file is not None:
+            self._csv_file.close()
+            self._csv_file = None
+            self._csv = None
@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+Bounded-time emergency shutdown for NGP800 + GPIO
+
+Keeps a pre-opened raw SCPI socket (port 5025) next to the main VISA
+session, so outputs can be switched off even while the main session is
+stuck in a slow or hung query.
+
+Sequence on trigger:
+    1. Drive the GPIO LED line low
+    2. Send a pre-formatted 'OUTP:GEN:STAT OFF;*OPC?' on the secondary socket
+    3. Wait (bounded) for the '1' reply confirming the outputs are off
+
+trigger() may run in a signal handler, where printing or logging can
+deadlock or raise (reentrant stdout writes); it never reports anything
+itself. Failures are collected in the returned EmergencyReport (errors),
+for the caller to report outside signal context.
+
+Every step is bounded by a short dedicated timeout, so the worst-case
+time from trigger to outputs off is known in advance (see worst_case).
+The channel is shared by the watchdog (trip_channels), the main thread
+(trigger) and the connection supervisor (open); one exchange runs at a
+time. If trigger() cannot take the channel within one step timeout, it
+sends the OFF command over a fresh connection instead of waiting.
+
+Usage:
+    emergency = EmergencyOff('192.168.0.10', led)
+    ...
+    report = emergency.trigger()
+    print(report)
+"""
+
+import socket
+import threading
+import time
+
+from event_log import default_log
+
+
+class EmergencyReport:
+    """
+    Timing report of one emergency shutdown
+    """
+
+    def __init__(self, gpio_time, sent_time, confirm_time, confirmed, bound,
+                 errors=()):
+        """
+        Args:
+            gpio_time: Seconds from trigger until the GPIO line was low (None if no LED)
+            sent_time: Seconds from trigger until the OFF command was sent (None if not sent)
+            confirm_time: Seconds from trigger until the instrument confirmed (None if not)
+            confirmed: True if the instrument acknowledged the OFF command
+            bound: Guaranteed worst-case duration in seconds
+            errors: Descriptions of failed steps (LED, connection)
+        """
+        self.gpio_time = gpio_time
+        self.sent_time = sent_time
+        self.confirm_time = confirm_time
+        self.confirmed = confirmed
+        self.bound = bound
+        self.errors = list(errors)
+
+    @property
+    def total_time(self):
+        """Seconds from trigger until the last completed step"""
+        for value in (self.confirm_time, self.sent_time, self.gpio_time):
+            if value is not None:
+                return value
+        return 0.0
+
+    def __str__(self):
+        def ms(value):
+            return '-' if value is None else f'{value * 1000:.1f} ms'
+
+        state = 'confirmed' if self.confirmed else 'NOT confirmed'
+        text = (f"Emergency OFF {state}: GPIO low {ms(self.gpio_time)}, "
+                f"command sent {ms(self.sent_time)}, "
+                f"outputs off {ms(self.confirm_time)} "
+                f"(bound {self.bound * 1000:.0f} ms)")
+        if self.errors:
+            text += f" - {'; '.join(self.errors)}"
+        return text
+
+
+class EmergencyOff:
+    """
+    Emergency-off facility with its own pre-opened SCPI control channel
+    """
+
+    OFF_COMMAND = b'OUTP:GEN:STAT OFF;*OPC?\n'
+
+    # Per-channel OFF messages, joined into one write by trip_channels();
+    # deselecting keeps the next master ON from re-energizing the channel
+    CHANNEL_OFF = {channel: f'INST:SEL {channel};:OUTP:SEL OFF;:OUTP:STAT OFF'.encode()
+                   for channel in range(1, 5)}
+
+    def __init__(self, host, led=None, port=5025, timeout=0.2, log=None):
+        """
+        Open the secondary control channel
+
+        Args:
+            host: NGP800 IP address or host name
+            led: Optional gpiozero LED driven low before the instrument
+            port: Raw SCPI socket port (default: 5025)
+            timeout: Per-step timeout in seconds (default: 0.2)
+            log: EventLog receiving warnings of open() (default:
+                 event_log.default_log()); trigger() never logs
+        """
+        self.host = host
+        self.log = log if log is not None else default_log()
+        self.port = port
+        self.timeout = timeout
+        self.led = led
+        self.sock = None
+        self.last_report = None
+        # Last connection failure; recorded, not printed (signal context)
+        self.last_error = None
+        # Reentrant: trigger() from a signal handler may interrupt the
+        # main thread inside another exchange
+        self._lock = threading.RLock()
+        self.open()
+
+    @property
+    def worst_case(self):
+        """
+        Worst-case time from trigger to outputs off in seconds
+
+        One failed send (or the wait for an exchange of another thread),
+        one reconnect, one send and one confirmation wait, each limited by
+        the per-step timeout.
+        """
+        return 4 * self.timeout
+
+    def _connect(self, timeout):
+        """New socket to the instrument, or None (failure in last_error)"""
+        try:
+            sock = socket.create_connection((self.host, self.port), timeout=timeout)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+            return sock
+        except OSError as e:
+            self.last_error = e
+            return None
+
+    def open(self):
+        """
+        (Re)open the secondary control channel
+
+        The connection is made without holding the channel, so a trip is
+        never delayed by a reconnect from another thread.
+
+        Returns:
+            bool: True if the socket is connected
+        """
+        sock = self._connect(self.timeout)
+        with self._lock:
+            self.close()
+            self.sock = sock
+        if sock is None:
+            self.log.warning('emergency_off', "Warning: emergency channel to {host}:{port} "
+                             "not available: {error}", host=self.host, port=self.port,
+                             error=str(self.last_error))
+        return sock is not None
+
+    def _step_timeout(self, deadline):
+        """Per-step timeout, cut short by the deadline"""
+        return min(self.timeout, deadline - time.perf_counter())
+
+    def _send(self, message, deadline):
+        """Send a message, reconnecting once if the socket is broken"""
+        if self.sock is not None:
+            try:
+                self.sock.settimeout(max(self._step_timeout(deadline), 0.001))
+                self.sock.sendall(message)
+                return True
+            except OSError:
+                self.close()
+
+        timeout = self._step_timeout(deadline)
+        if timeout <= 0:
+            return False
+        self.sock = self._connect(timeout)
+        if self.sock is None:
+            return False
+        try:
+            self.sock.settimeout(max(self._step_timeout(deadline), 0.001))
+            self.sock.sendall(message)
+            return True
+        except OSError:
+            self.close()
+            return False
+
+    def _wait_confirm(self, deadline, sock=None):
+        """Wait for the '*OPC?' reply until the deadline"""
+        sock = self.sock if sock is None else sock
+        reply = b''
+        while not reply.endswith(b'\n'):
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                return False
+            try:
+                sock.settimeout(remaining)
+                chunk = sock.recv(64)
+            except OSError:
+                return False
+            if not chunk:
+                return False
+            reply += chunk
+        return reply.strip().endswith(b'1')
+
+    def trigger(self):
+        """
+        Drive GPIO low and switch all outputs off within worst_case seconds
+
+        Safe in a signal handler: nothing is printed or logged, failures are
+        listed in the report's errors.
+
+        Returns:
+            EmergencyReport: Measured timing of this shutdown
+        """
+        start = time.perf_counter()
+        deadline = start + self.worst_case
+        gpio_time = sent_time = confirm_time = None
+        confirmed = False
+        errors = []
+        self.last_error = None
+
+        # GPIO first - it does not depend on the network or the channel lock
+        if self.led is not None:
+            try:
+                self.led.off()
+                gpio_time = time.perf_counter() - start
+            except Exception as e:
+                errors.append(f"LED not turned off: {e}")
+
+        if self._lock.acquire(timeout=max(self._step_timeout(deadline), 0.0)):
+            try:
+                if self._send(self.OFF_COMMAND, deadline):
+                    sent_time = time.perf_counter() - start
+                    confirmed = self._wait_confirm(deadline)
+                    if confirmed:
+                        confirm_time = time.perf_counter() - start
+                    else:
+                        # A late reply would be mistaken for a later confirmation
+                        self.close()
+            finally:
+                self._lock.release()
+        else:
+            # Another exchange holds the channel: do not wait for it
+            sock = self._connect(self._step_timeout(deadline))
+            if sock is not None:
+                try:
+                    sock.settimeout(max(self._step_timeout(deadline), 0.001))
+                    sock.sendall(self.OFF_COMMAND)
+                    sent_time = time.perf_counter() - start
+                    confirmed = self._wait_confirm(deadline, sock)
+                    if confirmed:
+                        confirm_time = time.perf_counter() - start
+                except OSError:
+                    pass
+                finally:
+                    sock.close()
+
+        if not confirmed and self.last_error is not None:
+            errors.append(f"emergency channel to {self.host}:{self.port}: "
+                          f"{self.last_error}")
+        self.last_report = EmergencyReport(gpio_time, sent_time, confirm_time,
+                                           confirmed, self.worst_case, errors)
+        return self.last_report
+
+    def trip_channels(self, channels, timeout=None):
+        """
+        Switch individual outputs off and deselect them, within a bound
+
+        Unlike trigger(), the GPIO line and the master switch are left alone.
+        The channels are also removed from the master switch (OUTP:SEL OFF),
+        so they stay off until they are selected again. Note that
+        INSTrument:SELect is instrument-wide, so the main session must
+        re-select its channel after a trip.
+
+        Args:
+            channels: Iterable of channel numbers to switch off
+            timeout: Bound for the whole trip in seconds, including the wait
+                     for an exchange of another thread (default: worst_case)
+
+        Returns:
+            EmergencyReport: Measured timing of this trip
+        """
+        bound = self.worst_case if timeout is None else timeout
+        start = time.perf_counter()
+        deadline = start + bound
+        sent_time = confirm_time = None
+        confirmed = False
+
+        message = b';:'.join(self.CHANNEL_OFF[ch] for ch in channels)
+        if not self._lock.acquire(timeout=max(bound, 0.0)):
+            self.last_report = EmergencyReport(None, None, None, False, bound)
+            return self.last_report
+        try:
+            if self._send(message + b';*OPC?\n', deadline):
+                sent_time = time.perf_counter() - start
+                confirmed = self._wait_confirm(deadline)
+                if confirmed:
+                    confirm_time = time.perf_counter() - start
+                else:
+                    self.close()
+
+            self.last_report = EmergencyReport(None, sent_time, confirm_time,
+                                               confirmed, bound)
+            return self.last_report
+        finally:
+            self._lock.release()
+
+    def close(self):
+        """Close the secondary control channel"""
+        with self._lock:
+            if self.sock is not None:
+                try:
+                    self.sock.close()
+                except OSError:
+                    pass
+                self.sock = None
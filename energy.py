@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Incremental energy and charge accounting per channel
+
+EnergyAccumulator integrates P = V*I and I over timestamped samples with
+the trapezoidal rule as they arrive. Per channel it keeps only the
+previous sample and four running sums (cycle and total, energy and
+charge), so memory does not grow with run time and totals can be read
+at any moment without rescanning logs.
+
+feed() is a MeasurementSampler sink; update() integrates a whole array of
+samples of one channel (e.g. a FastLog capture) with NumPy.
+
+Usage:
+    energy = EnergyAccumulator()
+    sampler.add_sink(energy.feed)
+    ...
+    for channel, (wh, ah) in energy.new_cycle().items():
+        print(f"Ch{channel}: {wh:.4f} Wh, {ah:.4f} Ah")
+    print(energy.totals())
+"""
+
+import threading
+
+
+class _ChannelEnergy:
+    """Integration state of one channel"""
+
+    __slots__ = ('t', 'power', 'current', 'cycle_joules', 'cycle_coulombs',
+                 'total_joules', 'total_coulombs')
+
+    def __init__(self):
+        self.t = None
+        self.power = 0.0
+        self.current = 0.0
+        self.cycle_joules = 0.0
+        self.cycle_coulombs = 0.0
+        self.total_joules = 0.0
+        self.total_coulombs = 0.0
+
+
+class EnergyAccumulator:
+    """
+    Trapezoidal V*I and I integration with per-cycle and total sums
+    """
+
+    def __init__(self, channels=(1, 2, 3, 4), max_gap=None):
+        """
+        Args:
+            channels: Channel numbers to account
+            max_gap: Intervals longer than this (seconds) are not integrated,
+                     e.g. across a stalled connection; None integrates all
+        """
+        self.max_gap = max_gap
+        self.cycles = 0
+        self.last_cycle = {}
+        self._channels = {channel: _ChannelEnergy() for channel in channels}
+        self._lock = threading.Lock()
+
+    def feed(self, timestamp, channel, voltage, current):
+        """
+        Integrate one sample (MeasurementSampler sink)
+
+        Args:
+            timestamp: time.monotonic() of the sample
+            channel: Channel number
+            voltage: Measured voltage in V
+            current: Measured current in A
+        """
+        state = self._channels.get(channel)
+        if state is None:
+            return
+        power = voltage * current
+        with self._lock:
+            if state.t is not None:
+                dt = timestamp - state.t
+                if dt > 0 and (self.max_gap is None or dt <= self.max_gap):
+                    joules = 0.5 * dt * (state.power + power)
+                    coulombs = 0.5 * dt * (state.current + current)
+                    state.cycle_joules += joules
+                    state.cycle_coulombs += coulombs
+                    state.total_joules += joules
+                    state.total_coulombs += coulombs
+            state.t = timestamp
+            state.power = power
+            state.current = current
+
+    def update(self, channel, timestamps, voltages, currents):
+        """
+        Integrate a batch of samples of one channel, vectorized
+
+        The batch is joined to the previous sample of the channel, so
+        feed() and update() calls can be mixed in time order.
+
+        Args:
+            channel: Channel number
+            timestamps: Increasing sample times in seconds (same clock as feed)
+            voltages: Voltages in V
+            currents: Currents in A
+        """
+        import numpy as np
+
+        t = np.asarray(timestamps, dtype=np.float64)
+        if t.size == 0:
+            return
+        current = np.asarray(currents, dtype=np.float64)
+        power = np.asarray(voltages, dtype=np.float64) * current
+        state = self._channels[channel]
+        with self._lock:
+            if state.t is not None:
+                t = np.concatenate(([state.t], t))
+                power = np.concatenate(([state.power], power))
+                current = np.concatenate(([state.current], current))
+            dt = np.diff(t)
+            valid = dt > 0
+            if self.max_gap is not None:
+                valid &= dt <= self.max_gap
+            dt = np.where(valid, dt, 0.0)
+            joules = 0.5 * float(np.dot(dt, power[1:] + power[:-1]))
+            coulombs = 0.5 * float(np.dot(dt, current[1:] + current[:-1]))
+            state.cycle_joules += joules
+            state.cycle_coulombs += coulombs
+            state.total_joules += joules
+            state.total_coulombs += coulombs
+            state.t = float(t[-1])
+            state.power = float(power[-1])
+            state.current = float(current[-1])
+
+    def new_cycle(self):
+        """
+        Close the current cycle and start the next one
+
+        Returns:
+            dict: {channel: (Wh, Ah)} of the cycle just closed
+        """
+        with self._lock:
+            self.last_cycle = {channel: (state.cycle_joules / 3600, state.cycle_coulombs / 3600)
+                               for channel, state in self._channels.items()}
+            for state in self._channels.values():
+                state.cycle_joules = 0.0
+                state.cycle_coulombs = 0.0
+            self.cycles += 1
+        return self.last_cycle
+
+    def cycle_totals(self):
+        """{channel: (Wh, Ah)} of the cycle in progress"""
+        with self._lock:
+            return {channel: (state.cycle_joules / 3600, state.cycle_coulombs / 3600)
+                    for channel, state in self._channels.items()}
+
+    def totals(self):
+        """{channel: (Wh, Ah)} since the accumulator was created"""
+        with self._lock:
+            return {channel: (state.total_joules / 3600, state.total_coulombs / 3600)
+                    for channel, state in self._channels.items()}
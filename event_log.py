@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Non-blocking structured event log
+
+print() writes synchronously to stdout; on a slow SSH session or under
+journald that adds latency right between the PSU edge and the LED edge.
+EventLog moves all formatting and I/O to a background thread: the
+calling thread only appends a small tuple to a queue.
+
+    - Messages are str.format templates, rendered on the log thread
+      with the record's fields
+    - Levels: DEBUG, INFO, WARNING, ERROR (records below the configured
+      level are dropped before they are queued)
+    - Text output (the familiar messages) or one JSON object per line
+    - Rate limiting per event name: at most `burst` records per `window`
+      seconds, the rest are counted and reported as a summary line
+
+Usage:
+    log = EventLog(level='INFO', json_mode=False)
+    log.info('measurement', "   NGP800 Ch{channel}: {voltage:.4f} V",
+             channel=1, voltage=25.0)
+    ...
+    log.close()
+
+Background components (sampler, monitors, schedulers) report their
+errors through default_log(), the process-wide instance power.py also
+uses, unless they are given an EventLog of their own.
+"""
+
+import json
+import queue
+import sys
+import threading
+import time
+
+
+LEVELS = {'DEBUG': 10, 'INFO': 20, 'WARNING': 30, 'ERROR': 40}
+LEVEL_NAMES = {number: name for name, number in LEVELS.items()}
+
+_default_log = None
+_default_lock = threading.Lock()
+
+
+class EventLog:
+    """
+    Queue-based event log with a formatting/emitting background thread
+    """
+
+    def __init__(self, stream=None, level='INFO', json_mode=False,
+                 burst=20, window=1.0, maxsize=10000):
+        """
+        Args:
+            stream: Output file object (default: sys.stdout)
+            level: Minimum level name to emit
+            json_mode: Emit one JSON object per line instead of text
+            burst: Records per event name allowed within one window
+            window: Rate limiting window in seconds
+            maxsize: Queue capacity; records are dropped (and counted)
+                     instead of blocking when it is full
+        """
+        self.stream = stream
+        self.level = LEVELS[level.upper()]
+        self.json_mode = json_mode
+        self.burst = burst
+        self.window = window
+        self.dropped = 0
+        self.suppressed = 0
+        self.emitted = 0
+        self._queue = queue.Queue(maxsize)
+        self._windows = {}
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def log(self, level, event, message='', **fields):
+        """
+        Enqueue one record; never blocks on I/O
+
+        Args:
+            level: Level number (see LEVELS)
+            event: Short event name, also the rate limiting key
+            message: str.format template rendered with fields
+            **fields: Structured data of the record
+        """
+        if level < self.level:
+            return
+        if self._thread is None:
+            self._start()
+        try:
+            self._queue.put_nowait((time.time(), level, event, message, fields))
+        except queue.Full:
+            self.dropped += 1
+
+    def debug(self, event, message='', **fields):
+        self.log(10, event, message, **fields)
+
+    def info(self, event, message='', **fields):
+        self.log(20, event, message, **fields)
+
+    def warning(self, event, message='', **fields):
+        self.log(30, event, message, **fields)
+
+    def error(self, event, message='', **fields):
+        self.log(40, event, message, **fields)
+
+    def _start(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True,
+                                                name='event-log')
+                self._thread.start()
+
+    def _allow(self, timestamp, event):
+        """Rate limiting per event name; emits the summary of a closed window"""
+        start, count, suppressed = self._windows.get(event, (timestamp, 0, 0))
+        if timestamp - start >= self.window:
+            if suppressed:
+                self._emit(timestamp, 30, 'suppressed',
+                           "   ({count} repeated '{repeated}' messages suppressed)",
+                           {'repeated': event, 'count': suppressed})
+            start, count, suppressed = timestamp, 0, 0
+        if count < self.burst:
+            self._windows[event] = (start, count + 1, suppressed)
+            return True
+        self._windows[event] = (start, count, suppressed + 1)
+        self.suppressed += 1
+        return False
+
+    def _format(self, timestamp, level, event, message, fields):
+        try:
+            text = message.format(**fields) if fields else message
+        except (KeyError, IndexError, ValueError) as e:
+            text = f"{message} (format error: {e})"
+        if not self.json_mode:
+            return text
+        record = {'ts': round(timestamp, 6), 'level': LEVEL_NAMES.get(level, level),
+                  'event': event, 'msg': text.strip()}
+        record.update(fields)
+        return json.dumps(record, default=str, ensure_ascii=False)
+
+    def _emit(self, timestamp, level, event, message, fields):
+        stream = self.stream or sys.stdout
+        stream.write(self._format(timestamp, level, event, message, fields) + '\n')
+        self.emitted += 1
+
+    def _run(self):
+        while True:
+            record = self._queue.get()
+            try:
+                if record is None:
+                    break
+                if self._allow(record[0], record[2]):
+                    self._emit(*record)
+                # Flush once the backlog is written, not per line
+                if self._queue.empty():
+                    (self.stream or sys.stdout).flush()
+            except Exception as e:
+                sys.stderr.write(f"Event log error: {e}\n")
+            finally:
+                self._queue.task_done()
+
+    def flush(self, timeout=None):
+        """
+        Block until every queued record has been written
+
+        Args:
+            timeout: Give up after this many seconds (default: wait)
+
+        Returns:
+            bool: True if the queue was drained
+        """
+        if self._thread is None:
+            return True
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        (self.stream or sys.stdout).flush()
+        return True
+
+    def close(self, timeout=None):
+        """
+        Write pending records, report open suppression windows and stop
+
+        Args:
+            timeout: Give up after this many seconds and leave the rest to
+                     the daemon thread (default: wait)
+        """
+        if self._thread is None:
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            return
+        self._thread = None
+        now = time.time()
+        for event, (start, count, suppressed) in self._windows.items():
+            if suppressed:
+                self._emit(now, 30, 'suppressed',
+                           "   ({count} repeated '{repeated}' messages suppressed)",
+                           {'repeated': event, 'count': suppressed})
+        self._windows.clear()
+        (self.stream or sys.stdout).flush()
+
+
+def default_log():
+    """
+    Process-wide EventLog, created on first use
+
+    Returns:
+        EventLog: The shared instance
+    """
+    global _default_log
+    with _default_lock:
+        if _default_log is None:
+            _default_log = EventLog()
+        return _default_log
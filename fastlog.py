@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+NGP800 FastLog high-rate capture into NumPy
+
+The NGP800 logs voltage and current internally at up to 500 kS/s.
+FastLogCapture configures and arms the capture, then streams the data
+back in binary blocks that are copied byte-for-byte into a preallocated
+NumPy array - no per-sample text parsing.
+
+Requirements:
+    pip install pyvisa pyvisa-py numpy
+
+Usage:
+    # Capture the ON edge of channel 1 with the offline simulator
+    python3 fastlog.py --resource SIM::NGP804 --channel 1 --rate 50000 \\
+        --duration 0.2 --power-on --output inrush.npz
+
+    # Real instrument
+    python3 fastlog.py --ip 192.168.0.10 --channel 1 --rate 10000 --duration 2
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from power import NGP800Controller
+
+
+class FastLogCapture:
+    """
+    One FastLog capture of a single channel into preallocated arrays
+    """
+
+    def __init__(self, ngx, channel, sample_rate, duration):
+        """
+        Args:
+            ngx: NGP800Controller instance
+            channel: Channel number
+            sample_rate: Samples per second (see power.FASTLOG_RATES)
+            duration: Capture length in seconds (sets the array size)
+        """
+        self.ngx = ngx
+        self.channel = channel
+        self.sample_rate = sample_rate
+        self.capacity = int(round(sample_rate * duration))
+        # Interleaved (voltage, current) rows, same layout as the wire data
+        self.samples = np.empty((self.capacity, 2), dtype='<f4')
+        self._bytes = self.samples.reshape(-1).view(np.uint8)
+        self.count = 0
+        self.blocks = 0
+        self.armed_at = None
+
+    @property
+    def voltage(self):
+        """Captured voltages in V (view, no copy)"""
+        return self.samples[:self.count, 0]
+
+    @property
+    def current(self):
+        """Captured currents in A (view, no copy)"""
+        return self.samples[:self.count, 1]
+
+    @property
+    def time(self):
+        """Sample times in seconds relative to the first sample"""
+        return np.arange(self.count) / self.sample_rate
+
+    @property
+    def full(self):
+        """True when the arrays are filled"""
+        return self.count >= self.capacity
+
+    def arm(self):
+        """Configure and start logging on the instrument"""
+        self.ngx.configure_fastlog(self.channel, self.sample_rate)
+        self.ngx.set_fastlog_state(self.channel, True)
+        self.armed_at = time.monotonic()
+
+    def stop(self):
+        """Stop logging on the instrument"""
+        self.ngx.set_fastlog_state(self.channel, False)
+
+    def fetch(self):
+        """
+        Copy the next block from the instrument into the arrays
+
+        Samples beyond the capacity are discarded.
+
+        Returns:
+            int: Number of samples stored by this fetch
+        """
+        block = self.ngx.read_fastlog_block(self.channel)
+        start = self.count * 8
+        size = min(len(block) - len(block) % 8, self._bytes.size - start)
+        if size <= 0:
+            return 0
+        self._bytes[start:start + size] = np.frombuffer(block, np.uint8, size)
+        self.count += size // 8
+        self.blocks += 1
+        return size // 8
+
+    def capture(self, poll_interval=0.05, timeout=None, on_armed=None):
+        """
+        Arm, stream blocks until the arrays are full, then stop
+
+        Fetches are paced at poll_interval, so each block carries about
+        sample_rate * poll_interval samples instead of whatever arrived
+        during the previous round trip.
+
+        Args:
+            poll_interval: Seconds between fetches
+            timeout: Maximum seconds (default: twice the capture length + 5 s)
+            on_armed: Optional callable run right after arming, e.g. to
+                      switch the outputs on and catch the ON edge
+
+        Returns:
+            FastLogCapture: self
+        """
+        if timeout is None:
+            timeout = 2 * self.capacity / self.sample_rate + 5.0
+        self.arm()
+        try:
+            if on_armed is not None:
+                on_armed()
+            deadline = self.armed_at + timeout
+            next_fetch = time.monotonic()
+            while not self.full and time.monotonic() < deadline:
+                self.fetch()
+                next_fetch += poll_interval
+                remaining = next_fetch - time.monotonic()
+                if remaining > 0:
+                    time.sleep(remaining)
+                else:
+                    # Fetching took longer than the interval: keep going
+                    next_fetch = time.monotonic()
+        finally:
+            self.stop()
+        return self
+
+    def save(self, path):
+        """
+        Save the capture as a compressed .npz file
+
+        Args:
+            path: Output file name
+        """
+        np.savez_compressed(path, voltage=self.voltage, current=self.current,
+                            sample_rate=self.sample_rate, channel=self.channel)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='NGP800 FastLog capture')
+    parser.add_argument('--ip', help='NGP800 IP address')
+    parser.add_argument('--resource', help='VISA resource string (e.g. SIM::NGP804)')
+    parser.add_argument('--channel', type=int, default=1, help='Channel number')
+    parser.add_argument('--rate', type=int, default=10000,
+                        help='Sample rate in S/s (default: 10000)')
+    parser.add_argument('--duration', type=float, default=1.0,
+                        help='Capture length in seconds (default: 1.0)')
+    parser.add_argument('--voltage', type=float, default=25.0,
+                        help='Voltage for --power-on (default: 25.0)')
+    parser.add_argument('--current', type=float, default=6.0,
+                        help='Current limit for --power-on (default: 6.0)')
+    parser.add_argument('--power-on', action='store_true',
+                        help='Switch the channel on after arming (captures the ON edge)')
+    parser.add_argument('--output', help='Save the capture to this .npz file')
+    args = parser.parse_args()
+
+    if args.resource:
+        resource_string = args.resource
+    elif args.ip:
+        resource_string = f'TCPIP0::{args.ip}::inst0::INSTR'
+    else:
+        parser.error('--ip or --resource is required')
+
+    ngx = NGP800Controller(resource_string)
+    try:
+        print(f"Connected to: {ngx.get_idn()}")
+
+        def power_on():
+            ngx.select_channel(args.channel)
+            ngx.set_voltage(args.voltage)
+            ngx.set_current(args.current)
+            ngx.set_output_select(True)
+            ngx.set_general_output_state(True)
+
+        capture = FastLogCapture(ngx, args.channel, args.rate, args.duration)
+        start = time.perf_counter()
+        capture.capture(on_armed=power_on if args.power_on else None)
+        elapsed = time.perf_counter() - start
+
+        print(f"Captured {capture.count} samples in {capture.blocks} blocks "
+              f"({elapsed:.2f} s)")
+        if capture.count:
+            print(f"  Voltage: min {capture.voltage.min():.4f} V, "
+                  f"max {capture.voltage.max():.4f} V")
+            print(f"  Current: min {capture.current.min():.6f} A, "
+                  f"max {capture.current.max():.6f} A")
+        if args.output:
+            capture.save(args.output)
+            print(f"Saved to {args.output}")
+    finally:
+        if args.power_on:
+            ngx.set_general_output_state(False)
+        ngx.close()
+
+
+if __name__ == '__main__':
+    main()
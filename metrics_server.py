@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+Local Prometheus endpoint for a running power.py
+
+PowerMetrics keeps in-memory aggregates that the control loop updates
+incrementally as things happen: the latest V/I per channel (a
+MeasurementSampler sink), output edges, cycles and schedule lateness, and
+a latency histogram per SCPI command (NGP800Controller.command_observer).
+A scrape only formats these numbers - it never touches the instrument and
+takes no lock that the sampler or the cycle loop waits on for longer than
+a copy.
+
+MetricsServer serves them in the Prometheus text format on
+http://127.0.0.1:9108/metrics from a daemon thread.
+
+Usage:
+    python3 power.py --metrics            # 127.0.0.1:9108
+    python3 power.py --metrics 9200
+    curl -s localhost:9108/metrics
+
+    metrics = PowerMetrics(ngx)
+    ngx.command_observer = metrics.observe_command
+    sampler.add_sink(metrics.feed)
+    server = MetricsServer(metrics)
+    server.start()
+"""
+
+import bisect
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+DEFAULT_PORT = 9108
+
+# Histogram bucket upper bounds in seconds
+LATENCY_BUCKETS = (0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2,
+                   0.5, 1.0, 2.0, 5.0)
+LATENESS_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 60.0)
+
+# Numeric suffix of a mnemonic, e.g. the 1 in ISUM1
+_SUFFIX = re.compile(r'(?<=[A-Za-z])\d+(?=:|\?|$)')
+
+# Distinct command labels kept; further commands are counted as 'other'
+MAX_COMMAND_LABELS = 64
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram updated in O(log buckets) per observation
+    """
+
+    def __init__(self, buckets):
+        """
+        Args:
+            buckets: Increasing bucket upper bounds (+Inf is implied)
+        """
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        """Add one observation (callers serialize access)"""
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def snapshot(self):
+        """(cumulative counts per bucket incl. +Inf, sum, count)"""
+        cumulative = []
+        total = 0
+        for count in self.counts:
+            total += count
+            cumulative.append(total)
+        return cumulative, self.sum, self.count
+
+
+def command_label(command, max_headers=3):
+    """
+    Stable label for a SCPI message: its distinct headers without
+    arguments or channel suffixes, the first few of a long chain
+
+    'INSTrument:SELect 1;:READ?' -> 'INSTrument:SELect;READ?'
+    """
+    headers = []
+    for part in command.split(';'):
+        header = _SUFFIX.sub('', part.strip().lstrip(':').split(' ', 1)[0])
+        if header and header not in headers:
+            headers.append(header)
+    if len(headers) > max_headers:
+        headers[max_headers:] = ['...']
+    return ';'.join(headers)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value):
+    if value is None:
+        return 'NaN'
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class PowerMetrics:
+    """
+    Incrementally updated aggregates of one power.py run
+    """
+
+    def __init__(self, ngx=None, channels=(1, 2, 3, 4)):
+        """
+        Args:
+            ngx: Optional NGP800Controller; its reconnect counters and
+                 intended output selection are read (from memory) per scrape
+            channels: Channel numbers reported
+        """
+        self.ngx = ngx
+        self.channels = tuple(channels)
+        self.started = time.time()
+        self.latest = {}
+        self.sample_count = 0
+        self.output_state = None
+        self.edge_count = 0
+        self.cycle_count = 0
+        self.lateness = 0.0
+        self.max_lateness = 0.0
+        self.lateness_histogram = Histogram(LATENESS_BUCKETS)
+        self.command_histograms = {}
+        self._labels = {}
+        self._lock = threading.Lock()
+
+    def feed(self, timestamp, channel, voltage, current):
+        """Record the latest reading of a channel (MeasurementSampler sink)"""
+        self.latest[channel] = (timestamp, voltage, current)
+        self.sample_count += 1
+
+    def mark_edge(self, state, timestamp=None):
+        """Record an output edge (True for ON)"""
+        self.output_state = bool(state)
+        self.edge_count += 1
+
+    def cycle(self, count):
+        """Record the number of the cycle that just started"""
+        self.cycle_count = count
+
+    def observe_lateness(self, seconds):
+        """
+        Record how late an edge was against its scheduled time
+
+        Args:
+            seconds: Lateness, 0 or negative if on time
+        """
+        seconds = max(seconds, 0.0)
+        with self._lock:
+            self.lateness = seconds
+            self.max_lateness = max(self.max_lateness, seconds)
+            self.lateness_histogram.observe(seconds)
+
+    def observe_command(self, command, seconds):
+        """
+        Time one SCPI exchange (NGP800Controller.command_observer)
+
+        Args:
+            command: Message sent
+            seconds: Duration of the exchange
+        """
+        label = self._labels.get(command)
+        if label is None:
+            label = command_label(command)
+            if len(self._labels) < 4 * MAX_COMMAND_LABELS:
+                self._labels[command] = label
+        with self._lock:
+            histogram = self.command_histograms.get(label)
+            if histogram is None:
+                if len(self.command_histograms) >= MAX_COMMAND_LABELS:
+                    label = 'other'
+                    histogram = self.command_histograms.get(label)
+                if histogram is None:
+                    histogram = self.command_histograms[label] = Histogram(LATENCY_BUCKETS)
+            histogram.observe(seconds)
+
+    def stop(self):
+        """Nothing to release (lets power.py treat it like other sinks)"""
+
+    def render(self):
+        """
+        Current values in the Prometheus text exposition format
+
+        Returns:
+            str: Metrics page
+        """
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, value in samples:
+                if labels:
+                    label_text = ','.join(f'{key}="{_escape(val)}"'
+                                          for key, val in labels.items())
+                    lines.append(f'{name}{{{label_text}}} {_number(value)}')
+                else:
+                    lines.append(f'{name} {_number(value)}')
+
+        def histogram(name, help_text, histograms):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} histogram')
+            for labels, (cumulative, total, count), buckets in histograms:
+                prefix = ''.join(f'{key}="{_escape(val)}",' for key, val in labels.items())
+                for bound, value in zip(buckets + ('+Inf',), cumulative):
+                    le = bound if bound == '+Inf' else repr(float(bound))
+                    lines.append(f'{name}_bucket{{{prefix}le="{le}"}} {value}')
+                suffix = '{' + prefix.rstrip(',') + '}' if prefix else ''
+                lines.append(f'{name}_sum{suffix} {_number(total)}')
+                lines.append(f'{name}_count{suffix} {count}')
+
+        now = time.monotonic()
+        latest = dict(self.latest)
+        readings = [(channel, latest[channel]) for channel in self.channels
+                    if channel in latest]
+        metric('ngp800_voltage_volts', 'gauge', 'Latest measured voltage',
+               [({'channel': ch}, v) for ch, (_, v, _) in readings])
+        metric('ngp800_current_amperes', 'gauge', 'Latest measured current',
+               [({'channel': ch}, i) for ch, (_, _, i) in readings])
+        metric('ngp800_sample_age_seconds', 'gauge', 'Age of the latest reading',
+               [({'channel': ch}, now - t) for ch, (t, _, _) in readings])
+        metric('ngp800_samples_total', 'counter', 'Readings received',
+               [({}, self.sample_count)])
+        metric('ngp800_output_state', 'gauge', 'Master output state (1 = ON)',
+               [({}, self.output_state)])
+        metric('ngp800_output_edges_total', 'counter', 'Output ON/OFF edges',
+               [({}, self.edge_count)])
+        metric('ngp800_cycles_total', 'counter', 'ON/OFF cycles started',
+               [({}, self.cycle_count)])
+        metric('ngp800_uptime_seconds', 'gauge', 'Seconds since the metrics were created',
+               [({}, time.time() - self.started)])
+
+        with self._lock:
+            lateness = self.lateness
+            max_lateness = self.max_lateness
+            lateness_snapshot = self.lateness_histogram.snapshot()
+            commands = sorted((label, hist.snapshot())
+                              for label, hist in self.command_histograms.items())
+        metric('ngp800_schedule_lateness_seconds', 'gauge',
+               'Lateness of the latest edge against the schedule', [({}, lateness)])
+        metric('ngp800_schedule_lateness_max_seconds', 'gauge',
+               'Worst edge lateness against the schedule', [({}, max_lateness)])
+        histogram('ngp800_edge_lateness_seconds', 'Edge lateness against the schedule',
+                  [({}, lateness_snapshot, LATENESS_BUCKETS)])
+        histogram('ngp800_command_duration_seconds', 'SCPI exchange duration per command',
+                  [({'command': label}, snapshot, LATENCY_BUCKETS)
+                   for label, snapshot in commands])
+
+        ngx = self.ngx
+        if ngx is not None:
+            intended = dict(ngx.intended)
+            metric('ngp800_channel_output_selected', 'gauge',
+                   'Channel output enabled for the master switch (1 = ON)',
+                   [({'channel': ch}, intended[ch]['output_select']) for ch in self.channels
+                    if 'output_select' in intended.get(ch, {})])
+            metric('ngp800_reconnects_total', 'counter', 'Recoveries of the instrument link',
+                   [({}, ngx.reconnect_count)])
+            metric('ngp800_last_recovery_seconds', 'gauge', 'Duration of the latest recovery',
+                   [({}, ngx.last_recovery_time)])
+            metric('ngp800_max_recovery_seconds', 'gauge', 'Longest recovery',
+                   [({}, ngx.max_recovery_time)])
+            metric('ngp800_link_idle_seconds', 'gauge', 'Seconds since the last exchange',
+                   [({}, now - ngx.last_io)])
+        return '\n'.join(lines) + '\n'
+
+
+class _Handler(BaseHTTPRequestHandler):
+    metrics = None
+
+    def do_GET(self):
+        if self.path.split('?', 1)[0] not in ('/metrics', '/'):
+            self.send_error(404)
+            return
+        body = self.metrics.render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        """Scrapes are not logged"""
+
+
+class MetricsServer:
+    """
+    HTTP endpoint serving PowerMetrics.render() on a daemon thread
+    """
+
+    def __init__(self, metrics, host='127.0.0.1', port=DEFAULT_PORT):
+        """
+        Args:
+            metrics: PowerMetrics instance
+            host: Address to bind (default: localhost only)
+            port: TCP port (default: 9108)
+        """
+        handler = type('MetricsHandler', (_Handler,), {'metrics': metrics})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def address(self):
+        """(host, port) actually bound"""
+        return self.httpd.server_address[:2]
+
+    def start(self):
+        """Serve on a daemon thread"""
+        self._thread = threading.Thread(target=self.httpd.serve_forever,
+                                        name='metrics-server', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=1.0):
+        """Stop serving and close the socket"""
+        if self._thread is not None:
+            self.httpd.shutdown()
+            self._thread.join(timeout)
+            self._thread = None
+        self.httpd.server_close()
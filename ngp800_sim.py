@@ -0,0 +1,436 @@
+#!/usr/bin/env python3
+"""
+Simulated NGP800 instrument for offline use
+
+SimulatedInstrument implements the subset of the PyVISA resource
+interface used by NGP800Controller (write, query, read_bytes, close,
+timeout and terminations) and answers the SCPI commands this project
+sends. It is selected with a 'SIM::<model>' resource string:
+
+    ngx = NGP800Controller('SIM::NGP804')
+
+Model:
+    - Each channel drives a resistive load (default 10 Ω)
+    - After an ON edge the output rises with a first-order response
+      (time constant tau) and the load current follows; the current
+      limit clamps the current and puts the channel into CC mode
+    - Setpoints outside the model ratings push -222 onto the error queue
+    - FastLog produces synthetic V/I captures as binary float32 blocks
+
+Requirements:
+    pip install numpy    (FastLog only)
+"""
+
+import math
+import random
+import struct
+import time
+
+
+# Ratings per model: (channels, max voltage, max current)
+MODELS = {
+    'NGP802': (2, 32.0, 20.0),
+    'NGP804': (4, 32.0, 20.0),
+    'NGP814': (4, 32.0, 20.0),
+    'NGP822': (2, 64.0, 10.0),
+    'NGP824': (4, 64.0, 10.0),
+}
+
+# Nodes that may be omitted in SCPI headers ([SOURce], [:LEVel], ...)
+_OPTIONAL_NODES = {'SOUR', 'LEV', 'IMM', 'AMPL', 'SCAL'}
+
+# Operation instrument summary bits (same as power.OPERATION_BITS)
+_OPER_CV = 1 << 8
+_OPER_CC = 1 << 9
+
+
+def _short_node(node):
+    """Reduce a SCPI node to its short form (VOLTage -> VOLT)"""
+    node = node.upper()
+    digits = ''
+    while node and node[-1].isdigit():
+        digits = node[-1] + digits
+        node = node[:-1]
+    if len(node) > 4:
+        node = node[:3] if node[3] in 'AEIOU' else node[:4]
+    return node + digits
+
+
+def normalize_header(header):
+    """
+    Normalize a SCPI header to its short form without optional nodes
+
+    'SOURce:VOLTage:LEVel:IMMediate:AMPlitude' -> 'VOLT'
+    'OUTPut:GENeral:STATe' -> 'OUTP:GEN'
+    """
+    header = header.strip().lstrip(':')
+    if header.startswith('*'):
+        return header.upper()
+    query = header.endswith('?')
+    nodes = [_short_node(n) for n in header.rstrip('?').split(':') if n]
+    stripped = [n for n in nodes if n not in _OPTIONAL_NODES]
+    # Trailing [:STATe] is optional; a leading STAT is the STATus subsystem
+    if len(stripped) > 1 and stripped[-1] == 'STAT' and stripped[0] != 'STAT':
+        stripped = stripped[:-1]
+    return ':'.join(stripped) + ('?' if query else '')
+
+
+class _Channel:
+    """State of one simulated output channel"""
+
+    def __init__(self):
+        self.voltage = 0.0
+        self.current = 0.1
+        self.selected = False
+        self.enabled = True
+        self.on_since = None
+        self.load = 10.0
+        self.oper_condition = 0
+        self.oper_event = 0
+        self.flog = False
+        self.flog_start = None
+        self.flog_stop = None
+        self.flog_fetched = 0
+
+
+class SimulatedInstrument:
+    """
+    Offline stand-in for the NGP800 PyVISA resource
+    """
+
+    def __init__(self, resource_string='SIM::NGP804', latency=0.0, tau=0.002,
+                 noise=0.0005, seed=None):
+        """
+        Args:
+            resource_string: 'SIM::<model>', e.g. 'SIM::NGP824'
+            latency: Simulated delay per message in seconds (default: 0)
+            tau: Output rise time constant in seconds (default: 0.002)
+            noise: Relative measurement noise (default: 0.0005)
+            seed: Optional random seed for reproducible readings
+        """
+        parts = resource_string.split('::')
+        self.model = parts[1].upper() if len(parts) > 1 and parts[1] else 'NGP804'
+        if self.model not in MODELS:
+            raise ValueError(f"Unknown simulated model '{self.model}'")
+        count, self.max_voltage, self.max_current = MODELS[self.model]
+        self.latency = latency
+        self.tau = tau
+        self.noise = noise
+        self.random = random.Random(seed)
+        self.timeout = 5000
+        self.read_termination = '\n'
+        self.write_termination = '\n'
+        self.channels = {n: _Channel() for n in range(1, count + 1)}
+        self.command_count = 0
+        self._pending = b''
+        self._reset()
+
+    def _reset(self):
+        for channel in self.channels.values():
+            channel.__init__()
+        self.selected = 1
+        self.general = False
+        self.errors = []
+        self.esr = 0
+        self.ese = 0
+        self.sre = 0
+        self.registers = {}
+        self.flog_rate = 1000
+        self.data_format = 'ASC'
+
+    # PyVISA resource interface
+
+    def write(self, message):
+        """Execute a message; query responses are buffered for reading"""
+        if self.latency:
+            time.sleep(self.latency)
+        responses = self._execute(message)
+        if responses:
+            self._pending += b';'.join(responses) + b'\n'
+
+    def query(self, message):
+        """Execute a message and return its response"""
+        self.write(message)
+        return self.read()
+
+    def read(self):
+        """Return the buffered response as text"""
+        data, self._pending = self._pending, b''
+        return data.decode('latin-1')
+
+    def read_raw(self):
+        """Return the buffered response as bytes"""
+        data, self._pending = self._pending, b''
+        return data
+
+    def read_bytes(self, count, break_on_termchar=False):
+        """Return exactly count buffered bytes"""
+        data, self._pending = self._pending[:count], self._pending[count:]
+        return data
+
+    def close(self):
+        """Nothing to release"""
+
+    # SCPI engine
+
+    def _execute(self, message):
+        responses = []
+        for part in message.strip().split(';'):
+            if not part.strip():
+                continue
+            self.command_count += 1
+            header, _, argument = part.strip().partition(' ')
+            try:
+                response = self._command(normalize_header(header),
+                                         argument.strip(), part.strip())
+            except (ValueError, IndexError, KeyError):
+                self._error(-224, 'Illegal parameter value', part)
+                continue
+            if response is not None:
+                responses.append(response if isinstance(response, bytes)
+                                 else str(response).encode())
+        return responses
+
+    def _error(self, code, message, command):
+        self.errors.append(f'{code},"{message};{command.strip()}"')
+        self.esr |= 0x20 if -199 <= code <= -100 else 0x10
+
+    def _channel(self):
+        return self.channels[self.selected]
+
+    def _state(self, argument):
+        return argument.upper() in ('ON', '1')
+
+    def _command(self, header, argument, raw):
+        channel = self._channel()
+
+        # Common commands
+        if header == '*IDN?':
+            return f'Rohde&Schwarz,{self.model},000000/000,1.00.000'
+        if header == '*OPT?':
+            return '0'
+        if header == '*RST':
+            self._reset()
+            return None
+        if header == '*CLS':
+            self.errors = []
+            self.esr = 0
+            for ch in self.channels.values():
+                ch.oper_event = 0
+            return None
+        if header == '*OPC?':
+            return '1'
+        if header == '*OPC':
+            self.esr |= 0x01
+            return None
+        if header == '*ESE':
+            self.ese = int(argument)
+            return None
+        if header == '*SRE':
+            self.sre = int(argument)
+            return None
+        if header == '*ESR?':
+            value, self.esr = self.esr, 0
+            return value
+        if header == '*STB?':
+            return self._status_byte()
+
+        # Channel selection, setpoints and outputs
+        if header == 'INST:SEL' or header == 'INST:NSEL':
+            number = int(argument.upper().replace('OUTP', '').replace('CH', ''))
+            if number not in self.channels:
+                self._error(-222, 'Data out of range', raw)
+            else:
+                self.selected = number
+            return None
+        if header in ('INST:SEL?', 'INST:NSEL?'):
+            return self.selected
+        if header == 'VOLT':
+            value = float(argument)
+            if not 0 <= value <= self.max_voltage:
+                self._error(-222, 'Data out of range', raw)
+            else:
+                channel.voltage = value
+            return None
+        if header == 'VOLT?':
+            return f'{channel.voltage:.3f}'
+        if header == 'CURR':
+            value = float(argument)
+            if not 0 <= value <= self.max_current:
+                self._error(-222, 'Data out of range', raw)
+            else:
+                channel.current = value
+            return None
+        if header == 'CURR?':
+            return f'{channel.current:.4f}'
+        if header == 'OUTP:SEL':
+            channel.selected = self._state(argument)
+            self._update_outputs()
+            return None
+        if header == 'OUTP:SEL?':
+            return int(channel.selected)
+        if header == 'OUTP:GEN':
+            self.general = self._state(argument)
+            self._update_outputs()
+            return None
+        if header == 'OUTP:GEN?':
+            return int(self.general)
+        if header == 'OUTP':
+            channel.enabled = self._state(argument)
+            if channel.enabled:
+                channel.selected = True
+                self.general = True
+            self._update_outputs()
+            return None
+        if header == 'OUTP?':
+            return int(channel.on_since is not None)
+        if header in ('READ?', 'MEAS?', 'MEAS:VOLT?', 'MEAS:CURR?'):
+            voltage, current = self._measure(self.selected, time.monotonic())
+            if header == 'MEAS:VOLT?':
+                return f'{voltage:.4f}'
+            if header == 'MEAS:CURR?':
+                return f'{current:.6f}'
+            if self.data_format == 'REAL':
+                return self._block(struct.pack('<2f', voltage, current))
+            return f'{voltage:.4f},{current:.6f}'
+
+        # Status reporting system
+        if header.startswith('STAT:'):
+            return self._status(header, argument)
+
+        # Error queue
+        if header == 'SYST:ERR:ALL?':
+            errors, self.errors = self.errors, []
+            return ','.join(errors) if errors else '0,"No error"'
+        if header in ('SYST:ERR?', 'SYST:ERR:NEXT?'):
+            return self.errors.pop(0) if self.errors else '0,"No error"'
+
+        # Data format
+        if header in ('FORM', 'FORM:DATA'):
+            self.data_format = 'REAL' if argument.upper().startswith('REAL') else 'ASC'
+            return None
+        if header == 'FORM:BORD':
+            return None
+
+        # FastLog
+        if header.startswith('FLOG'):
+            return self._fastlog(header, argument, raw)
+
+        self._error(-113, 'Undefined header', raw)
+        return None
+
+    def _update_outputs(self):
+        now = time.monotonic()
+        for channel in self.channels.values():
+            on = self.general and channel.selected and channel.enabled
+            if on and channel.on_since is None:
+                channel.on_since = now
+            elif not on:
+                channel.on_since = None
+
+    def _response(self, channel, now):
+        """Noise-free (voltage, current, cc) of a channel at time now"""
+        if channel.on_since is None:
+            return 0.0, 0.0, False
+        elapsed = max(now - channel.on_since, 0.0)
+        target = channel.voltage
+        if channel.load > 0 and target / channel.load > channel.current:
+            target = channel.current * channel.load
+        voltage = target * (1.0 - math.exp(-elapsed / self.tau))
+        current = voltage / channel.load if channel.load > 0 else 0.0
+        cc = target < channel.voltage and elapsed > 3 * self.tau
+        return voltage, current, cc
+
+    def _measure(self, number, now):
+        channel = self.channels[number]
+        voltage, current, cc = self._response(channel, now)
+        condition = _OPER_CC if cc else (_OPER_CV if channel.on_since else 0)
+        channel.oper_event |= condition ^ channel.oper_condition
+        channel.oper_condition = condition
+        jitter = self.random.gauss
+        return (voltage * (1 + jitter(0, self.noise)),
+                current * (1 + jitter(0, self.noise)))
+
+    def _status_byte(self):
+        stb = 0
+        if self.errors:
+            stb |= 0x04
+        if any(self.registers.get(f'OPER:INST:ISUM{n}:ENAB', 0) & ch.oper_event
+               for n, ch in self.channels.items()):
+            stb |= 0x80
+        if self.esr & self.ese:
+            stb |= 0x20
+        return stb
+
+    def _status(self, header, argument):
+        path = header.rstrip('?')[len('STAT:'):]
+        nodes = path.split(':')
+        if not header.endswith('?'):
+            self.registers[path] = int(argument)
+            return None
+        if nodes[0] == 'OPER' and len(nodes) == 4 and nodes[2].startswith('ISUM'):
+            channel = self.channels[int(nodes[2][4:])]
+            if nodes[3] == 'COND':
+                return channel.oper_condition
+            if nodes[3] == 'EVEN':
+                value, channel.oper_event = channel.oper_event, 0
+                return value
+        if nodes[-1] in ('EVEN', 'COND'):
+            return 0
+        return self.registers.get(path, 0)
+
+    def _block(self, payload):
+        length = str(len(payload)).encode()
+        return b'#' + str(len(length)).encode() + length + payload
+
+    def _fastlog(self, header, argument, raw):
+        channel = self._channel()
+        if header == 'FLOG:SRAT':
+            rate = argument.upper().lstrip('S')
+            scale = 1000 if rate.endswith('K') else 1
+            self.flog_rate = int(float(rate.rstrip('K')) * scale)
+            return None
+        if header in ('FLOG:TARG', 'FLOG:TRIG'):
+            return None
+        if header == 'FLOG':
+            channel.flog = self._state(argument)
+            if channel.flog:
+                channel.flog_start = time.monotonic()
+                channel.flog_stop = None
+                channel.flog_fetched = 0
+            elif channel.flog_start is not None:
+                channel.flog_stop = time.monotonic()
+            return None
+        if header == 'FLOG?':
+            return int(channel.flog)
+        if header == 'FLOG:DATA?':
+            return self._block(self._fastlog_data(channel))
+        self._error(-113, 'Undefined header', raw)
+        return None
+
+    def _fastlog_data(self, channel, max_samples=65536):
+        """Synthetic float32 V/I pairs captured since the last fetch"""
+        import numpy as np
+
+        if channel.flog_start is None:
+            return b''
+        end = channel.flog_stop if channel.flog_stop is not None else time.monotonic()
+        available = int((end - channel.flog_start) * self.flog_rate)
+        count = min(available - channel.flog_fetched, max_samples)
+        if count <= 0:
+            return b''
+        index = np.arange(channel.flog_fetched, channel.flog_fetched + count)
+        now = channel.flog_start + index / self.flog_rate
+        voltage = np.zeros(count)
+        current = np.zeros(count)
+        if channel.on_since is not None:
+            elapsed = np.maximum(now - channel.on_since, 0.0)
+            target = min(channel.voltage, channel.current * channel.load)
+            voltage = target * (1.0 - np.exp(-elapsed / self.tau))
+            current = voltage / channel.load
+        rng = np.random.default_rng(self.random.getrandbits(32))
+        data = np.empty((count, 2), dtype='<f4')
+        data[:, 0] = voltage * (1 + rng.normal(0, self.noise, count))
+        data[:, 1] = current * (1 + rng.normal(0, self.noise, count))
+        channel.flog_fetched += count
+        return data.tobytes()
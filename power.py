@@ -20,11 +20,198 @@ Configuration:
     Edit POWER_SUPPLY_IP and LED_PIN variables below
 """
 
+import argparse
 import time
-import pyvisa
+import re
 import signal
 import sys
-from gpiozero import LED
+import threading
+from contextlib import contextmanager
+from connection_supervisor import ConnectionSupervisor
+from cycle_config import (ConfigError, ConfigWatcher, apply_setpoints,
+                          channel_changes, diff_config, load_config,
+                          revert_setpoints)
+from emergency_off import EmergencyOff
+from energy import EnergyAccumulator
+from event_log import LEVELS, default_log
+from telemetry import MeasurementSampler, SampleRecorder
+from startup import CapabilityCache, StartupTimer
+from status_monitor import StatusMonitor
+from watchdog import Watchdog, ThresholdRule
+
+
+# Status byte (*STB?) summary bits
+STB_ERROR_QUEUE = 0x04
+STB_QUESTIONABLE = 0x08
+STB_EVENT_STATUS = 0x20
+STB_OPERATION = 0x80
+
+# INSTrument summary bit in STATus:QUEStionable / STATus:OPERation
+INSTRUMENT_SUMMARY_BIT = 13
+
+# Per-channel instrument summary register bits (STAT:...:INST:ISUM<n>)
+QUESTIONABLE_BITS = {
+    0: 'voltage_limit',
+    1: 'current_limit',
+    4: 'overtemperature',
+    9: 'ovp_tripped',
+    10: 'fuse_tripped',
+    11: 'opp_tripped',
+}
+OPERATION_BITS = {
+    8: 'cv',
+    9: 'cc',
+}
+
+# Cycle messages go through a background thread instead of print(); the
+# background components report their errors to the same instance
+log = default_log()
+
+# *ESR? bits reported as errors: query, device, execution, command error
+ESR_ERROR_MASK = 0x3C
+
+
+def visa_errors():
+    """
+    Exception classes for `except visa_errors():` clauses
+
+    The clause is only evaluated when an exception propagates, so pyvisa is
+    not imported just to catch its errors; if pyvisa was never loaded,
+    nothing raised can be a VisaIOError and the empty tuple matches nothing.
+    """
+    pyvisa = sys.modules.get('pyvisa')
+    return (pyvisa.errors.VisaIOError,) if pyvisa else ()
+
+
+def connection_errors():
+    """
+    Exception classes meaning the link to the instrument is broken
+
+    VISA I/O errors (timeouts, lost sessions) plus the socket errors a
+    transport may let through; SCPIError and ValueError are not included,
+    the instrument answered those.
+    """
+    return visa_errors() + (OSError, EOFError)
+
+
+def chain(commands):
+    """
+    Join SCPI commands into a single message
+
+    Args:
+        commands: Iterable of commands, e.g. ['INST:SEL 1', 'READ?', '*OPC?']
+
+    Returns:
+        str: Chained message, e.g. 'INST:SEL 1;:READ?;*OPC?'
+    """
+    parts = []
+    for command in commands:
+        if parts and not command.startswith('*'):
+            command = ':' + command
+        parts.append(command)
+    return ';'.join(parts)
+
+
+def _on_off(value):
+    """SCPI boolean for True/False, other values unchanged"""
+    if isinstance(value, bool):
+        return 'ON' if value else 'OFF'
+    return value
+
+
+def _bit_mask(bits):
+    return sum(1 << bit for bit in bits)
+
+
+def _status_commands(channels):
+    """Commands routing the status events of the channels to the status byte"""
+    ques_mask = _bit_mask(QUESTIONABLE_BITS)
+    oper_mask = _bit_mask(OPERATION_BITS)
+    inst_mask = _bit_mask(channels)
+    commands = ['*CLS', f'*ESE {ESR_ERROR_MASK}']
+    for channel in channels:
+        for register, mask in (('QUES', ques_mask), ('OPER', oper_mask)):
+            prefix = f'STAT:{register}:INST:ISUM{channel}'
+            commands += [f'{prefix}:PTR {mask}', f'{prefix}:NTR {mask}',
+                         f'{prefix}:ENAB {mask}']
+    for register in ('QUES', 'OPER'):
+        commands += [f'STAT:{register}:INST:ENAB {inst_mask}',
+                     f'STAT:{register}:ENAB {1 << INSTRUMENT_SUMMARY_BIT}']
+    # The error queue bit stays set until SYST:ERR? drains it, which is
+    # left to the error policy; errors are signalled through the ESB
+    srq_mask = STB_QUESTIONABLE | STB_EVENT_STATUS | STB_OPERATION
+    commands.append(f'*SRE {srq_mask}')
+    return commands
+
+
+# FastLog sample rates (samples per second -> FLOG:SRATe token)
+FASTLOG_RATES = {
+    500000: 'S500K',
+    250000: 'S250K',
+    50000: 'S50K',
+    10000: 'S10K',
+    1000: 'S1K',
+    100: 'S100',
+    10: 'S10',
+    1: 'S1',
+}
+
+# Cached per-channel settings and the commands re-applying them
+_RESTORE_COMMANDS = (
+    ('voltage', 'SOURce:VOLTage:LEVel:IMMediate:AMPlitude {}'),
+    ('current', 'SOURce:CURRent:LEVel:IMMediate:AMPlitude {}'),
+    ('output_select', 'OUTPut:SELect {}'),
+    ('output_state', 'OUTPut:STATe {}'),
+)
+
+# Keys accepted by NGP800Controller.send_settings()
+_SETTING_COMMANDS = dict(_RESTORE_COMMANDS)
+
+# Error check policies for NGP800Controller.set_error_policy()
+ERROR_POLICIES = ('off', 'batch', 'every', 'timer')
+
+# One entry of a SYSTem:ERRor:ALL? reply: -222,"Data out of range"
+_ERROR_ENTRY = re.compile(r'(-?\d+),"([^"]*)"')
+
+
+class SCPIError(Exception):
+    """
+    Errors reported by the instrument's error queue
+    """
+
+    def __init__(self, errors, commands):
+        """
+        Args:
+            errors: List of (code, message, command) tuples; command is the
+                    sent command the error refers to, or None if unknown
+            commands: Commands sent since the previous error check
+        """
+        self.errors = errors
+        self.commands = commands
+        lines = []
+        for code, message, command in errors:
+            origin = f" (from '{command}')" if command else ''
+            lines.append(f'{code},"{message}"{origin}')
+        super().__init__(f"{len(errors)} SCPI error(s) in {len(commands)} "
+                         f"command(s): " + '; '.join(lines))
+
+
+def _find_error_source(message, commands):
+    """
+    Attribute an error to a sent command
+
+    R&S instruments append the offending header to the message, e.g.
+    'Data out of range;SOURce:CURRent:LEVel:IMMediate:AMPlitude 99'.
+    A single command since the last check is attributed directly.
+    """
+    if len(commands) == 1:
+        return commands[0]
+    if ';' in message:
+        detail = message.split(';', 1)[1].strip().upper()
+        for command in reversed(commands):
+            if detail and detail in command.upper():
+                return command
+    return None
 
 
 class NGP800Controller:
@@ -32,31 +219,203 @@ class NGP800Controller:
     Rohde & Schwarz NGP800 Power Supply Controller using PyVISA
     """
 
-    def __init__(self, resource_string, timeout=5000):
+    def __init__(self, resource_string, timeout=5000, record_path=None):
         """
         Initialize connection to NGP800
 
         Args:
-            resource_string: VISA resource string (e.g., 'TCPIP0::192.168.1.100::inst0::INSTR')
+            resource_string: VISA resource string (e.g., 'TCPIP0::192.168.1.100::inst0::INSTR'),
+                             'SIM::<model>' for the offline simulator, or
+                             'REPLAY::<file>' / 'REPLAY-REALTIME::<file>' to
+                             replay a recorded session
             timeout: Communication timeout in milliseconds (default: 5000)
+            record_path: Optional file to record all traffic to (see scpi_session.py)
         """
-        self.rm = pyvisa.ResourceManager('@py')
+        self.resource_string = resource_string
+        self.timeout = timeout
+        self.record_path = record_path
+        self.rm = None
         try:
-            self.instrument = self.rm.open_resource(resource_string)
-            self.instrument.timeout = timeout
-            self.instrument.read_termination = '\n'
-            self.instrument.write_termination = '\n'
+            instrument = self._open_transport()
+            if record_path:
+                from scpi_session import RecordingInstrument
+                instrument = RecordingInstrument(instrument, record_path,
+                                                 resource_string)
+            self.instrument = instrument
+            self._configure_transport()
         except Exception as e:
             print(f"Error connecting to instrument: {e}")
             raise
+        # Serializes access when a sampler thread shares the session
+        self._lock = threading.RLock()
+        self.status_channels = []
+        self.binary_format = False
+        self.error_policy = 'off'
+        self.error_every = 10
+        self.error_interval = 1.0
+        self._unchecked = []
+        self._last_error_check = time.monotonic()
+        self._batch_depth = 0
+        # State the program asked for, re-applied after a reconnect
+        self.intended = {}
+        self.intended_general = None
+        self.selected_channel = None
+        # Connection supervision
+        self.generation = 0
+        self.last_io = time.monotonic()
+        self.reconnect_count = 0
+        self.last_recovery_time = None
+        self.max_recovery_time = 0.0
+        # Optional callable(command, seconds) timing every exchange
+        self.command_observer = None
+
+    def _open_transport(self):
+        """Open the transport named by the resource string"""
+        resource_string = self.resource_string
+        if resource_string.startswith('SIM::'):
+            # Offline simulator, e.g. 'SIM::NGP804' (see ngp800_sim.py)
+            from ngp800_sim import SimulatedInstrument
+            return SimulatedInstrument(resource_string)
+        if resource_string.startswith(('REPLAY::', 'REPLAY-REALTIME::')):
+            from scpi_session import ReplayInstrument
+            mode, path = resource_string.split('::', 1)
+            return ReplayInstrument(path, realtime=(mode == 'REPLAY-REALTIME'))
+        if self.rm is None:
+            # Imported here: pyvisa (and NumPy, which it pulls in) is
+            # the bulk of the start time and only this transport needs it
+            import pyvisa
+            self.rm = pyvisa.ResourceManager('@py')
+        return self.rm.open_resource(resource_string, open_timeout=self.timeout)
+
+    def _configure_transport(self):
+        self.instrument.timeout = self.timeout
+        self.instrument.read_termination = '\n'
+        self.instrument.write_termination = '\n'
 
     def query(self, command):
         """Send a query command and return the response"""
-        return self.instrument.query(command).strip()
+        with self._lock:
+            start = time.monotonic()
+            response = self.instrument.query(command).strip()
+            self._io_done(command, start)
+            return response
 
     def write(self, command):
         """Send a write command"""
-        self.instrument.write(command)
+        with self._lock:
+            start = time.monotonic()
+            self.instrument.write(command)
+            self._io_done(command, start)
+
+    def write_deferred(self, command):
+        """
+        Send a write command without running a due error check
+
+        For streamed writes (e.g. ramp steps) that must not wait for a round
+        trip: unless the policy is 'off', the command is tracked for the next
+        check_errors(), which the caller runs once the stream is done.
+        """
+        with self._lock:
+            start = time.monotonic()
+            self.instrument.write(command)
+            self._io_done(command, start, deferred=True)
+
+    def set_error_policy(self, policy, every=10, interval=1.0):
+        """
+        Configure when the instrument error queue is checked
+
+        Policies:
+            'off'   - never check automatically (check_errors() still works)
+            'batch' - check when the outermost batch() block exits
+            'every' - check after every N commands
+            'timer' - check on the first command after the interval elapsed
+
+        Each check drains the whole error queue with one SYSTem:ERRor:ALL?
+        and raises SCPIError naming the commands sent since the last check.
+
+        Args:
+            policy: One of ERROR_POLICIES
+            every: Command count for the 'every' policy (default: 10)
+            interval: Seconds for the 'timer' policy (default: 1.0)
+        """
+        if policy not in ERROR_POLICIES:
+            raise ValueError(f"Unknown error policy '{policy}', "
+                             f"expected one of {ERROR_POLICIES}")
+        with self._lock:
+            self.error_policy = policy
+            self.error_every = every
+            self.error_interval = interval
+            self._unchecked = []
+            self._last_error_check = time.monotonic()
+
+    def _io_done(self, command, start, deferred=False):
+        """Bookkeeping after a completed exchange started at start"""
+        self.last_io = time.monotonic()
+        if self.command_observer is not None:
+            self.command_observer(command, self.last_io - start)
+        self._command_sent(command, deferred)
+
+    def _command_sent(self, command, deferred=False):
+        """Track a sent command and run a due error check (unless deferred)"""
+        if self.error_policy == 'off':
+            return
+        if deferred:
+            self._unchecked.append(command)
+            return
+        if self.error_policy == 'batch' and not self._batch_depth:
+            return
+        self._unchecked.append(command)
+        if self._batch_depth:
+            return
+        if self.error_policy == 'every':
+            if len(self._unchecked) >= self.error_every:
+                self.check_errors()
+        elif self.error_policy == 'timer':
+            if time.monotonic() - self._last_error_check >= self.error_interval:
+                self.check_errors()
+
+    @contextmanager
+    def batch(self):
+        """
+        Group commands; automatic checks are deferred until the block exits
+
+        With the 'batch' policy (and the others, if commands are pending) the
+        error queue is drained once when the outermost block exits. The
+        session is held for the whole block, so other threads cannot
+        interleave commands (e.g. change the selected channel).
+        """
+        with self._lock:
+            self._batch_depth += 1
+            try:
+                yield self
+            finally:
+                self._batch_depth -= 1
+            if self._batch_depth == 0 and self.error_policy != 'off':
+                self.check_errors()
+
+    def check_errors(self):
+        """
+        Drain the error queue in one exchange
+
+        Raises:
+            SCPIError: If the instrument reported any errors
+
+        Returns:
+            list: Commands covered by this check
+        """
+        with self._lock:
+            response = self.instrument.query('SYSTem:ERRor:ALL?').strip()
+            commands, self._unchecked = self._unchecked, []
+            self._last_error_check = time.monotonic()
+
+        errors = []
+        for code, message in _ERROR_ENTRY.findall(response):
+            if int(code) != 0:
+                errors.append((int(code), message,
+                               _find_error_source(message, commands)))
+        if errors:
+            raise SCPIError(errors, commands)
+        return commands
 
     def get_idn(self):
         """Get instrument identification"""
@@ -64,8 +423,67 @@ class NGP800Controller:
 
     def reset(self):
         """Reset the instrument to default state"""
-        self.write('*RST')
-        time.sleep(1)  # Wait for reset to complete
+        # *OPC? returns once the reset has completed, no fixed delay needed
+        self.query('*RST;*OPC?')
+        self._forget_state()
+
+    def reset_and_identify(self):
+        """
+        Identify and reset the instrument in a single round trip
+
+        Returns:
+            str: *IDN? response
+        """
+        idn = self.query('*IDN?;*RST;*OPC?').rsplit(';', 1)[0]
+        self._forget_state()
+        return idn
+
+    def query_capabilities(self, idn):
+        """
+        Query what startup needs to know about the instrument
+
+        Args:
+            idn: *IDN? response
+
+        Returns:
+            dict: idn, model, channels (number of outputs), options (*OPT?)
+        """
+        fields = [field.strip() for field in idn.split(',')]
+        model = fields[1] if len(fields) > 1 else ''
+        # NGP802/822: two outputs, NGP804/814/824: four
+        match = re.match(r'NGP8\d(\d)$', model)
+        return {'idn': idn, 'model': model,
+                'channels': int(match.group(1)) if match else 4,
+                'options': self.query('*OPT?').strip()}
+
+    def _intend(self, key, value):
+        """Record a setting of the selected channel before sending it"""
+        self.intended.setdefault(self.selected_channel, {})[key] = value
+
+    def _reselect(self, channel):
+        """
+        Commands putting the instrument selection back after a measurement
+
+        Measurements select other channels on the instrument; appending this
+        to the same message leaves the selection (and selected_channel, on
+        which _intend() relies) as the main thread last set it. Call with
+        the session lock held.
+
+        Args:
+            channel: Last channel the measurement selected
+
+        Returns:
+            list: Empty, or one INSTrument:SELect command
+        """
+        if self.selected_channel is None or self.selected_channel == channel:
+            return []
+        return [f'INSTrument:SELect {self.selected_channel}']
+
+    def _forget_state(self):
+        """After *RST the instrument is back at its defaults"""
+        self.intended = {}
+        self.intended_general = None
+        self.selected_channel = None
 
     def set_general_output_state(self, state):
         """
@@ -75,6 +493,7 @@ class NGP800Controller:
             state: True for ON, False for OFF
         """
         state_str = 'ON' if state else 'OFF'
+        self.intended_general = state
         self.write(f'OUTPut:GENeral:STATe {state_str}')
 
     def select_channel(self, channel):
@@ -84,7 +503,9 @@ class NGP800Controller:
         Args:
             channel: Channel number (1-4 depending on model)
         """
-        self.write(f'INSTrument:SELect {channel}')
+        with self._lock:
+            self.selected_channel = channel
+            self.write(f'INSTrument:SELect {channel}')
 
     def set_voltage(self, voltage):
         """
@@ -93,6 +514,7 @@ class NGP800Controller:
         Args:
             voltage: Voltage in Volts
         """
+        self._intend('voltage', voltage)
         self.write(f'SOURce:VOLTage:LEVel:IMMediate:AMPlitude {voltage}')
 
     def set_current(self, current):
@@ -102,6 +524,7 @@ class NGP800Controller:
         Args:
             current: Current in Amperes
         """
+        self._intend('current', current)
         self.write(f'SOURce:CURRent:LEVel:IMMediate:AMPlitude {current}')
 
     def set_output_select(self, state):
@@ -112,8 +535,63 @@ class NGP800Controller:
             state: True for ON, False for OFF
         """
         state_str = 'ON' if state else 'OFF'
+        self._intend('output_select', state)
         self.write(f'OUTPut:SELect {state_str}')
 
+    def set_output_state(self, state):
+        """
+        Switch the selected channel's output directly (OUTPut:STATe)
+
+        Turning a channel ON this way also enables the master switch; OFF
+        affects only the selected channel.
+
+        Args:
+            state: True for ON, False for OFF
+        """
+        state_str = 'ON' if state else 'OFF'
+        self._intend('output_state', state)
+        if state:
+            self.intended_general = True
+        self.write(f'OUTPut:STATe {state_str}')
+
+    def send_settings(self, settings, sync=False):
+        """
+        Send settings of several channels as one chained message
+
+        The intended state is updated as by the individual setters, so a
+        reconnect restores these settings, and INSTrument:SELect is only
+        sent when the channel changes.
+
+        Args:
+            settings: (channel, key, value) tuples in order; key is 'voltage',
+                      'current', 'output_select' or 'output_state', or
+                      (None, 'general', state) for the master switch
+            sync: Append *OPC? and wait until the instrument has executed
+                  the message
+        """
+        with self._lock:
+            commands = []
+            for channel, key, value in settings:
+                if key == 'general':
+                    self.intended_general = bool(value)
+                    commands.append(f'OUTPut:GENeral:STATe {_on_off(value)}')
+                    continue
+                # Always select first: the emergency channel and FastLog
+                # may have changed the instrument-wide selection
+                if channel != self.selected_channel or not commands:
+                    self.selected_channel = channel
+                    commands.append(f'INSTrument:SELect {channel}')
+                self._intend(key, value)
+                if key == 'output_state' and value:
+                    self.intended_general = True
+                commands.append(_SETTING_COMMANDS[key].format(_on_off(value)))
+            if not commands:
+                return
+            if sync:
+                self.query(chain(commands + ['*OPC?']))
+            else:
+                self.write(chain(commands))
+
     def read_measurement(self):
         """
         Read voltage and current measurement from currently selected channel
@@ -128,82 +606,500 @@ class NGP800Controller:
         current = float(values[1])
         return voltage, current
 
+    def measure_channel(self, channel):
+        """
+        Select a channel and read its measurement in one exchange
+
+        Safe to call from a sampler thread while other code uses the session:
+        the previously selected channel is selected again in the same message.
+
+        Args:
+            channel: Channel number (1-4 depending on model)
+
+        Returns:
+            tuple: (voltage, current) in V and A
+        """
+        if self.binary_format:
+            voltage, current = self.measure_channels([channel])[0]
+            return float(voltage), float(current)
+        with self._lock:
+            response = self.query(chain([f'INSTrument:SELect {channel}', 'READ?']
+                                        + self._reselect(channel)))
+        values = response.split(',')
+        return float(values[0]), float(values[1])
+
+    def set_binary_format(self, binary):
+        """
+        Select binary (REAL,32 little-endian) or ASCII measurement replies
+
+        Args:
+            binary: True for binary, False for ASCII (the power-on default)
+        """
+        if binary:
+            self.write(chain(['FORMat:DATA REAL,32', 'FORMat:BORDer SWAPped']))
+        else:
+            self.write('FORMat:DATA ASCii')
+        self.binary_format = binary
+
+    def query_raw(self, command):
+        """
+        Send a query and return the undecoded response bytes
+
+        Args:
+            command: Query command
+
+        Returns:
+            bytes: Response including the terminator
+        """
+        with self._lock:
+            start = time.monotonic()
+            self.instrument.write(command)
+            response = self.instrument.read_raw()
+            self._io_done(command, start)
+            return response
+
+    def measure_channels(self, channels, out=None):
+        """
+        Measure several channels with one chained query and bulk parsing
+
+        The reply is parsed straight from the receive buffer (see
+        scpi_parse.py): zero-copy in binary format, split/float or NumPy's
+        number parser (long sweeps) in ASCII format.
+
+        Args:
+            channels: Channel numbers, e.g. [1, 2, 3, 4]
+            out: Optional preallocated float64 array of shape (n, 2)
+
+        Raises:
+            ValueError: If the reply does not hold one pair per channel
+
+        Returns:
+            numpy.ndarray: (voltage, current) row per channel
+        """
+        import numpy as np
+        from scpi_parse import (parse_ascii_values, parse_read_blocks,
+                                read_reply_size)
+
+        commands = []
+        for channel in channels:
+            commands += [f'INSTrument:SELect {channel}', 'READ?']
+        if out is None:
+            out = np.empty((len(channels), 2))
+
+        with self._lock:
+            # Built under the lock: the selection to restore is the current one
+            message = chain(commands + self._reselect(channel))
+            binary = self.binary_format
+            if binary:
+                start = time.monotonic()
+                self.instrument.write(message)
+                data = self.instrument.read_bytes(read_reply_size(len(channels)))
+                self._io_done(message, start)
+            else:
+                data = self.query_raw(message)
+        if binary:
+            records = parse_read_blocks(data)
+            out[:, 0] = records['voltage']
+            out[:, 1] = records['current']
+        else:
+            parse_ascii_values(data, out=out.reshape(-1), count=2 * len(channels))
+        return out
+
+    def enable_status_events(self, channels=(1, 2, 3, 4)):
+        """
+        Enable the SCPI status model for CV/CC, protection and error events
+
+        Both transitions (PTR and NTR) are enabled so that entering and
+        leaving a state is reported. The summaries are routed to the status
+        byte, so a single *STB? tells whether anything happened.
+
+        Args:
+            channels: Channel numbers to monitor
+        """
+        self.write(chain(_status_commands(channels)))
+        self.status_channels = list(channels)
+
+    def read_status_byte(self):
+        """
+        Read the status byte - one cheap query covering all summaries
+
+        Returns:
+            int: Status byte value
+        """
+        return int(self.query('*STB?'))
+
+    def poll_status_events(self):
+        """
+        Check the status byte and decode any pending events
+
+        Costs one *STB? while nothing happens. When a summary bit is set,
+        all affected event and condition registers are read and cleared in
+        a single chained query.
+
+        New errors are detected through the event status bit (*ESR? clears
+        it), not the error queue bit: that one stays set until the queue is
+        drained, which check_errors() does under the error policy, and would
+        otherwise repeat the chained query on every poll.
+
+        Returns:
+            list: (channel, name, active) tuples. CV/CC and protection events
+                  carry the channel and whether the condition is now active;
+                  errors are reported as (None, 'error', esr_value).
+        """
+        stb = self.read_status_byte()
+        registers = []
+        if stb & STB_QUESTIONABLE:
+            registers.append(('QUES', QUESTIONABLE_BITS))
+        if stb & STB_OPERATION:
+            registers.append(('OPER', OPERATION_BITS))
+        check_errors = bool(stb & STB_EVENT_STATUS)
+        if not registers and not check_errors:
+            return []
+
+        queries = []
+        for register, _ in registers:
+            queries += [f'STAT:{register}:EVEN?', f'STAT:{register}:INST:EVEN?']
+            for channel in self.status_channels:
+                prefix = f'STAT:{register}:INST:ISUM{channel}'
+                queries += [f'{prefix}:EVEN?', f'{prefix}:COND?']
+        if check_errors:
+            queries.append('*ESR?')
+        values = [int(value) for value in self.query(chain(queries)).split(';')]
+
+        events = []
+        index = 0
+        for register, bits in registers:
+            index += 2  # summary event registers, read only to clear them
+            for channel in self.status_channels:
+                event, condition = values[index], values[index + 1]
+                index += 2
+                for bit, name in bits.items():
+                    if event & (1 << bit):
+                        events.append((channel, name, bool(condition & (1 << bit))))
+        if check_errors and values[index] & ESR_ERROR_MASK:
+            events.append((None, 'error', values[index]))
+        return events
+
+    def read_block(self, command):
+        """
+        Send a query answered with an IEEE 488.2 definite-length block
+
+        The payload is read as raw bytes ('#<n><length><data>'), so binary
+        data may contain any byte including the termination character.
+
+        Args:
+            command: Query command, e.g. 'FLOG:DATA?'
+
+        Returns:
+            bytes: Block payload without header and terminator
+        """
+        with self._lock:
+            start = time.monotonic()
+            self.instrument.write(command)
+            header = self.instrument.read_bytes(2)
+            if header[:1] != b'#' or not header[1:2].isdigit() or header[1:2] == b'0':
+                raise ValueError(f"Expected definite-length block, got {header!r}")
+            length = int(self.instrument.read_bytes(int(header[1:2])))
+            payload = self.instrument.read_bytes(length) if length else b''
+            self.instrument.read_bytes(1)  # message terminator
+            self._io_done(command, start)
+            return payload
+
+    def configure_fastlog(self, channel, sample_rate):
+        """
+        Configure FastLog capture of a channel to the SCPI interface
+
+        Data is transferred as little-endian 32-bit float (voltage, current)
+        pairs so it can be copied into NumPy arrays without conversion.
+
+        Args:
+            channel: Channel number
+            sample_rate: Samples per second, one of FASTLOG_RATES
+        """
+        if sample_rate not in FASTLOG_RATES:
+            raise ValueError(f"Unsupported FastLog rate {sample_rate}, "
+                             f"expected one of {sorted(FASTLOG_RATES)}")
+        with self._lock:
+            self.write(chain([f'INSTrument:SELect {channel}',
+                              'FLOG:TARGet SCPI',
+                              f'FLOG:SRATe {FASTLOG_RATES[sample_rate]}',
+                              'FORMat:BORDer SWAPped'] + self._reselect(channel)))
+
+    def set_fastlog_state(self, channel, state):
+        """
+        Arm (start) or stop FastLog capture of a channel
+
+        Args:
+            channel: Channel number
+            state: True to start logging, False to stop
+        """
+        state_str = 'ON' if state else 'OFF'
+        with self._lock:
+            self.write(chain([f'INSTrument:SELect {channel}', f'FLOG:STATe {state_str}']
+                             + self._reselect(channel)))
+
+    def read_fastlog_block(self, channel):
+        """
+        Fetch the FastLog samples captured since the previous fetch
+
+        Args:
+            channel: Channel number
+
+        Returns:
+            bytes: Little-endian float32 (voltage, current) pairs
+        """
+        with self._lock:
+            return self.read_block(chain([f'INSTrument:SELect {channel}', 'FLOG:DATA?']
+                                         + self._reselect(channel)))
+
+    def ping(self):
+        """
+        Cheap keep-alive round trip
+
+        Raises:
+            connection_errors(): If the link is dead
+
+        Returns:
+            float: Round-trip time in seconds
+        """
+        start = time.monotonic()
+        self.query('*OPC?')
+        return time.monotonic() - start
+
+    def restore_state(self):
+        """
+        Re-apply the cached intended state in one chained message
+
+        Only what this session set is sent: per-channel setpoints and output
+        selection, the master switch (last, once the setpoints are in place),
+        status event routing, the binary data format and the selected
+        channel. The trailing *OPC? confirms everything was executed.
+        """
+        commands = []
+        for channel in sorted(ch for ch in self.intended if ch is not None):
+            settings = self.intended[channel]
+            commands.append(f'INSTrument:SELect {channel}')
+            for key, command in _RESTORE_COMMANDS:
+                if key in settings:
+                    commands.append(command.format(_on_off(settings[key])))
+        if self.intended_general is not None:
+            commands.append(f'OUTPut:GENeral:STATe {_on_off(self.intended_general)}')
+        if self.status_channels:
+            commands += _status_commands(self.status_channels)
+        if self.binary_format:
+            commands += ['FORMat:DATA REAL,32', 'FORMat:BORDer SWAPped']
+        if self.selected_channel is not None:
+            commands.append(f'INSTrument:SELect {self.selected_channel}')
+        commands.append('*OPC?')
+        with self._lock:
+            self.instrument.query(chain(commands))
+            self.last_io = time.monotonic()
+
+    def reconnect(self, generation=None, initial_delay=0.5, max_delay=10.0,
+                  timeout=None, stop=None):
+        """
+        Reopen the session and restore the intended state
+
+        The session is held for the whole recovery, so other threads
+        sharing it wait instead of failing. The ResourceManager is reused;
+        only the instrument session is reopened, retrying with exponential
+        backoff. A recording keeps going in the same file.
+
+        Args:
+            generation: generation seen by the caller when its I/O failed;
+                        if another thread reconnected since, nothing is done
+            initial_delay: Seconds before the second attempt
+            max_delay: Upper bound of the delay between attempts
+            timeout: Give up after this many seconds (None: keep trying)
+            stop: Optional threading.Event aborting the retries
+
+        Raises:
+            connection_errors(): If timeout elapsed or stop was set
+
+        Returns:
+            float: Seconds until the link was restored (0.0 if another
+                   thread had already recovered it)
+        """
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return 0.0
+            start = time.monotonic()
+            delay = initial_delay
+            while True:
+                try:
+                    self._close_transport()
+                    instrument = self._open_transport()
+                    if self.record_path:
+                        self.instrument._instrument = instrument
+                    else:
+                        self.instrument = instrument
+                    self._configure_transport()
+                    self.restore_state()
+                    break
+                except connection_errors():
+                    elapsed = time.monotonic() - start
+                    if ((timeout is not None and elapsed + delay > timeout) or
+                            (stop is not None and stop.is_set())):
+                        raise
+                if stop is not None:
+                    stop.wait(delay)
+                else:
+                    time.sleep(delay)
+                delay = min(delay * 2, max_delay)
+
+            # Errors of the old session cannot be attributed any more
+            self._unchecked = []
+            self.generation += 1
+            self.reconnect_count += 1
+            self.last_recovery_time = time.monotonic() - start
+            self.max_recovery_time = max(self.max_recovery_time,
+                                         self.last_recovery_time)
+            return self.last_recovery_time
+
+    def _close_transport(self):
+        """Close the instrument session, keeping a recording open"""
+        instrument = self.instrument._instrument if self.record_path else self.instrument
+        try:
+            instrument.close()
+        except Exception:
+            pass
+
     def close(self):
         """Close the connection"""
         if hasattr(self, 'instrument'):
             self.instrument.close()
-        if hasattr(self, 'rm'):
+        if self.rm is not None:
             self.rm.close()
 
 
-def initialize_system(ngx, led):
+# Per-channel (voltage, current) used without a configuration file
+DEFAULT_SETPOINTS = {channel: (25.0, 6.0) for channel in range(1, 5)}
+
+
+def protection_rules(voltage, current, overcurrent=0.92, undervoltage=0.92, samples=3):
+    """
+    Watchdog rules of one channel, relative to its setpoints
+
+    Args:
+        voltage: Voltage setpoint in V
+        current: Current limit in A
+        overcurrent: Trip above this fraction of the current limit
+        undervoltage: Trip below this fraction of the voltage setpoint
+        samples: Consecutive violating samples before tripping
+
+    Returns:
+        list: ThresholdRule instances for Watchdog.set_rules()
+    """
+    return [ThresholdRule('current', above=current * overcurrent, samples=samples),
+            ThresholdRule('voltage', below=voltage * undervoltage, samples=samples)]
+
+
+def initialize_power_supply(ngx, setpoints=None, reset=True):
+    """
+    Reset the power supply and configure all outputs
+
+    Args:
+        ngx: NGP800Controller instance
+        setpoints: {channel: (voltage, current)} (default: 25 V / 6 A on
+                   channels 1-4)
+        reset: Send *RST first (default: True)
+    """
+    if setpoints is None:
+        setpoints = DEFAULT_SETPOINTS
+    log.info('init', "\nInitializing Power Supply...")
+    if reset:
+        log.info('init', "  - Resetting instrument...")
+        ngx.reset()
+
+    # Rejected setpoints raise SCPIError when the batch exits
+    with ngx.batch():
+        log.info('init', "  - Turning OFF all outputs (master switch)...")
+        ngx.set_general_output_state(False)
+
+        # Configure all outputs
+        for channel, (voltage, current) in sorted(setpoints.items()):
+            log.info('init', "\n  Configuring Output {channel}:\n"
+                     "    - Selecting channel {channel}\n"
+                     "    - Setting voltage: {voltage} V\n"
+                     "    - Setting current limit: {current} A\n"
+                     "    - Preparing output for master switch ON",
+                     channel=channel, voltage=voltage, current=current)
+            ngx.select_channel(channel)
+            ngx.set_voltage(voltage)
+            ngx.set_current(current)
+            ngx.set_output_select(True)
+
+
+def initialize_system(ngx, led, setpoints=None):
     """
     Initialize both power supply and GPIO
 
     Args:
         ngx: NGP800Controller instance
         led: LED instance
+        setpoints: Per-channel (voltage, current), see initialize_power_supply
     """
-    print("\n" + "=" * 60)
-    print("Initializing System")
-    print("=" * 60)
+    log.info('init', "\n" + "=" * 60 + "\nInitializing System\n" + "=" * 60)
 
     # Initialize GPIO LED
-    print("\nInitializing GPIO LED...")
-    print(f"  - Using GPIO{led.pin.number}")
-    print("  - Turning LED OFF")
+    log.info('init', "\nInitializing GPIO LED...\n"
+             "  - Using GPIO{pin}\n"
+             "  - Turning LED OFF", pin=led.pin.number)
     led.off()
 
     # Initialize Power Supply
-    print("\nInitializing Power Supply...")
-    print("  - Resetting instrument...")
-    ngx.reset()
-
-    print("  - Turning OFF all outputs (master switch)...")
-    ngx.set_general_output_state(False)
+    initialize_power_supply(ngx, setpoints)
 
-    # Configure all 4 outputs with 25V 0.1A
-    for channel in range(1, 5):
-        print(f"\n  Configuring Output {channel}:")
-        print(f"    - Selecting channel {channel}")
-        ngx.select_channel(channel)
-        print("    - Setting voltage: 25.0 V")
-        ngx.set_voltage(25.0)
-        print("    - Setting current limit: 0.1 A")
-        ngx.set_current(6.0)
-        print("    - Preparing output for master switch ON")
-        ngx.set_output_select(True)
-
-    print("\n" + "=" * 60)
-    print("Initialization completed!")
-    print("=" * 60)
+    log.info('init', "\n" + "=" * 60 + "\nInitialization completed!\n" + "=" * 60)
 
 
-def turn_on_outputs(ngx, led):
+def turn_on_outputs(ngx, led, settle=0.5, capture=None, channels=(1, 2, 3, 4)):
     """
     Turn ON both power supply outputs and GPIO LED
 
     Args:
         ngx: NGP800Controller instance
         led: LED instance
+        settle: Seconds to wait before measuring (default: 0.5), or
+                {channel: seconds} from settle_calibration.py; each channel
+                is then measured as soon as its own delay has passed
+        capture: Optional dut_capture.DutCapture receiving the send and
+                 completion time of the ON command
+        channels: Channels to measure (default: all 4)
+
+    Returns:
+        dict: {channel: (voltage, current)} measured after settling
     """
-    print("\n🟢 Turning ON all outputs...")
+    log.info('outputs', "\n🟢 Turning ON all outputs...", state='on')
 
     # Turn ON power supply
+    sent_ns = time.monotonic_ns()
     ngx.set_general_output_state(True)
+    if capture is not None:
+        capture.mark_power_on(sent_ns, time.monotonic_ns())
+    on_time = sent_ns / 1e9
 
     # Turn ON LED
     led.on()
-    print("   GPIO LED: ON")
+    log.info('led', "   GPIO LED: ON", state='on')
 
     # Wait for outputs to settle
-    time.sleep(0.5)
-
-    # Read and display measurements from all 4 channels
-    for channel in range(1, 5):
-        ngx.select_channel(channel)
-        voltage, current = ngx.read_measurement()
-        print(f"   NGP800 Ch{channel}: {voltage:.4f} V, {current:.6f} A")
+    if isinstance(settle, dict):
+        delays = {channel: settle.get(channel, 0.5) for channel in channels}
+    else:
+        delays = dict.fromkeys(channels, settle)
+
+    # Read and display measurements, earliest settled channel first
+    readings = {}
+    for channel in sorted(delays, key=delays.get):
+        remaining = on_time + delays[channel] - time.monotonic()
+        if remaining > 0:
+            time.sleep(remaining)
+        voltage, current = ngx.measure_channel(channel)
+        readings[channel] = (voltage, current)
+        log.info('measurement', "   NGP800 Ch{channel}: {voltage:.4f} V, {current:.6f} A",
+                 channel=channel, voltage=voltage, current=current)
+    return readings
 
 
 def turn_off_outputs(ngx, led):
@@ -214,14 +1110,159 @@ def turn_off_outputs(ngx, led):
         ngx: NGP800Controller instance
         led: LED instance
     """
-    print("\n🔴 Turning OFF all outputs...")
+    log.info('outputs', "\n🔴 Turning OFF all outputs...", state='off')
 
     # Turn OFF power supply
     ngx.set_general_output_state(False)
 
     # Turn OFF LED
     led.off()
-    print("   GPIO LED: OFF")
+    log.info('led', "   GPIO LED: OFF", state='off')
+
+
+def deselect_channels(ngx, channels):
+    """
+    Keep channels out of the master switch (e.g. after a watchdog trip)
+
+    The emergency channel already deselected them on the instrument; this
+    repeats it over the main session so the intended state, which a
+    reconnect restores, matches.
+
+    Args:
+        ngx: NGP800Controller instance
+        channels: Channel numbers
+    """
+    with ngx.batch():
+        for channel in channels:
+            ngx.select_channel(channel)
+            ngx.set_output_select(False)
+
+
+def start_system(resource_string, host, led_pin, setpoints=None, cache=None,
+                 timer=None, record_path=None):
+    """
+    Bring up GPIO, the instrument and the emergency channel concurrently
+
+    The LED, the VISA session (identify + reset in one round trip,
+    capabilities, configuration) and the emergency-off socket do not
+    depend on each other, so they start on separate threads. If any of
+    them fails, the others are closed again and the first error is raised.
+
+    Args:
+        resource_string: VISA resource string
+        host: NGP800 IP address for the emergency channel
+        led_pin: GPIO pin number for LED
+        setpoints: {channel: (voltage, current)}, see initialize_power_supply
+        cache: Optional startup.CapabilityCache
+        timer: Optional startup.StartupTimer receiving the phases
+        record_path: Optional file recording all SCPI traffic of the main
+                     session (see scpi_session.py)
+
+    Returns:
+        tuple: (ngx, led, emergency, capabilities)
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    timer = timer or StartupTimer()
+
+    def gpio():
+        with timer.phase('gpio'):
+            from gpiozero import LED
+            led = LED(led_pin)
+            led.off()
+        return led
+
+    def instrument():
+        with timer.phase('connect'):
+            ngx = NGP800Controller(resource_string, record_path=record_path)
+        try:
+            with timer.phase('reset'):
+                idn = ngx.reset_and_identify()
+            with timer.phase('capabilities'):
+                capabilities = cache.get(resource_string, idn) if cache else None
+                if capabilities is None:
+                    capabilities = ngx.query_capabilities(idn)
+                    if cache:
+                        cache.put(resource_string, capabilities)
+            missing = [ch for ch in (setpoints or {}) if ch > capabilities['channels']]
+            if missing:
+                raise ValueError(f"{capabilities['model']} has no channel(s) {missing}")
+            ngx.set_error_policy('batch')
+            with timer.phase('configure'):
+                initialize_power_supply(ngx, setpoints, reset=False)
+        except BaseException:
+            ngx.close()
+            raise
+        return ngx, capabilities
+
+    def emergency_channel():
+        with timer.phase('emergency'):
+            return EmergencyOff(host)
+
+    with ThreadPoolExecutor(max_workers=3, thread_name_prefix='startup') as pool:
+        futures = [pool.submit(gpio), pool.submit(instrument),
+                   pool.submit(emergency_channel)]
+    results = []
+    errors = []
+    for future in futures:
+        try:
+            results.append(future.result())
+        except Exception as e:
+            results.append(None)
+            errors.append(e)
+    led, session, emergency = results
+    if errors:
+        if led:
+            led.close()
+        if session:
+            session[0].close()
+        if emergency:
+            emergency.close()
+        raise errors[0]
+
+    emergency.led = led
+    ngx, capabilities = session
+    return ngx, led, emergency, capabilities
+
+
+def emergency_shutdown(ngx, led, emergency, monitors=(), report=None):
+    """
+    De-energize everything as fast as possible, then close connections
+
+    The emergency channel drives GPIO low and switches the outputs off with
+    a bounded worst-case time. Only if it could not confirm the OFF state is
+    the main session used, with a short dedicated timeout.
+
+    Args:
+        ngx: NGP800Controller instance (or None)
+        led: LED instance (or None)
+        emergency: EmergencyOff instance (or None)
+        monitors: Background workers (sampler, watchdog) stopped after the
+                  outputs are off
+        report: EmergencyReport of a trigger already sent (e.g. from the
+                SIGINT handler); the emergency channel is not used again
+
+    Returns:
+        EmergencyReport: Result of the emergency channel, or None
+    """
+    if emergency and report is None:
+        report = emergency.trigger()
+    for monitor in monitors:
+        monitor.stop()
+    if emergency:
+        emergency.close()
+        if report.confirmed:
+            if ngx:
+                ngx.close()
+            return report
+
+    if ngx and led:
+        ngx.instrument.timeout = 500
+        turn_off_outputs(ngx, led)
+        ngx.close()
+    elif led:
+        led.off()
+    return report
 
 
 def main():
@@ -238,6 +1279,71 @@ def main():
     ON_TIME  = 5   # seconds
     OFF_TIME = 1   # seconds
 
+    # Watchdog configuration (evaluated while the outputs are ON)
+    OVERCURRENT_FRACTION = 0.92   # of the current limit (5.5 A at 6 A)
+    UNDERVOLTAGE_FRACTION = 0.92  # of the voltage setpoint (23 V at 25 V)
+    TRIP_SAMPLES = 3           # consecutive samples before tripping
+    SAMPLE_INTERVAL = 0.02     # seconds between sampler sweeps (edges, changes)
+    MAX_SAMPLE_INTERVAL = 0.2  # seconds between sweeps in steady state
+                               # (capped at budget / TRIP_SAMPLES while armed)
+
+    # Connection supervision
+    KEEPALIVE_INTERVAL = 1.0   # idle seconds before a keep-alive *OPC?
+    RECONNECT_MAX_DELAY = 10.0 # seconds, upper bound of the reconnect backoff
+    RECONNECT_TIMEOUT = None   # give up after this many seconds (None: never)
+
+    # Logging configuration
+    LOG_LEVEL = 'INFO'         # DEBUG, INFO, WARNING or ERROR
+    LOG_JSON = False           # one JSON object per line (e.g. for journald)
+    LOG_FLUSH_TIMEOUT = 1.0    # seconds to wait for the log on exit
+
+    parser = argparse.ArgumentParser(description='NGP800 and GPIO ON/OFF cycle')
+    parser.add_argument('--config', help='JSON configuration file, reloaded '
+                        'at cycle boundaries when it changes')
+    parser.add_argument('--samples', help='Record all samples and output edges '
+                        'to this file for cycle_analysis.py')
+    parser.add_argument('--bus', nargs='?', const='ngp800_telemetry',
+                        help='Publish samples in shared memory for local readers '
+                        '(telemetry_bus.py), under this name')
+    parser.add_argument('--metrics', nargs='?', type=int, const=9108, metavar='PORT',
+                        help='Serve Prometheus metrics on 127.0.0.1:PORT '
+                        '(default port: 9108)')
+    parser.add_argument('--dut-ready', type=int, metavar='PIN',
+                        help="GPIO input of the DUT's ready line; logs the boot "
+                        'time per cycle (see dut_capture.py)')
+    parser.add_argument('--dut-csv', help='Append per-cycle DUT boot times to this CSV')
+    parser.add_argument('--settle-file', help='Per-channel settle delays from '
+                        'settle_calibration.py (default: 0.5 s for all channels)')
+    parser.add_argument('--load', help='Name of the connected load; --settle-file '
+                        'uses the delays calibrated for it')
+    parser.add_argument('--record', metavar='PATH',
+                        help='Record all SCPI traffic of the main session to this file '
+                        '(e.g. run.scpi.gz, see scpi_session.py)')
+    args = parser.parse_args()
+
+    # An external configuration replaces the settings above
+    config = None
+    watcher = None
+    setpoints = None
+    if args.config:
+        config = load_config(args.config)
+        watcher = ConfigWatcher(args.config)
+        POWER_SUPPLY_IP = config['power_supply_ip']
+        LED_PIN = config['led_pin']
+        ON_TIME = config['on_time']
+        OFF_TIME = config['off_time']
+        setpoints = config['channels']
+
+    settle = 0.5
+    if args.settle_file:
+        from settle_calibration import load_settle_times
+        if not args.load:
+            parser.error('--settle-file requires --load (the load it was calibrated with)')
+        try:
+            settle = load_settle_times(args.settle_file, args.load)
+        except (OSError, ValueError) as e:
+            parser.error(f'--settle-file: {e}')
+
     # Create resource string for TCP/IP connection
     resource_string = f'TCPIP0::{POWER_SUPPLY_IP}::inst0::INSTR'
 
@@ -250,71 +1356,272 @@ def main():
     print("Press Ctrl+C to stop")
     print("=" * 60)
 
+    log.level = LEVELS[LOG_LEVEL]
+    log.json_mode = LOG_JSON
+
     ngx = None
     led = None
+    emergency = None
+    monitors = []
+
+    interrupted = False
+    emergency_report = None
+
+    def trigger_emergency():
+        """Switch the outputs off over the emergency channel, once"""
+        nonlocal emergency_report
+        if emergency and emergency_report is None:
+            emergency_report = emergency.trigger()
 
     def signal_handler(sig, frame):
-        """Handle Ctrl+C gracefully"""
-        print("\n\n" + "=" * 60)
-        print("Ctrl+C detected. Shutting down...")
-        print("=" * 60)
-        if ngx and led:
-            try:
-                turn_off_outputs(ngx, led)
-                ngx.close()
-                print("All outputs turned OFF and connections closed.")
-            except Exception as e:
-                print(f"Error during shutdown: {e}")
-        elif led:
-            try:
-                led.off()
-                print("GPIO LED turned OFF.")
-            except Exception as e:
-                print(f"Error turning off LED: {e}")
-        sys.exit(0)
+        """
+        Handle Ctrl+C: outputs off first, everything else after unwinding
+
+        Only the emergency trigger runs in signal context. The interrupted
+        code may hold the event log's queue lock or be writing to stdout,
+        so logging, printing and the rest of the shutdown happen in the
+        finally block below.
+        """
+        nonlocal interrupted
+        interrupted = True
+        try:
+            trigger_emergency()
+        finally:
+            sys.exit(0)
 
     # Register signal handler for Ctrl+C
     signal.signal(signal.SIGINT, signal_handler)
 
     try:
-        # Initialize GPIO LED
-        print(f"\nInitializing GPIO LED on pin {LED_PIN}...")
-        led = LED(LED_PIN)
-        print("GPIO LED initialized successfully.")
-
-        # Connect to the power supply
-        print(f"\nConnecting to NGP800 at {resource_string}...")
-        ngx = NGP800Controller(resource_string)
-
-        # Get instrument identification
-        idn = ngx.get_idn()
-        print(f'Connected to: {idn}')
-
-        # Initialize both systems
-        initialize_system(ngx, led)
+        # GPIO, VISA connection and emergency channel come up concurrently
+        log.info('startup', "\nStarting GPIO LED on pin {pin}, NGP800 at {resource} "
+                 "and the emergency OFF channel...", pin=LED_PIN, resource=resource_string)
+        timer = StartupTimer()
+        ngx, led, emergency, capabilities = start_system(
+            resource_string, POWER_SUPPLY_IP, LED_PIN, setpoints,
+            cache=CapabilityCache(), timer=timer, record_path=args.record)
+        log.info('startup', "Connected to: {idn} ({channels} channels)",
+                 idn=capabilities['idn'], channels=capabilities['channels'])
+        log.info('startup', "Emergency OFF channel ready (worst case {worst_case_ms:.0f} ms)",
+                 worst_case_ms=emergency.worst_case * 1000)
+        log.info('startup', "Startup breakdown:\n{report}", report=timer.report())
+
+        # Start the software watchdog on streamed measurements
+        watchdog = Watchdog(emergency, on_trip=lambda trip: log.error(
+            'watchdog_trip', '{trip}', trip=trip), ngx=ngx)
+
+        def update_protection(channel_setpoints):
+            """Trip limits follow the configured setpoints"""
+            # Channels no longer configured are deselected: no limits
+            for channel in set(watchdog.rules) - set(channel_setpoints):
+                watchdog.set_rules(channel, [])
+            for channel, (voltage, current) in channel_setpoints.items():
+                watchdog.set_rules(channel, protection_rules(
+                    voltage, current, OVERCURRENT_FRACTION, UNDERVOLTAGE_FRACTION,
+                    TRIP_SAMPLES))
+
+        update_protection(setpoints or DEFAULT_SETPOINTS)
+        sampler = MeasurementSampler(ngx, interval=SAMPLE_INTERVAL,
+                                     max_interval=MAX_SAMPLE_INTERVAL)
+        sampler.add_sink(watchdog.feed)
+
+        # Energy and charge delivered per channel, per cycle and in total
+        energy = EnergyAccumulator(max_gap=1.0)
+        sampler.add_sink(energy.feed)
+        monitors = [sampler, watchdog]
+        # Sinks that also record the output edges
+        edge_sinks = []
+        if args.samples:
+            edge_sinks.append(SampleRecorder(args.samples))
+        if args.bus:
+            from telemetry_bus import TelemetryPublisher
+            bus = TelemetryPublisher(args.bus)
+            log.info('startup', "Publishing samples on telemetry bus '{name}'",
+                     name=bus.name)
+            edge_sinks.append(bus)
+        metrics = None
+        if args.metrics:
+            from metrics_server import MetricsServer, PowerMetrics
+            metrics = PowerMetrics(ngx)
+            ngx.command_observer = metrics.observe_command
+            edge_sinks.append(metrics)
+            metrics_server = MetricsServer(metrics, port=args.metrics)
+            metrics_server.start()
+            monitors.append(metrics_server)
+            log.info('startup', "Metrics on http://{host}:{port}/metrics",
+                     host=metrics_server.address[0], port=metrics_server.address[1])
+        for sink in edge_sinks:
+            sampler.add_sink(sink.feed)
+            monitors.append(sink)
+        capture = None
+        if args.dut_ready is not None:
+            from dut_capture import DutCapture
+            capture = DutCapture(args.dut_ready, csv_path=args.dut_csv)
+            monitors.append(capture)
+            log.info('startup', "Watching DUT ready line on GPIO{pin} ({backend})",
+                     pin=args.dut_ready, backend=capture.start())
+        watchdog.start()
+        sampler.start()
+        log.info('startup', "Watchdog running ({priority} priority, {budget_ms:.0f} ms budget)",
+                 priority=watchdog.priority, budget_ms=watchdog.budget * 1000)
+
+        # Report CV/CC transitions, protection trips and errors as events
+        ngx.enable_status_events()
+        status_monitor = StatusMonitor(ngx, on_event=lambda status: log.info(
+            'status_event', '{status}', status=status))
+        monitors.append(status_monitor)
+        status_monitor.start()
+
+        # Detect a dead link and reconnect instead of ending the test
+        def on_connection_event(event):
+            if event.name == 'lost':
+                log.error('connection', '{connection}', connection=event)
+            else:
+                log.warning('connection', '{connection}', connection=event,
+                            recovery_time=event.recovery_time, count=event.count)
+                # The emergency socket most likely died with the link
+                emergency.open()
+
+        supervisor = ConnectionSupervisor(
+            ngx, interval=KEEPALIVE_INTERVAL, max_delay=RECONNECT_MAX_DELAY,
+            timeout=RECONNECT_TIMEOUT, on_event=on_connection_event)
+        monitors.insert(0, supervisor)
+        supervisor.start()
+
+        def supervised(action, *args):
+            """Run a cycle step, repeating it once the link is restored"""
+            while True:
+                generation = ngx.generation
+                try:
+                    return action(*args)
+                except connection_errors() as e:
+                    supervisor.recover(generation, e)
+
+        def hold_until(deadline):
+            """Sleep until the deadline; after an outage, continue from now"""
+            remaining = deadline - time.monotonic()
+            if remaining >= 0:
+                time.sleep(remaining)
+                next_deadline = deadline
+            else:
+                log.warning('schedule', "Schedule {late:.2f} s late, continuing from now",
+                            late=-remaining)
+                next_deadline = time.monotonic()
+            if metrics:
+                metrics.observe_lateness(time.monotonic() - deadline)
+            return next_deadline
 
         # Periodic ON/OFF cycle
-        print("\n" + "=" * 60)
-        print("Starting periodic cycle...")
-        print("=" * 60)
+        log.info('startup', "\n" + "=" * 60 + "\nStarting periodic cycle "
+                 "({seconds:.3f} s after startup began)\n" + "=" * 60,
+                 seconds=time.monotonic() - timer.start)
 
         cycle_count = 0
+        latched = set()
+        # Edges are scheduled on absolute deadlines, so the cycle keeps its
+        # rhythm and resumes in place after a reconnect
+        next_edge = time.monotonic()
 
         while True:
             cycle_count += 1
-            print(f"\n--- Cycle {cycle_count} ---")
+
+            # Apply configuration edits at the cycle boundary
+            if watcher and watcher.changed():
+                try:
+                    new_config = load_config(args.config, capabilities['channels'])
+                except ConfigError as e:
+                    log.error('config', "Configuration not reloaded: {error}", error=str(e))
+                else:
+                    timing, changed, restart = diff_config(config, new_config)
+                    added, removed = channel_changes(config, new_config)
+                    # Tripped channels stay deselected
+                    added = [ch for ch in added if ch not in latched]
+                    try:
+                        if changed or removed:
+                            supervised(apply_setpoints, ngx, changed, added, removed)
+                    except SCPIError as e:
+                        # The valid part of the batch was executed: put the old
+                        # setpoints back so the instrument matches the config
+                        # kept below (and the next edit re-sends the new ones)
+                        log.error('config', "Setpoints rejected: {error}", error=str(e))
+                        try:
+                            supervised(revert_setpoints, ngx, config, changed, added,
+                                       [ch for ch in removed if ch not in latched])
+                        except SCPIError as e:
+                            log.error('config', "Previous setpoints not restored: "
+                                      "{error}", error=str(e))
+                        new_config['channels'] = config['channels']
+                    ON_TIME = new_config['on_time']
+                    OFF_TIME = new_config['off_time']
+                    for key in restart:
+                        new_config[key] = config[key]
+                        log.warning('config', "{key} changed; restart to apply", key=key)
+                    config = new_config
+                    update_protection(config['channels'])
+                    log.info('config', "Configuration reloaded ({method}): "
+                             "timing {timing}, setpoints {setpoints}",
+                             method=watcher.method, timing=timing,
+                             setpoints={str(ch): sp for ch, sp in changed.items()})
+            log.info('cycle', "\n--- Cycle {cycle} ---", cycle=cycle_count)
+            if metrics:
+                metrics.cycle(cycle_count)
+
+            # Tripped channels stay off; the master switch must not
+            # re-energize them. Unconfirmed trips are deselected here too.
+            newly_tripped = (watchdog.tripped | watchdog.unconfirmed) - latched
+            if newly_tripped:
+                supervised(deselect_channels, ngx, sorted(newly_tripped))
+                watchdog.latch(newly_tripped)
+                latched |= newly_tripped
+                log.warning('watchdog', "Channel(s) {channels} stay OFF after the "
+                            "watchdog trip; restart to re-enable",
+                            channels=sorted(latched))
 
             # Turn ON both power supply and LED
-            turn_on_outputs(ngx, led)
-            print(f"Outputs will remain ON for {ON_TIME} seconds...")
-            time.sleep(ON_TIME)
+            sampler.notify_edge()
+            for sink in edge_sinks:
+                sink.mark_edge(True)
+            supervised(turn_on_outputs, ngx, led, settle, capture)
+            # While armed, back off no further than keeps fault onset to
+            # detection (TRIP_SAMPLES sweeps) within the watchdog budget
+            sampler.max_interval = min(MAX_SAMPLE_INTERVAL, watchdog.sample_interval())
+            watchdog.arm()
+            log.info('hold', "Outputs will remain ON for {seconds} seconds...",
+                     state='on', seconds=ON_TIME)
+            next_edge = hold_until(next_edge + ON_TIME)
 
             # Turn OFF both power supply and LED
-            turn_off_outputs(ngx, led)
-            print(f"Outputs will remain OFF for {OFF_TIME} seconds...")
-            time.sleep(OFF_TIME)
-
-    except pyvisa.errors.VisaIOError as e:
+            watchdog.disarm()
+            sampler.max_interval = MAX_SAMPLE_INTERVAL
+            log.debug('sampler', "Sampler at {rate:.1f} sweeps/s", rate=sampler.effective_rate)
+            sampler.notify_edge()
+            for sink in edge_sinks:
+                sink.mark_edge(False)
+            supervised(turn_off_outputs, ngx, led)
+            if capture:
+                timing = capture.mark_power_off()
+                log.info('dut', "   {timing}", timing=timing, cycle=cycle_count,
+                         boot_latency=timing.boot_latency)
+                log.info('dut', "   DUT boot: {stats}", stats=capture.stats)
+            log.info('hold', "Outputs will remain OFF for {seconds} seconds...",
+                     state='off', seconds=OFF_TIME)
+            next_edge = hold_until(next_edge + OFF_TIME)
+
+            totals = energy.totals()
+            for channel, (wh, ah) in energy.new_cycle().items():
+                log.info('energy', "   Ch{channel}: cycle {wh:.4f} Wh, {ah:.4f} Ah "
+                         "(total {total_wh:.3f} Wh, {total_ah:.3f} Ah)",
+                         channel=channel, cycle=cycle_count, wh=wh, ah=ah,
+                         total_wh=totals[channel][0], total_ah=totals[channel][1])
+            if ngx.reconnect_count:
+                log.info('connection', "   Link recovered {count} time(s), "
+                         "last {last:.2f} s, worst {worst:.2f} s",
+                         count=ngx.reconnect_count, last=ngx.last_recovery_time,
+                         worst=ngx.max_recovery_time)
+
+    except visa_errors() as e:
+        trigger_emergency()
+        log.flush(timeout=LOG_FLUSH_TIMEOUT)
         print(f"\n❌ VISA Error: {e}")
         print("\nPlease check:")
         print("  1. The IP address is correct")
@@ -323,6 +1630,8 @@ def main():
         sys.exit(1)
 
     except Exception as e:
+        trigger_emergency()
+        log.flush(timeout=LOG_FLUSH_TIMEOUT)
         print(f"\n❌ Error: {e}")
         print("\nTroubleshooting:")
         print("  1. For GPIO errors, ensure gpiozero is installed:")
@@ -334,18 +1643,23 @@ def main():
         sys.exit(1)
 
     finally:
-        # Ensure outputs are turned off on exit
-        if ngx and led:
-            try:
-                turn_off_outputs(ngx, led)
-                ngx.close()
-            except:
-                pass
-        elif led:
-            try:
-                led.off()
-            except:
-                pass
+        # Ensure outputs are turned off on exit; a second Ctrl+C must not
+        # cut this short
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        if interrupted:
+            print("\n\n" + "=" * 60)
+            print("Ctrl+C detected. Shutting down...")
+            print("=" * 60)
+        try:
+            report = emergency_shutdown(ngx, led, emergency, monitors, emergency_report)
+            if report:
+                log.warning('emergency_off', '{report}', report=report)
+            if interrupted:
+                log.info('shutdown', "All outputs turned OFF and connections closed.")
+        except Exception as e:
+            if interrupted:
+                print(f"Error during shutdown: {e}")
+        log.close(timeout=LOG_FLUSH_TIMEOUT)
 
 
 if __name__ == '__main__':
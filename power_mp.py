@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+Two-process variant of power.py: GPIO timing isolated from SCPI I/O
+
+In power.py a slow or timed-out VISA call stalls the same thread that
+drives the LED, so GPIO timing follows network hiccups. Here:
+
+    - the GPIO worker owns the ON/OFF schedule and drives the LED edges
+      on absolute monotonic deadlines, with raised priority
+    - the instrument worker follows the requested output state over its
+      own VISA session and reports back
+    - both coordinate through a shared-memory block of single-writer
+      counters (no pipes, no pickling, no locks)
+
+GPIO edges stay on schedule even when the NGP800 link is degraded; the
+main process shows how far the instrument lags behind.
+
+Requirements:
+    pip install pyvisa pyvisa-py
+    sudo apt install python3-gpiozero
+
+Usage:
+    python3 power_mp.py
+"""
+
+import multiprocessing
+import os
+import signal
+import sys
+import time
+from multiprocessing import shared_memory
+
+
+# Shared block layout: int64 slots followed by float64 measurements.
+# Every slot has exactly one writing process, so no locking is needed;
+# a writer stores the payload before bumping the sequence counter.
+SLOT_NAMES = (
+    'request_seq',        # GPIO worker: bumped on every edge
+    'request_state',      # GPIO worker: requested output state (0/1)
+    'edge_time_ns',       # GPIO worker: monotonic time of the last edge
+    'gpio_edges',         # GPIO worker: number of LED edges
+    'gpio_late_max_ns',   # GPIO worker: worst edge lateness vs. schedule
+    'cycle',              # GPIO worker: cycle counter
+    'ack_seq',            # instrument worker: last applied request_seq
+    'psu_state',          # instrument worker: applied output state (0/1)
+    'psu_latency_ns',     # instrument worker: edge-to-applied latency
+    'psu_latency_max_ns', # instrument worker: worst edge-to-applied latency
+    'psu_errors',         # instrument worker: failed commands
+    'psu_coalesced',      # instrument worker: requests superseded while busy
+    'psu_ready',          # instrument worker: 1 after initialization
+    'shutdown',           # main process: 1 requests both workers to stop
+)
+SLOT = {name: index for index, name in enumerate(SLOT_NAMES)}
+CHANNELS = 4
+INT_SIZE = 8 * len(SLOT_NAMES)
+BLOCK_SIZE = INT_SIZE + 8 * 2 * CHANNELS
+
+
+class SharedState:
+    """
+    Typed view of the shared command/status block
+    """
+
+    def __init__(self, name=None):
+        """
+        Args:
+            name: Attach to an existing block, or None to create one
+        """
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=BLOCK_SIZE)
+            self.shm.buf[:BLOCK_SIZE] = bytes(BLOCK_SIZE)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self._views = [self.shm.buf[:INT_SIZE], self.shm.buf[INT_SIZE:BLOCK_SIZE]]
+        self.slots = self._views[0].cast('q')
+        self.measurements = self._views[1].cast('d')
+
+    @property
+    def name(self):
+        """Name used by other processes to attach"""
+        return self.shm.name
+
+    def get(self, slot):
+        return self.slots[SLOT[slot]]
+
+    def set(self, slot, value):
+        self.slots[SLOT[slot]] = value
+
+    def add(self, slot, value=1):
+        """Increment a counter (single writer only)"""
+        self.slots[SLOT[slot]] += value
+
+    def set_measurement(self, channel, voltage, current):
+        self.measurements[2 * (channel - 1)] = voltage
+        self.measurements[2 * (channel - 1) + 1] = current
+
+    def get_measurement(self, channel):
+        return (self.measurements[2 * (channel - 1)],
+                self.measurements[2 * (channel - 1) + 1])
+
+    def close(self, unlink=False):
+        """Release the views and the mapping"""
+        self.slots.release()
+        self.measurements.release()
+        for view in self._views:
+            view.release()
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+def _raise_priority():
+    """Real-time scheduling if permitted, else a lower nice value"""
+    try:
+        os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(20))
+        return 'SCHED_FIFO'
+    except (AttributeError, OSError):
+        pass
+    try:
+        os.nice(-10)
+        return 'nice -10'
+    except OSError:
+        return 'normal'
+
+
+def _sleep_until(deadline, state):
+    """Sleep to an absolute monotonic deadline, waking early on shutdown"""
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0 or state.get('shutdown'):
+            return
+        # Coarse sleep, then a short spin for the last millisecond
+        time.sleep(remaining - 0.001 if remaining > 0.002 else 0)
+
+
+def gpio_worker(shm_name, led_pin, on_time, off_time):
+    """
+    Drive the LED on a fixed schedule and publish the requested state
+
+    Args:
+        shm_name: Shared block name
+        led_pin: GPIO pin number
+        on_time: Seconds ON per cycle
+        off_time: Seconds OFF per cycle
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    from gpiozero import LED
+
+    state = SharedState(shm_name)
+    led = LED(led_pin)
+    led.off()
+    priority = _raise_priority()
+    print(f"[gpio] GPIO{led_pin} ready ({priority} priority)")
+
+    # Wait for the instrument to be configured before the first edge
+    while not state.get('psu_ready') and not state.get('shutdown'):
+        time.sleep(0.01)
+
+    next_edge = time.monotonic()
+    on = False
+    try:
+        while not state.get('shutdown'):
+            _sleep_until(next_edge, state)
+            if state.get('shutdown'):
+                break
+            on = not on
+            if on:
+                led.on()
+            else:
+                led.off()
+            now = time.monotonic()
+            # Payload first, then the sequence number
+            state.set('edge_time_ns', time.monotonic_ns())
+            state.set('request_state', int(on))
+            state.add('request_seq')
+            state.add('gpio_edges')
+            if on:
+                state.add('cycle')
+            late_ns = int((now - next_edge) * 1e9)
+            if late_ns > state.get('gpio_late_max_ns'):
+                state.set('gpio_late_max_ns', late_ns)
+            next_edge += on_time if on else off_time
+    finally:
+        led.off()
+        led.close()
+        state.close()
+
+
+def instrument_worker(shm_name, resource_string, settle_time):
+    """
+    Follow the requested output state over the VISA session
+
+    Args:
+        shm_name: Shared block name
+        resource_string: VISA resource string
+        settle_time: Seconds to wait after ON before measuring
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    from power import NGP800Controller, initialize_power_supply, log
+
+    state = SharedState(shm_name)
+    ngx = NGP800Controller(resource_string)
+    try:
+        print(f"[psu] Connected to: {ngx.get_idn()}")
+        ngx.set_error_policy('batch')
+        initialize_power_supply(ngx)
+        state.set('psu_ready', 1)
+
+        applied = 0
+        channels = list(range(1, CHANNELS + 1))
+        while not state.get('shutdown'):
+            seq = state.get('request_seq')
+            if seq == applied:
+                time.sleep(0.001)
+                continue
+            if seq - applied > 1:
+                state.add('psu_coalesced', seq - applied - 1)
+            # Last request wins; read payload after the sequence number
+            requested = state.get('request_state')
+            edge_ns = state.get('edge_time_ns')
+            try:
+                ngx.set_general_output_state(bool(requested))
+                latency = time.monotonic_ns() - edge_ns
+                state.set('psu_state', requested)
+                state.set('psu_latency_ns', latency)
+                if latency > state.get('psu_latency_max_ns'):
+                    state.set('psu_latency_max_ns', latency)
+                if requested:
+                    time.sleep(settle_time)
+                    readings = ngx.measure_channels(channels)
+                    for channel, (voltage, current) in zip(channels, readings.tolist()):
+                        state.set_measurement(channel, voltage, current)
+            except Exception as e:
+                state.add('psu_errors')
+                print(f"[psu] Error: {e}")
+            applied = seq
+            state.set('ack_seq', applied)
+    finally:
+        try:
+            ngx.set_general_output_state(False)
+            state.set('psu_state', 0)
+        except Exception as e:
+            print(f"[psu] Error turning off outputs: {e}")
+        ngx.close()
+        state.close()
+        log.close()
+
+
+def print_status(state):
+    """Print one status line from the shared block"""
+    lag = state.get('request_seq') - state.get('ack_seq')
+    readings = ', '.join(f"Ch{ch} {state.get_measurement(ch)[0]:.3f} V "
+                         f"{state.get_measurement(ch)[1]:.4f} A"
+                         for ch in range(1, CHANNELS + 1))
+    print(f"Cycle {state.get('cycle')}: LED {'ON ' if state.get('request_state') else 'OFF'} "
+          f"PSU {'ON ' if state.get('psu_state') else 'OFF'} | "
+          f"GPIO late max {state.get('gpio_late_max_ns') / 1e6:.2f} ms | "
+          f"PSU latency {state.get('psu_latency_ns') / 1e6:.1f} ms "
+          f"(max {state.get('psu_latency_max_ns') / 1e6:.1f} ms), "
+          f"lag {lag}, errors {state.get('psu_errors')} | {readings}")
+
+
+def main():
+    """
+    Main function: start both workers and report their shared status
+    """
+
+    # Configuration
+    POWER_SUPPLY_IP = '192.168.0.10'  # Change to your NGP800's IP address
+    LED_PIN = 17                       # GPIO pin number for LED
+
+    # Timing configuration
+    ON_TIME = 5       # seconds
+    OFF_TIME = 1      # seconds
+    SETTLE_TIME = 0.5 # seconds after ON before measuring
+    STATUS_INTERVAL = 1.0
+
+    resource_string = f'TCPIP0::{POWER_SUPPLY_IP}::inst0::INSTR'
+
+    print("=" * 60)
+    print("Integrated Power Supply and GPIO Control (two processes)")
+    print("=" * 60)
+    print(f"NGP800: {POWER_SUPPLY_IP}")
+    print(f"GPIO LED: Pin {LED_PIN}")
+    print(f"Cycle: {ON_TIME} sec ON, {OFF_TIME} sec OFF")
+    print("Press Ctrl+C to stop")
+    print("=" * 60)
+
+    state = SharedState()
+    workers = [
+        multiprocessing.Process(target=instrument_worker, name='psu',
+                                args=(state.name, resource_string, SETTLE_TIME)),
+        multiprocessing.Process(target=gpio_worker, name='gpio',
+                                args=(state.name, LED_PIN, ON_TIME, OFF_TIME)),
+    ]
+    for worker in workers:
+        worker.start()
+
+    try:
+        while all(worker.is_alive() for worker in workers):
+            time.sleep(STATUS_INTERVAL)
+            print_status(state)
+        print("\n❌ A worker process exited unexpectedly")
+    except KeyboardInterrupt:
+        print("\n\n" + "=" * 60)
+        print("Ctrl+C detected. Shutting down...")
+        print("=" * 60)
+    finally:
+        state.set('shutdown', 1)
+        for worker in workers:
+            worker.join(timeout=10)
+            if worker.is_alive():
+                print(f"Worker '{worker.name}' did not stop, terminating")
+                worker.terminate()
+        print_status(state)
+        state.close(unlink=True)
+
+    sys.exit(0 if all(w.exitcode == 0 for w in workers) else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+Voltage ramps and sweeps streamed to the NGP800
+
+For margin tests the setpoint has to move smoothly, e.g. 25 V -> 20 V
+over 2 s at 100 steps/s on several channels. A set_voltage() per channel
+and step with an error check or *OPC? after each would cost a round trip
+per write and stretch the ramp. Instead:
+
+    1. The whole setpoint series is computed up front with NumPy (one
+       row per step, one column per channel) and rendered into one chained
+       message per step ('INST:SEL 1;:VOLT 24.95;:INST:SEL 2;:VOLT 24.95')
+    2. The messages are written without waiting for any response, each at
+       its scheduled time on the monotonic clock (coarse sleep, then a
+       short spin for the last millisecond)
+    3. The final setpoints are sent once more with *OPC?, which confirms
+       the instrument has executed everything and records them for
+       reconnects; the error queue is then checked once
+
+The profile is checked against the output range (0 V to the model's
+rated voltage) before anything is sent.
+
+The result reports the achieved step rate and how far each write was
+from its scheduled time.
+
+Requirements:
+    pip install numpy
+
+Usage:
+    python3 ramp.py --resource SIM::NGP804 --channels 1 2 --start 25 --stop 20 \\
+        --duration 2 --rate 100
+    # Sweep 25 V -> 20 V -> 25 V, each leg 2 s
+    python3 ramp.py --ip 192.168.0.10 --start 25 --segments 20:2 25:2
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+
+# Remaining time that is spun instead of slept, for an accurate write time
+SPIN_TIME = 0.001
+
+# Rated output voltage by model: NGP80x 32 V, NGP82x 64 V
+RATED_VOLTAGE = {'NGP80': 32.0, 'NGP82': 64.0}
+DEFAULT_MAX_VOLTAGE = 32.0
+
+
+def rated_voltage(idn):
+    """
+    Maximum setpoint of an instrument, from its *IDN? response
+
+    Args:
+        idn: *IDN? response
+
+    Returns:
+        float: Rated voltage in V (DEFAULT_MAX_VOLTAGE for unknown models)
+    """
+    fields = [field.strip() for field in idn.split(',')]
+    model = fields[1] if len(fields) > 1 else ''
+    return RATED_VOLTAGE.get(model[:5], DEFAULT_MAX_VOLTAGE)
+
+
+def build_profile(start, segments, rate):
+    """
+    Setpoint series of a piecewise-linear ramp
+
+    Args:
+        start: Voltage at t = 0 (scalar, or one value per channel)
+        segments: (target, duration) pairs; target is a scalar or one value
+                  per channel, duration in seconds
+        rate: Steps per second
+
+    Returns:
+        tuple: (times, values) - times (n,) in seconds from the start,
+               values (n, channels) in V; the first row is the start value
+               and the last row the final target
+    """
+    current = np.atleast_1d(np.asarray(start, dtype=np.float64))
+    times = [np.zeros(1)]
+    values = [current[np.newaxis, :]]
+    offset = 0.0
+    for target, duration in segments:
+        target = np.broadcast_to(np.asarray(target, dtype=np.float64), current.shape)
+        steps = max(int(round(duration * rate)), 1)
+        fraction = np.arange(1, steps + 1) / steps
+        times.append(offset + fraction * duration)
+        values.append(current + np.outer(fraction, target - current))
+        current = target
+        offset += duration
+    return np.concatenate(times), np.vstack(values)
+
+
+def render_messages(channels, values, decimals=3):
+    """
+    One chained SCPI message per step
+
+    Args:
+        channels: Channel numbers, one per column of values
+        values: (n, channels) voltages
+        decimals: Digits after the point sent to the instrument
+
+    Returns:
+        list: Message strings
+    """
+    columns = [np.char.mod(f'%.{decimals}f', np.round(values[:, index], decimals))
+               for index in range(len(channels))]
+    parts = [f'INSTrument:SELect {channel};:SOURce:VOLTage:LEVel:IMMediate:AMPlitude '
+             for channel in channels]
+    return [';:'.join(part + value for part, value in zip(parts, row))
+            for row in zip(*columns)]
+
+
+def check_profile(channels, values, max_voltage=DEFAULT_MAX_VOLTAGE):
+    """
+    Validate a setpoint series before any of it is sent
+
+    Args:
+        channels: Channel numbers, one per column of values
+        values: (n, channels) voltages
+        max_voltage: Highest allowed setpoint in V
+
+    Raises:
+        ValueError: If the shape does not match the channels, a channel
+                    repeats or a setpoint is not within 0..max_voltage
+    """
+    if values.ndim != 2 or values.shape[1] != len(channels) or not len(values):
+        raise ValueError(f"Profile of shape {values.shape} does not match "
+                         f"channels {list(channels)}")
+    if len(set(channels)) != len(channels):
+        raise ValueError(f"Channels {list(channels)} repeat")
+    for index, channel in enumerate(channels):
+        column = values[:, index]
+        if not np.isfinite(column).all():
+            raise ValueError(f"Ch{channel}: profile contains NaN or infinite setpoints")
+        low, high = column.min(), column.max()
+        if low < 0 or high > max_voltage:
+            raise ValueError(f"Ch{channel}: setpoints {low:g}..{high:g} V outside "
+                             f"0..{max_voltage:g} V")
+
+
+class RampResult:
+    """
+    Timing report of one streamed ramp
+    """
+
+    def __init__(self, scheduled, sent, sync_time, write_times):
+        """
+        Args:
+            scheduled: (n,) scheduled send times in seconds from the start
+            sent: (n,) actual send times in seconds from the start
+            sync_time: Seconds the final setpoints with *OPC? took
+            write_times: (n,) seconds each write call took
+        """
+        self.scheduled = scheduled
+        self.sent = sent
+        self.sync_time = sync_time
+        self.write_times = write_times
+        self.error = sent - scheduled
+
+    @property
+    def steps(self):
+        return len(self.sent)
+
+    @property
+    def planned_rate(self):
+        """Steps per second of the schedule"""
+        span = self.scheduled[-1] - self.scheduled[0]
+        return (self.steps - 1) / span if span > 0 else float('nan')
+
+    @property
+    def achieved_rate(self):
+        """Steps per second actually sent"""
+        span = self.sent[-1] - self.sent[0]
+        return (self.steps - 1) / span if span > 0 else float('nan')
+
+    @property
+    def completed(self):
+        """Seconds from the start until *OPC? confirmed the final setpoints"""
+        return self.sent[-1] + self.write_times[-1] + self.sync_time
+
+    def __str__(self):
+        error = np.abs(self.error) * 1000
+        return (f"{self.steps} steps: {self.achieved_rate:.1f} steps/s achieved "
+                f"({self.planned_rate:.1f} planned), timing error mean {error.mean():.3f} ms, "
+                f"p99 {np.percentile(error, 99):.3f} ms, max {error.max():.3f} ms; "
+                f"write {np.median(self.write_times) * 1000:.3f} ms median; "
+                f"final *OPC? {self.sync_time * 1000:.2f} ms, "
+                f"confirmed {self.completed:.3f} s after start "
+                f"(planned duration {self.scheduled[-1]:.3f} s)")
+
+
+def _wait_until(deadline):
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        if remaining > SPIN_TIME:
+            time.sleep(remaining - SPIN_TIME)
+
+
+def stream_ramp(ngx, channels, times, values, decimals=3,
+                max_voltage=DEFAULT_MAX_VOLTAGE):
+    """
+    Send a precomputed ramp, paced by the monotonic clock
+
+    Each step is one NGP800Controller.write_deferred(), so a sampler
+    sharing the session keeps measuring during the ramp and no error check
+    lands mid-ramp. Nothing is read back until the final setpoints are
+    sent with *OPC?. Late steps are sent immediately rather than skipped.
+
+    Args:
+        ngx: NGP800Controller instance
+        channels: Channel numbers, one per column of values
+        times: (n,) send times in seconds from the start
+        values: (n, channels) voltages
+        decimals: Digits after the point sent to the instrument
+        max_voltage: Highest allowed setpoint in V (see rated_voltage())
+
+    Raises:
+        ValueError: If the profile is invalid (see check_profile()); raised
+                    before anything is sent
+        SCPIError: If the instrument rejected a setpoint (checked once,
+                   at the end, unless the error policy is 'off')
+
+    Returns:
+        RampResult: Timing report
+    """
+    values = np.round(np.asarray(values, dtype=np.float64), decimals)
+    check_profile(channels, values, max_voltage)
+    messages = render_messages(channels, values, decimals)
+    sent = np.empty(len(messages))
+    write_times = np.empty(len(messages))
+
+    start = time.monotonic()
+    for step, message in enumerate(messages):
+        _wait_until(start + times[step])
+        before = time.monotonic()
+        ngx.write_deferred(message)
+        after = time.monotonic()
+        sent[step] = before - start
+        write_times[step] = after - before
+
+    # Also records the final setpoints, restored after a reconnect
+    before = time.monotonic()
+    ngx.send_settings([(channel, 'voltage', float(values[-1, index]))
+                       for index, channel in enumerate(channels)], sync=True)
+    sync_time = time.monotonic() - before
+    if ngx.error_policy != 'off':
+        ngx.check_errors()
+    return RampResult(times, sent, sync_time, write_times)
+
+
+def ramp(ngx, channels, start, segments, rate=100.0, decimals=3,
+         max_voltage=DEFAULT_MAX_VOLTAGE):
+    """
+    Build and stream a piecewise-linear ramp
+
+    Args:
+        ngx: NGP800Controller instance
+        channels: Channel numbers
+        start: Starting voltage (scalar or per channel)
+        segments: (target, duration) pairs, see build_profile()
+        rate: Steps per second (default: 100)
+        decimals: Digits after the point sent to the instrument
+        max_voltage: Highest allowed setpoint in V (see rated_voltage())
+
+    Returns:
+        RampResult: Timing report
+    """
+    times, values = build_profile(start, segments, rate)
+    if values.shape[1] == 1 and len(channels) > 1:
+        values = np.repeat(values, len(channels), axis=1)
+    return stream_ramp(ngx, list(channels), times, values, decimals, max_voltage)
+
+
+def _segment(text):
+    target, duration = text.split(':')
+    return float(target), float(duration)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Stream a voltage ramp to the NGP800')
+    parser.add_argument('--ip', help='NGP800 IP address')
+    parser.add_argument('--resource', help='VISA resource string (e.g. SIM::NGP804)')
+    parser.add_argument('--channels', type=int, nargs='+', default=[1],
+                        help='Channels ramped together (default: 1)')
+    parser.add_argument('--start', type=float, required=True, help='Start voltage')
+    parser.add_argument('--stop', type=float, help='End voltage of a single ramp')
+    parser.add_argument('--duration', type=float, default=2.0,
+                        help='Seconds of a single ramp (default: 2)')
+    parser.add_argument('--segments', type=_segment, nargs='+', metavar='V:S',
+                        help='Sweep legs as target:seconds, instead of --stop')
+    parser.add_argument('--rate', type=float, default=100.0,
+                        help='Steps per second (default: 100)')
+    args = parser.parse_args()
+
+    if args.resource:
+        resource_string = args.resource
+    elif args.ip:
+        resource_string = f'TCPIP0::{args.ip}::inst0::INSTR'
+    else:
+        parser.error('--ip or --resource is required')
+    if args.segments:
+        segments = args.segments
+    elif args.stop is not None:
+        segments = [(args.stop, args.duration)]
+    else:
+        parser.error('--stop or --segments is required')
+
+    from power import NGP800Controller
+
+    ngx = NGP800Controller(resource_string)
+    try:
+        idn = ngx.get_idn()
+        print(f"Connected to: {idn}")
+        max_voltage = rated_voltage(idn)
+        times, values = build_profile(args.start, segments, args.rate)
+        try:
+            check_profile(args.channels, np.repeat(values, len(args.channels), axis=1),
+                          max_voltage)
+        except ValueError as e:
+            parser.error(str(e))
+        ngx.set_error_policy('batch')
+        with ngx.batch():
+            for channel in args.channels:
+                ngx.select_channel(channel)
+                ngx.set_voltage(args.start)
+        legs = ', '.join(f"{target:g} V in {duration:g} s" for target, duration in segments)
+        print(f"Ramping channel(s) {args.channels} from {args.start:g} V: {legs} "
+              f"at {args.rate:g} steps/s")
+        result = ramp(ngx, args.channels, args.start, segments, args.rate,
+                      max_voltage=max_voltage)
+        print(result)
+        for channel in args.channels:
+            ngx.select_channel(channel)
+            print(f"  Ch{channel}: setpoint {ngx.query('SOURce:VOLTage?')} V after the ramp")
+    finally:
+        ngx.close()
+
+
+if __name__ == '__main__':
+    main()
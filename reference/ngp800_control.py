@@ -13,8 +13,19 @@ Configuration:
     Edit the POWER_SUPPLY_IP variable below to match your NGP800's IP address.
 """
 
+import sys
 import time
-import pyvisa
+
+
+def visa_errors():
+    """
+    Exception classes for `except visa_errors():` without importing pyvisa
+
+    Shared by the reference scripts in this directory; power.py keeps its
+    own copy so that neither side depends on the other's location.
+    """
+    pyvisa = sys.modules.get('pyvisa')
+    return (pyvisa.errors.VisaIOError,) if pyvisa else ()
 
 
 class NGP800Controller:
@@ -30,6 +41,7 @@ class NGP800Controller:
             resource_string: VISA resource string (e.g., 'TCPIP0::192.168.1.100::inst0::INSTR')
             timeout: Communication timeout in milliseconds (default: 5000)
         """
+        import pyvisa  # loaded on first connection, not at script start
         self.rm = pyvisa.ResourceManager('@py')
         try:
             self.instrument = self.rm.open_resource(resource_string)
@@ -204,7 +216,7 @@ def main():
         # Close connection
         ngx.close()
 
-    except pyvisa.errors.VisaIOError as e:
+    except visa_errors() as e:
         print(f"\nVISA Error: {e}")
         print("Please check:")
         print("  1. The IP address is correct")
@@ -16,8 +16,7 @@ Usage examples:
 
 import argparse
 import sys
-import pyvisa
-from ngp800_control import NGP800Controller
+from ngp800_control import NGP800Controller, visa_errors
 
 
 def print_channel_status(ngx, channel):
@@ -144,7 +143,7 @@ Examples:
         print("Operation completed successfully!")
         ngx.close()
 
-    except pyvisa.errors.VisaIOError as e:
+    except visa_errors() as e:
         print(f"\nVISA Error: {e}")
         print("接続を確認してください:")
         print(f"  - IPアドレス: {args.ip}")
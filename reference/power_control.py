@@ -14,10 +14,11 @@ Configuration:
 """
 
 import time
-import pyvisa
 import signal
 import sys
 
+from ngp800_control import visa_errors
+
 
 class NGP800Controller:
     """
@@ -32,6 +33,7 @@ class NGP800Controller:
             resource_string: VISA resource string (e.g., 'TCPIP0::192.168.1.100::inst0::INSTR')
             timeout: Communication timeout in milliseconds (default: 5000)
         """
+        import pyvisa  # loaded on first connection, not at script start
         self.rm = pyvisa.ResourceManager('@py')
         try:
             self.instrument = self.rm.open_resource(resource_string)
@@ -270,7 +272,7 @@ def main():
             print(f"Outputs will remain OFF for {OFF_TIME} seconds...")
             time.sleep(OFF_TIME)
 
-    except pyvisa.errors.VisaIOError as e:
+    except visa_errors() as e:
         print(f"\n❌ VISA Error: {e}")
         print("\nPlease check:")
         print("  1. The IP address is correct")
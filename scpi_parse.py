@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Bulk parsing of SCPI measurement replies into NumPy arrays
+
+read_measurement() splits 'voltage,current' into a list of strings and
+converts each with float(). For multi-channel sweeps at high rates that
+string handling dominates on a Pi Zero. The functions here parse a whole
+receive buffer in one call:
+
+    - ASCII replies ('1.0,0.1;2.0,0.2\\n') with NumPy's C number parser,
+      without intermediate Python strings or lists; short replies (a
+      4-channel sweep) with split/float, which is faster below
+      VECTOR_MIN_BYTES
+    - Binary replies (FORMat:DATA REAL) with np.frombuffer, zero-copy
+
+Requirements:
+    pip install numpy
+
+Usage:
+    values = parse_ascii_values(b'25.0012,0.100031;24.9987,0.099987\\n')
+    pairs = values.reshape(-1, 2)      # one (voltage, current) row per channel
+
+Benchmark:
+    python3 benchmarks/bench_parse.py
+"""
+
+import numpy as np
+
+
+# Chained replies are separated by ';', values within a reply by ','
+_SEPARATORS = bytes.maketrans(b';', b',')
+
+# Below this reply size (about 8 channels) split/float beats the call
+# overhead of np.fromstring (see benchmarks/bench_parse.py)
+VECTOR_MIN_BYTES = 128
+
+# One READ? reply in REAL format: '#18' + float32 voltage + float32 current
+# + ';' (or the final message terminator)
+READ_BLOCK_DTYPE = np.dtype([('header', 'S3'), ('voltage', '<f4'),
+                             ('current', '<f4'), ('separator', 'S1')])
+
+
+def parse_ascii_values(buffer, out=None, count=None):
+    """
+    Parse a comma/semicolon separated ASCII reply in one pass
+
+    Args:
+        buffer: Reply as bytes (or str), e.g. b'25.0,0.1;24.9,0.1\\n'
+        out: Optional preallocated float64 array; the values are copied
+             into its beginning
+        count: Number of values the reply must contain
+
+    Raises:
+        ValueError: If a value is malformed or count does not match
+
+    Returns:
+        numpy.ndarray: float64 values (a view of out if given)
+    """
+    if isinstance(buffer, str):
+        buffer = buffer.encode('ascii')
+    fields = buffer.translate(_SEPARATORS)
+    if len(fields) < VECTOR_MIN_BYTES:
+        values = list(map(float, fields.split(b',')))
+        size = len(values)
+    else:
+        values = np.fromstring(fields, dtype=np.float64, sep=',')
+        size = values.size
+    if count is not None and size != count:
+        raise ValueError(f"Expected {count} values, got {size} "
+                         f"in reply {buffer[:80]!r}")
+    if out is None:
+        return np.asarray(values, dtype=np.float64)
+    out[:size] = values
+    return out[:size]
+
+
+def parse_block(buffer, dtype='<f4', offset=0):
+    """
+    Parse one IEEE 488.2 definite-length block without copying
+
+    Args:
+        buffer: Bytes-like object starting with '#<n><length>'
+        dtype: Element type of the payload (default: little-endian float32)
+        offset: Start of the block within buffer
+
+    Returns:
+        tuple: (values, end) - array view of the payload and the offset
+               just past the block
+    """
+    view = memoryview(buffer)
+    if view[offset:offset + 1] != b'#':
+        raise ValueError(f"Expected definite-length block at offset {offset}")
+    digits = int(bytes(view[offset + 1:offset + 2]))
+    if digits == 0:
+        raise ValueError("Indefinite-length blocks are not supported")
+    start = offset + 2 + digits
+    length = int(bytes(view[offset + 2:start]))
+    values = np.frombuffer(buffer, dtype=dtype, count=length // np.dtype(dtype).itemsize,
+                           offset=start)
+    return values, start + length
+
+
+def read_reply_size(count):
+    """
+    Exact byte size of `count` chained binary READ? replies incl. terminator
+
+    Args:
+        count: Number of chained READ? queries
+
+    Returns:
+        int: Number of bytes to read
+    """
+    return count * READ_BLOCK_DTYPE.itemsize
+
+
+def parse_read_blocks(buffer):
+    """
+    Parse chained binary READ? replies into (voltage, current) columns
+
+    Args:
+        buffer: Bytes of n replies, '#18<8 bytes>;#18<8 bytes>...\\n'
+
+    Returns:
+        numpy.ndarray: Structured array view with 'voltage' and 'current'
+                       fields, one row per reply
+    """
+    if len(buffer) % READ_BLOCK_DTYPE.itemsize:
+        raise ValueError(f"Reply size {len(buffer)} is not a multiple of "
+                         f"{READ_BLOCK_DTYPE.itemsize}")
+    # Every record starts with '#': checked with a strided bytes slice,
+    # far cheaper than comparing the header field array
+    if bytes(buffer[::READ_BLOCK_DTYPE.itemsize]) != b'#' * (
+            len(buffer) // READ_BLOCK_DTYPE.itemsize):
+        raise ValueError("Unexpected block header in binary READ? reply")
+    return np.frombuffer(buffer, dtype=READ_BLOCK_DTYPE)
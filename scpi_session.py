@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+Recorded SCPI sessions and deterministic replay
+
+RecordingInstrument wraps the instrument of an NGP800Controller and logs
+every write, query and read - with its response or the exception it
+raised (VISA errors, timeouts, a dropped link), start offset and duration
+- to a gzip-compressed JSON-lines file. ReplayInstrument serves a
+recording back, either at the recorded speed or as fast as possible,
+raises the recorded exceptions again, and checks that the controller
+sends exactly the recorded commands.
+
+The recording is flushed at least every FLUSH_INTERVAL seconds and after
+every error, so a run that crashes or is killed leaves a readable file;
+replay stops at the truncated tail.
+
+power.py shares the session between the main thread and the sampler,
+status monitor, keep-alive and watchdog threads, whose messages
+interleave differently on every run. Each entry therefore records the
+name of the thread that sent it (pool workers such as 'startup_0' under
+their prefix), and replay serves every thread its own recorded sequence:
+commands are checked in order per thread, not globally. A thread that
+sends more than it did in the recording (e.g. a sampler running faster
+when not replayed in real time) gets ReplayMismatch once its sequence is
+exhausted. Recordings without thread names replay as a single sequence.
+
+Usage:
+    # Record a production run
+    python3 power.py --record run.scpi.gz
+    ngx = NGP800Controller(resource_string, record_path='run.scpi.gz')
+
+    # Replay it without hardware (REPLAY:: or REPLAY-REALTIME::)
+    ngx = NGP800Controller('REPLAY::run.scpi.gz')
+
+    # Summarize command latencies of a recording
+    python3 scpi_session.py run.scpi.gz
+"""
+
+import argparse
+import builtins
+import gzip
+import json
+import re
+import threading
+import time
+import zlib
+
+
+FORMAT_VERSION = 1
+
+# Seconds between flushes of the compressed stream (each costs a few bytes)
+FLUSH_INTERVAL = 1.0
+
+
+class ReplayMismatch(Exception):
+    """The controller sent a command that differs from the recording"""
+
+
+class RecordedError(Exception):
+    """A recorded exception whose type cannot be recreated on replay"""
+
+
+def _encode_error(error):
+    """Type, message and VISA status code of an exception"""
+    recorded = {'type': type(error).__name__, 'msg': str(error)}
+    error_code = getattr(error, 'error_code', None)
+    if isinstance(error_code, int):
+        recorded['code'] = error_code
+    elif isinstance(error, OSError) and error.errno is not None:
+        recorded['errno'] = error.errno
+        recorded['msg'] = error.strerror
+    return recorded
+
+
+def _decode_error(recorded):
+    """Recreate a recorded exception as closely as possible"""
+    name = recorded['type']
+    if 'code' in recorded:
+        try:
+            from pyvisa.errors import VisaIOError
+            return VisaIOError(recorded['code'])
+        except ImportError:
+            pass
+    error_type = getattr(builtins, name, None)
+    if isinstance(error_type, type) and issubclass(error_type, Exception):
+        if 'errno' in recorded and issubclass(error_type, OSError):
+            return error_type(recorded['errno'], recorded['msg'])
+        return error_type(recorded['msg'])
+    return RecordedError(f"{name}: {recorded['msg']}")
+
+
+def _stream_name():
+    """Replay sequence of the calling thread: its name without a pool index"""
+    return re.sub(r'_\d+$', '', threading.current_thread().name)
+
+
+def _encode(data):
+    """Responses are stored as text; bytes are kept lossless via latin-1"""
+    if isinstance(data, bytes):
+        return data.decode('latin-1'), True
+    return data, False
+
+
+class RecordingInstrument:
+    """
+    Transparent wrapper logging all traffic of an instrument
+    """
+
+    def __init__(self, instrument, path, resource_string=''):
+        """
+        Args:
+            instrument: PyVISA resource (or SimulatedInstrument) to wrap
+            path: Output file, gzip-compressed JSON lines
+            resource_string: Stored in the file header for reference
+        """
+        self._instrument = instrument
+        self._file = gzip.open(path, 'wt', encoding='utf-8', compresslevel=6)
+        self._start = time.perf_counter()
+        self._count = 0
+        self._file.write(json.dumps({'version': FORMAT_VERSION,
+                                     'resource': resource_string,
+                                     'started': time.time()}) + '\n')
+        self.flush()
+
+    def __getattr__(self, name):
+        return getattr(self._instrument, name)
+
+    def __setattr__(self, name, value):
+        if name.startswith('_'):
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._instrument, name, value)
+
+    def flush(self):
+        """Make everything recorded so far readable, even if the run dies"""
+        self._file.flush()
+        self._last_flush = time.perf_counter()
+
+    def _record(self, op, message, call, *args):
+        start = time.perf_counter()
+        error = None
+        try:
+            result = call(*args)
+        except Exception as e:
+            error, result = e, None
+        end = time.perf_counter()
+        entry = {'t': round(start - self._start, 6), 'd': round(end - start, 6),
+                 'op': op, 'th': _stream_name()}
+        if message is not None:
+            entry['m'] = message
+        if error is not None:
+            entry['e'] = _encode_error(error)
+        elif result is not None:
+            entry['r'], binary = _encode(result)
+            if binary:
+                entry['b'] = 1
+        self._file.write(json.dumps(entry, separators=(',', ':')) + '\n')
+        self._count += 1
+        if error is not None or end - self._last_flush >= FLUSH_INTERVAL:
+            self.flush()
+        if error is not None:
+            raise error
+        return result
+
+    def write(self, message):
+        return self._record('w', message, self._instrument.write, message)
+
+    def query(self, message):
+        return self._record('q', message, self._instrument.query, message)
+
+    def read(self):
+        return self._record('r', None, self._instrument.read)
+
+    def read_raw(self):
+        return self._record('rr', None, self._instrument.read_raw)
+
+    def read_bytes(self, count, break_on_termchar=False):
+        return self._record('rb', None, self._instrument.read_bytes, count)
+
+    def close(self):
+        """Finish the recording and close the wrapped instrument"""
+        if not self._file.closed:
+            self._file.close()
+        self._instrument.close()
+
+
+class ReplayInstrument:
+    """
+    Serves a recorded session back to NGP800Controller
+    """
+
+    def __init__(self, path, realtime=False, strict=True):
+        """
+        Args:
+            path: Recording written by RecordingInstrument
+            realtime: Reproduce the recorded timing (default: as fast as possible)
+            strict: Raise ReplayMismatch when a sent command differs from
+                    the recording (default: True)
+        """
+        self.entries = []
+        self.truncated = False
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            self.header = json.loads(f.readline())
+            try:
+                for line in f:
+                    self.entries.append(json.loads(line))
+            except (EOFError, zlib.error, gzip.BadGzipFile, ValueError):
+                # The recording process died; keep what was flushed
+                self.truncated = True
+        if self.header.get('version') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported recording version {self.header.get('version')}")
+        self.realtime = realtime
+        self.strict = strict
+        self.timeout = 5000
+        self.read_termination = '\n'
+        self.write_termination = '\n'
+        self.position = 0
+        self.mismatches = 0
+        self._start = None
+        # Entry indices per recording thread, each served in its own order
+        self.threaded = any('th' in entry for entry in self.entries)
+        self._streams = {}
+        for index, entry in enumerate(self.entries):
+            self._streams.setdefault(entry.get('th'), []).append(index)
+        self._positions = dict.fromkeys(self._streams, 0)
+        self._lock = threading.Lock()
+
+    @property
+    def finished(self):
+        """True when every recorded entry has been served"""
+        return self.position >= len(self.entries)
+
+    def _claim(self, op, message):
+        """Index of the calling thread's next entry, checked against op/message"""
+        stream = _stream_name() if self.threaded else None
+        with self._lock:
+            indices = self._streams.get(stream, ())
+            position = self._positions.get(stream, 0)
+            if position >= len(indices):
+                ended = 'truncated' if self.truncated else 'exhausted'
+                owner = f" for thread '{stream}'" if self.threaded else ''
+                raise ReplayMismatch(f"Recording {ended}{owner} at '{op}' {message or ''}")
+            index = indices[position]
+            entry = self.entries[index]
+            if entry['op'] != op or entry.get('m') != message:
+                self.mismatches += 1
+                if self.strict:
+                    raise ReplayMismatch(
+                        f"Entry {index}: expected {entry['op']} "
+                        f"{entry.get('m', '')!r}, got {op} {message or ''!r}")
+            self._positions[stream] = position + 1
+            self.position += 1
+            return index
+
+    def _next(self, op, message=None):
+        entry = self.entries[self._claim(op, message)]
+
+        if self.realtime:
+            if self._start is None:
+                self._start = time.perf_counter() - entry['t']
+            delay = self._start + entry['t'] + entry['d'] - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+        if 'e' in entry:
+            raise _decode_error(entry['e'])
+        response = entry.get('r')
+        if response is not None and entry.get('b'):
+            return response.encode('latin-1')
+        return response
+
+    def write(self, message):
+        self._next('w', message)
+
+    def query(self, message):
+        return self._next('q', message)
+
+    def read(self):
+        return self._next('r')
+
+    def read_raw(self):
+        return self._next('rr')
+
+    def read_bytes(self, count, break_on_termchar=False):
+        return self._next('rb')
+
+    def close(self):
+        """Nothing to release"""
+
+
+def summarize(path):
+    """
+    Per-command latency statistics of a recording
+
+    Args:
+        path: Recording file
+
+    Returns:
+        list: (header, count, mean_ms, p50_ms, p99_ms, max_ms) sorted by total time
+    """
+    replay = ReplayInstrument(path)
+    durations = {}
+    for entry in replay.entries:
+        # Group by command headers, without arguments
+        header = re.sub(r' [^;]*', '', entry.get('m', f"<{entry['op']}>"))
+        durations.setdefault(header, []).append(entry['d'] * 1000)
+    rows = []
+    for header, values in durations.items():
+        values.sort()
+        n = len(values)
+        rows.append((header, n, sum(values) / n, values[n // 2],
+                     values[min(int(n * 0.99), n - 1)], values[-1]))
+    rows.sort(key=lambda row: row[1] * row[2], reverse=True)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Summarize a recorded SCPI session')
+    parser.add_argument('path', help='Recording file (*.scpi.gz)')
+    args = parser.parse_args()
+
+    rows = summarize(args.path)
+    print(f"{'Command':<48} {'count':>7} {'mean':>8} {'p50':>8} {'p99':>8} {'max':>8}")
+    for header, count, mean, p50, p99, peak in rows:
+        print(f"{header[:48]:<48} {count:>7} {mean:>7.2f}ms {p50:>7.2f}ms "
+              f"{p99:>7.2f}ms {peak:>7.2f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+Settle-delay calibration for turn_on_outputs()
+
+power.py waited a fixed 0.5 s after switching ON before measuring. This
+tool characterizes how long each channel actually needs with its load:
+
+    1. Configure the channels as initialize_system() does
+    2. Power-cycle them repeatedly, sampling all channels with chained
+       queries as fast as the link allows after each ON edge; each reading
+       is timestamped when its reply has arrived, so a settle time is
+       never shorter than the instrument needed
+    3a. Check that the tail of every capture is inside the band; if not,
+       the window was too short to reach steady state and is doubled (up
+       to max_window), otherwise the calibration is rejected
+    3. Per channel, take the final value from the tail of each capture and
+       the settle time as the first sample after the last one outside the
+       band around it; fit a first-order curve V(t) = Vf*(1 - exp(-(t-d)/tau))
+       to the rising part
+    4. Recommend max(observed settle, fitted settle) * margin, and store
+       it with the identified load in a JSON file
+
+Results are stored per channel and load: --load names the load connected
+during the calibration (e.g. the DUT), and calibrating another load adds
+its entries to the same file. power.py --settle-file --load then measures
+each channel as soon as the delay calibrated for that load has passed,
+and refuses a file without an entry for it.
+
+Requirements:
+    pip install numpy
+
+Usage:
+    python3 settle_calibration.py --ip 192.168.0.10 --load dut42 --output settle.json
+    python3 settle_calibration.py --resource SIM::NGP804 --load sim --repeats 5
+    python3 power.py --settle-file settle.json --load dut42
+"""
+
+import argparse
+import json
+import math
+import sys
+import time
+
+
+FORMAT_VERSION = 2
+
+
+def capture_edges(ngx, channels, repeats=10, window=0.5, off_time=0.2):
+    """
+    Sample all channels as fast as possible after repeated ON edges
+
+    Args:
+        ngx: NGP800Controller instance, configured and with outputs selected
+        channels: Channel numbers
+        repeats: Number of ON edges
+        window: Seconds sampled after each ON edge
+        off_time: Seconds OFF before each ON edge
+
+    Returns:
+        list: One (times, readings) pair per edge; times (n,) in seconds
+              from the ON command until the reading's reply was received,
+              readings (n, channels, 2) V/I
+    """
+    import numpy as np
+
+    captures = []
+    for _ in range(repeats):
+        ngx.set_general_output_state(False)
+        time.sleep(off_time)
+        start = time.monotonic()
+        ngx.set_general_output_state(True)
+        times = []
+        readings = []
+        while time.monotonic() - start <= window:
+            readings.append(ngx.measure_channels(channels).copy())
+            # On completion: the reading is at least this old, never younger
+            times.append(time.monotonic() - start)
+        captures.append((np.array(times), np.array(readings)))
+    ngx.set_general_output_state(False)
+    return captures
+
+
+def fit_settling(times, voltages, band=0.01, tail=0.2):
+    """
+    Settle characteristics of one channel over several captures
+
+    Args:
+        times: List of time arrays (seconds since the ON command)
+        voltages: List of voltage arrays, same shapes
+        band: Relative band around the final value
+        tail: Fraction of each capture averaged for the final value
+
+    Returns:
+        dict: final_voltage, observed (worst settle time of all captures),
+              tau and delay of the first-order fit (None if the rise was
+              too fast to resolve), fitted settle time, sample_period,
+              settled (False if a capture was still outside the band
+              within its tail, i.e. the window ended before steady state)
+    """
+    import numpy as np
+
+    observed = 0.0
+    fit_t = []
+    fit_y = []
+    finals = []
+    periods = []
+    settled = True
+    for t, v in zip(times, voltages):
+        count = max(int(len(v) * tail), 1)
+        final = float(np.mean(v[-count:]))
+        finals.append(final)
+        if len(t) > 1:
+            periods.append(float(np.median(np.diff(t))))
+        outside = np.flatnonzero(np.abs(v - final) > band * abs(final))
+        if outside.size:
+            last = outside[-1]
+            if last >= len(v) - count:
+                settled = False
+            # Known settled only at the next sample
+            observed = max(observed, float(t[min(last + 1, len(t) - 1)]))
+        # Points on the rising edge between 10 % and 95 % of the final value
+        if final:
+            ratio = v / final
+            rising = (ratio > 0.1) & (ratio < 0.95)
+            fit_t.append(t[rising])
+            fit_y.append(np.log(1.0 - ratio[rising]))
+
+    tau = delay = fitted = None
+    if fit_t:
+        fit_t = np.concatenate(fit_t)
+        fit_y = np.concatenate(fit_y)
+        if fit_t.size >= 3 and np.ptp(fit_t) > 0:
+            slope, intercept = np.polyfit(fit_t, fit_y, 1)
+            if slope < 0:
+                tau = -1.0 / slope
+                delay = intercept * tau
+                fitted = delay + tau * math.log(1.0 / band)
+    return {
+        'final_voltage': float(np.mean(finals)),
+        'observed': observed,
+        'tau': tau,
+        'delay': delay,
+        'fitted': fitted,
+        'sample_period': float(np.median(periods)) if periods else None,
+        'settled': settled,
+    }
+
+
+def calibrate(ngx, channels=(1, 2, 3, 4), repeats=10, window=0.5, band=0.01,
+              margin=1.2, minimum=0.005, max_window=4.0):
+    """
+    Per-channel recommended settle delays
+
+    Args:
+        ngx: NGP800Controller instance, configured and with outputs selected
+        channels: Channel numbers
+        repeats: Number of ON edges
+        window: Seconds sampled after each ON edge
+        band: Relative settle band
+        margin: Safety factor applied to the worst settle time
+        minimum: Lower bound of a recommended delay in seconds
+        max_window: The window is doubled up to this many seconds while a
+                    channel has not reached steady state within it
+
+    Raises:
+        ValueError: If a channel is not settled even with max_window
+
+    Returns:
+        dict: {channel: characteristics incl. 'settle' (recommended delay),
+               'load_ohms' (final V / final I) and 'window'}
+    """
+    channels = list(channels)
+    while True:
+        results = _characterize(ngx, channels, repeats, window, band, margin, minimum)
+        unsettled = [ch for ch, result in results.items() if not result['settled']]
+        if not unsettled:
+            return results
+        if window * 2 > max_window:
+            raise ValueError(f"Channel(s) {unsettled} not within {band:.1%} of their "
+                             f"final value at the end of a {window:g} s window; "
+                             f"increase max_window")
+        window *= 2
+
+
+def _characterize(ngx, channels, repeats, window, band, margin, minimum):
+    """One calibration pass with a fixed window (see calibrate)"""
+    import numpy as np
+
+    captures = capture_edges(ngx, channels, repeats, window)
+    results = {}
+    for index, channel in enumerate(channels):
+        times = [t for t, _ in captures]
+        voltages = [readings[:, index, 0] for _, readings in captures]
+        result = fit_settling(times, voltages, band)
+        currents = np.concatenate([readings[-max(len(readings) // 5, 1):, index, 1]
+                                   for _, readings in captures])
+        current = float(np.mean(currents))
+        result['final_current'] = current
+        result['load_ohms'] = result['final_voltage'] / current if current > 1e-6 else None
+        worst = max(result['observed'], result['fitted'] or 0.0)
+        result['settle'] = round(max(worst * margin, minimum), 4)
+        result['window'] = window
+        results[channel] = result
+    return results
+
+
+def save_settle_times(path, results, band, load):
+    """
+    Store calibration results as JSON, keyed by channel and load
+
+    Entries of other loads already in the file are kept; those of the same
+    channel and load are replaced.
+
+    Args:
+        path: Calibration file
+        results: calibrate() result
+        band: Relative settle band used
+        load: Name of the calibrated load
+    """
+    data = {'version': FORMAT_VERSION, 'channels': {}}
+    try:
+        with open(path) as f:
+            existing = json.load(f)
+        if existing.get('version') == FORMAT_VERSION:
+            data = existing
+    except (OSError, ValueError):
+        pass
+    for channel, result in results.items():
+        entry = dict(result, created=time.time(), band=band)
+        data['channels'].setdefault(str(channel), {})[load] = entry
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=4)
+        f.write('\n')
+
+
+def load_settle_times(path, load):
+    """
+    Read the delays calibrated for one load for turn_on_outputs()
+
+    Args:
+        path: File written by save_settle_times()
+        load: Name of the connected load
+
+    Returns:
+        dict: {channel: seconds}
+
+    Raises:
+        ValueError: Unsupported file, or no channel calibrated for the load
+    """
+    with open(path) as f:
+        data = json.load(f)
+    if data.get('version') != FORMAT_VERSION:
+        raise ValueError(f"Unsupported settle file version {data.get('version')}; "
+                         f"recalibrate with settle_calibration.py")
+    settle = {int(channel): loads[load]['settle']
+              for channel, loads in data['channels'].items() if load in loads}
+    if not settle:
+        known = sorted({name for loads in data['channels'].values() for name in loads})
+        raise ValueError(f"{path} has no calibration for load '{load}' "
+                         f"(calibrated: {', '.join(known) or 'none'})")
+    return settle
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Calibrate per-channel settle delays')
+    parser.add_argument('--ip', help='NGP800 IP address')
+    parser.add_argument('--resource', help='VISA resource string (e.g. SIM::NGP804)')
+    parser.add_argument('--repeats', type=int, default=10, help='ON edges (default: 10)')
+    parser.add_argument('--window', type=float, default=0.5,
+                        help='Seconds sampled after each edge (default: 0.5)')
+    parser.add_argument('--band', type=float, default=0.01,
+                        help='Relative settle band (default: 0.01)')
+    parser.add_argument('--margin', type=float, default=1.2,
+                        help='Safety factor (default: 1.2)')
+    parser.add_argument('--max-window', type=float, default=4.0,
+                        help='Longest window tried while a channel has not settled '
+                        '(default: 4.0)')
+    parser.add_argument('--load', required=True,
+                        help='Name of the connected load, e.g. the DUT (key of the results)')
+    parser.add_argument('--output', default='settle.json',
+                        help='Calibration file, other loads in it are kept')
+    args = parser.parse_args()
+
+    from event_log import LEVELS
+    from power import NGP800Controller, initialize_power_supply, log
+
+    if args.resource:
+        resource_string = args.resource
+    elif args.ip:
+        resource_string = f'TCPIP0::{args.ip}::inst0::INSTR'
+    else:
+        parser.error('--ip or --resource is required')
+
+    ngx = NGP800Controller(resource_string)
+    try:
+        print(f"Connected to: {ngx.get_idn()}")
+        ngx.set_error_policy('batch')
+        log.level = LEVELS['WARNING']
+        initialize_power_supply(ngx)
+        print(f"Sampling {args.repeats} ON edges, {args.window * 1000:.0f} ms each...")
+        try:
+            results = calibrate(ngx, repeats=args.repeats, window=args.window,
+                                band=args.band, margin=args.margin,
+                                max_window=args.max_window)
+        except ValueError as e:
+            sys.exit(f"Calibration rejected: {e}")
+    finally:
+        ngx.set_general_output_state(False)
+        ngx.close()
+        log.close()
+
+    print(f"\n{'Ch':>3} {'final V':>9} {'load':>9} {'sample':>8} {'tau':>8} "
+          f"{'observed':>9} {'fitted':>8} {'settle':>8}")
+    for channel, r in results.items():
+        load = f"{r['load_ohms']:.2f} Ω" if r['load_ohms'] else 'open'
+        tau = f"{r['tau'] * 1000:.2f}ms" if r['tau'] else '-'
+        fitted = f"{r['fitted'] * 1000:.1f}ms" if r['fitted'] else '-'
+        print(f"{channel:>3} {r['final_voltage']:>9.4f} {load:>9} "
+              f"{r['sample_period'] * 1000:>6.2f}ms {tau:>8} "
+              f"{r['observed'] * 1000:>7.1f}ms {fitted:>8} {r['settle'] * 1000:>6.1f}ms")
+    save_settle_times(args.output, results, args.band, args.load)
+    print(f"\nCalibration for load '{args.load}' written to {args.output} "
+          f"(python3 power.py --settle-file {args.output} --load {args.load})")
+
+
+if __name__ == '__main__':
+    main()
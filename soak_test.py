@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""
+Long-duration soak test of the power.py cycle
+
+Runs the real cycle functions of power.py (initialize_system,
+turn_on_outputs, turn_off_outputs) against the offline NGP800 simulator
+and gpiozero's mock pins, at accelerated speed. Every report interval it
+samples:
+
+    - resident set size (VmRSS from /proc/self/status)
+    - number of objects tracked by the garbage collector, and threads
+    - GC collections and pauses (via gc.callbacks)
+    - ON/OFF call latency percentiles for the interval
+    - SCPI messages handled by the simulator
+
+At the end a least-squares slope over the samples after the warm-up is
+computed for RSS, objects and latency; slopes beyond the limits are
+flagged as growth. A per-hour slope from a few minutes of data mostly
+extrapolates start-up allocations and noise, so no trend is computed
+unless at least MIN_TREND_SAMPLES samples spanning MIN_TREND_SPAN seconds
+remain after the warm-up (WARMUP seconds). The time series is written as
+CSV.
+
+Usage:
+    python3 soak_test.py --duration 3600 --interval 30 --output soak.csv
+    python3 soak_test.py --duration 600 --latency 0.0005 --monitors
+"""
+
+import argparse
+import csv
+import gc
+import os
+import sys
+import threading
+import time
+
+os.environ.setdefault('GPIOZERO_PIN_FACTORY', 'mock')
+
+from gpiozero import LED
+
+import power
+from power import (NGP800Controller, initialize_system, turn_on_outputs,
+                   turn_off_outputs)
+from status_monitor import StatusMonitor
+from telemetry import MeasurementSampler
+
+
+COLUMNS = ('elapsed_s', 'cycles', 'commands', 'rss_kb', 'objects', 'threads',
+           'gc_collections', 'gc_pause_max_ms', 'gc_pause_total_ms',
+           'on_p50_ms', 'on_p99_ms', 'on_max_ms',
+           'off_p50_ms', 'off_p99_ms', 'off_max_ms')
+
+# Samples from the first seconds of a run are ignored for trends
+WARMUP = 60.0
+
+# Trends need at least this many samples, spanning this many seconds
+MIN_TREND_SAMPLES = 10
+MIN_TREND_SPAN = 600.0
+
+# Default growth limits per hour of run time, after the warm-up
+GROWTH_LIMITS = {
+    'rss_kb': 1024.0,      # 1 MB/h
+    'objects': 1000.0,     # tracked objects/h
+    'on_p50_ms': 0.5,      # median ON latency, ms/h
+    'off_p50_ms': 0.5,     # median OFF latency, ms/h
+}
+
+
+def read_rss_kb():
+    """Resident set size of this process in kB"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    # Not Linux: peak RSS is the best available approximation
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(int(len(sorted_values) * fraction), len(sorted_values) - 1)]
+
+
+def slope(xs, ys):
+    """Least-squares slope of ys over xs"""
+    n = len(xs)
+    if n < 2:
+        return 0.0
+    mean_x = sum(xs) / n
+    mean_y = sum(ys) / n
+    sxx = sum((x - mean_x) ** 2 for x in xs)
+    if sxx == 0:
+        return 0.0
+    return sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / sxx
+
+
+class GCMonitor:
+    """
+    Collections and pause times of the cyclic garbage collector
+    """
+
+    def __init__(self):
+        self.collections = 0
+        self.pause_max = 0.0
+        self.pause_total = 0.0
+        self._start = None
+
+    def _callback(self, phase, info):
+        if phase == 'start':
+            self._start = time.perf_counter()
+        elif self._start is not None:
+            pause = time.perf_counter() - self._start
+            self._start = None
+            self.collections += 1
+            self.pause_total += pause
+            self.pause_max = max(self.pause_max, pause)
+
+    def install(self):
+        gc.callbacks.append(self._callback)
+
+    def remove(self):
+        gc.callbacks.remove(self._callback)
+
+    def take(self):
+        """Return (collections, max pause, total pause) and start a new interval"""
+        values = (self.collections, self.pause_max, self.pause_total)
+        self.collections = 0
+        self.pause_max = 0.0
+        self.pause_total = 0.0
+        return values
+
+
+class SoakTest:
+    """
+    Accelerated power.py cycle with periodic resource sampling
+    """
+
+    def __init__(self, on_time=0.01, off_time=0.01, settle=0.0, latency=0.0,
+                 interval=10.0, warmup=WARMUP, monitors=False,
+                 min_samples=MIN_TREND_SAMPLES, min_span=MIN_TREND_SPAN):
+        """
+        Args:
+            on_time: Seconds ON per cycle
+            off_time: Seconds OFF per cycle
+            settle: Settle time passed to turn_on_outputs
+            latency: Simulated seconds per SCPI message
+            interval: Seconds between resource samples
+            warmup: Seconds from the start whose samples are ignored for
+                    trend analysis
+            monitors: Also run MeasurementSampler and StatusMonitor on the
+                      same session, as power.py does
+            min_samples: Samples after the warm-up needed for a trend
+            min_span: Seconds the samples after the warm-up must span
+        """
+        self.on_time = on_time
+        self.off_time = off_time
+        self.settle = settle
+        self.latency = latency
+        self.interval = interval
+        self.warmup = warmup
+        self.monitors = monitors
+        self.min_samples = min_samples
+        self.min_span = min_span
+        self.rows = []
+        self.cycles = 0
+        self.gc_monitor = GCMonitor()
+
+    def _sample(self, start, ngx, led, on_latencies, off_latencies):
+        # MockPin keeps a history of every state change; that is test
+        # scaffolding, not a leak of the code under test
+        if hasattr(led.pin, 'clear_states'):
+            led.pin.clear_states()
+        on_latencies.sort()
+        off_latencies.sort()
+        collections, pause_max, pause_total = self.gc_monitor.take()
+        row = {
+            'elapsed_s': round(time.monotonic() - start, 3),
+            'cycles': self.cycles,
+            'commands': ngx.instrument.command_count,
+            'rss_kb': read_rss_kb(),
+            'objects': len(gc.get_objects()),
+            'threads': threading.active_count(),
+            'gc_collections': collections,
+            'gc_pause_max_ms': round(pause_max * 1000, 3),
+            'gc_pause_total_ms': round(pause_total * 1000, 3),
+        }
+        for name, values in (('on', on_latencies), ('off', off_latencies)):
+            row[f'{name}_p50_ms'] = round(percentile(values, 0.50) * 1000, 3)
+            row[f'{name}_p99_ms'] = round(percentile(values, 0.99) * 1000, 3)
+            row[f'{name}_max_ms'] = round((values[-1] if values else 0.0) * 1000, 3)
+        on_latencies.clear()
+        off_latencies.clear()
+        self.rows.append(row)
+        return row
+
+    def run(self, duration, on_row=None):
+        """
+        Cycle for `duration` seconds
+
+        Args:
+            duration: Run time in seconds
+            on_row: Optional callable receiving every sampled row
+        """
+        # The event log stays active (it is part of what is being soaked)
+        power.log.stream = open(os.devnull, 'w')
+        ngx = NGP800Controller('SIM::NGP804')
+        ngx.instrument.latency = self.latency
+        led = LED(17)
+        workers = []
+        self.gc_monitor.install()
+        try:
+            ngx.set_error_policy('batch')
+            initialize_system(ngx, led)
+            if self.monitors:
+                ngx.enable_status_events()
+                workers = [MeasurementSampler(ngx, interval=0.02), StatusMonitor(ngx)]
+                for worker in workers:
+                    worker.start()
+
+            on_latencies = []
+            off_latencies = []
+            start = time.monotonic()
+            next_sample = start + self.interval
+            end = start + duration
+            while time.monotonic() < end:
+                self.cycles += 1
+                t = time.perf_counter()
+                turn_on_outputs(ngx, led, settle=self.settle)
+                on_latencies.append(time.perf_counter() - t - self.settle)
+                time.sleep(self.on_time)
+
+                t = time.perf_counter()
+                turn_off_outputs(ngx, led)
+                off_latencies.append(time.perf_counter() - t)
+                time.sleep(self.off_time)
+
+                if time.monotonic() >= next_sample:
+                    row = self._sample(start, ngx, led, on_latencies, off_latencies)
+                    next_sample += self.interval
+                    if on_row:
+                        on_row(row)
+            if on_latencies:
+                row = self._sample(start, ngx, led, on_latencies, off_latencies)
+                if on_row:
+                    on_row(row)
+        finally:
+            for worker in workers:
+                worker.stop()
+            self.gc_monitor.remove()
+            led.close()
+            ngx.close()
+            power.log.close()
+            power.log.stream.close()
+            power.log.stream = None
+
+    def trends(self, limits=GROWTH_LIMITS):
+        """
+        Growth per hour of each monitored column after the warm-up
+
+        Args:
+            limits: Column -> maximum acceptable growth per hour
+
+        Returns:
+            list: (column, growth_per_hour, limit, flagged) tuples;
+                  growth_per_hour is None (never flagged) when the samples
+                  after the warm-up are too few or span too short a time
+        """
+        rows = [row for row in self.rows if row['elapsed_s'] >= self.warmup]
+        span = rows[-1]['elapsed_s'] - rows[0]['elapsed_s'] if rows else 0.0
+        enough = len(rows) >= self.min_samples and span >= self.min_span
+        xs = [row['elapsed_s'] / 3600 for row in rows]
+        results = []
+        for column, limit in limits.items():
+            if not enough:
+                results.append((column, None, limit, False))
+                continue
+            growth = slope(xs, [row[column] for row in rows])
+            results.append((column, growth, limit, growth > limit))
+        return results
+
+    def write_csv(self, path):
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=COLUMNS)
+            writer.writeheader()
+            writer.writerows(self.rows)
+
+
+def print_row(row):
+    print(f"{row['elapsed_s']:>9.0f}s  cycles {row['cycles']:>8}  "
+          f"cmds {row['commands']:>9}  RSS {row['rss_kb']:>7} kB  "
+          f"objs {row['objects']:>7}  gc max {row['gc_pause_max_ms']:>6.2f} ms  "
+          f"on p50/p99 {row['on_p50_ms']:.2f}/{row['on_p99_ms']:.2f} ms  "
+          f"off p50/p99 {row['off_p50_ms']:.2f}/{row['off_p99_ms']:.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Soak test of the power.py cycle')
+    parser.add_argument('--duration', type=float, default=600,
+                        help='Run time in seconds (default: 600)')
+    parser.add_argument('--interval', type=float, default=10,
+                        help='Seconds between samples (default: 10)')
+    parser.add_argument('--on-time', type=float, default=0.01, help='Seconds ON per cycle')
+    parser.add_argument('--off-time', type=float, default=0.01, help='Seconds OFF per cycle')
+    parser.add_argument('--settle', type=float, default=0.0,
+                        help='Settle time before measuring (default: 0)')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='Simulated seconds per SCPI message (default: 0)')
+    parser.add_argument('--monitors', action='store_true',
+                        help='Also run the sampler and status monitor threads')
+    parser.add_argument('--warmup', type=float, default=WARMUP,
+                        help=f'Seconds ignored for trends (default: {WARMUP:.0f})')
+    parser.add_argument('--min-span', type=float, default=MIN_TREND_SPAN,
+                        help='Seconds of samples after the warm-up needed for '
+                        f'trends (default: {MIN_TREND_SPAN:.0f})')
+    parser.add_argument('--output', default='soak.csv', help='CSV time series file')
+    args = parser.parse_args()
+
+    soak = SoakTest(on_time=args.on_time, off_time=args.off_time, settle=args.settle,
+                    latency=args.latency, interval=args.interval, warmup=args.warmup,
+                    monitors=args.monitors, min_span=args.min_span)
+    print(f"Soak test for {args.duration:.0f} s, sampling every {args.interval:.0f} s")
+    try:
+        soak.run(args.duration, on_row=print_row)
+    except KeyboardInterrupt:
+        print("\nInterrupted, reporting collected samples")
+
+    soak.write_csv(args.output)
+    print(f"\nTime series written to {args.output} ({len(soak.rows)} samples)")
+    print(f"\n{'Trend':<12} {'growth/h':>12} {'limit/h':>10}")
+    flagged = False
+    for column, growth, limit, over in soak.trends():
+        flagged |= over
+        if growth is None:
+            print(f"{column:<12} {'-':>12} {limit:>10.2f}  not enough samples after "
+                  f"the {soak.warmup:.0f} s warm-up ({soak.min_samples} over "
+                  f"{soak.min_span:.0f} s needed)")
+            continue
+        print(f"{column:<12} {growth:>12.2f} {limit:>10.2f}  {'⚠ GROWTH' if over else 'ok'}")
+    sys.exit(1 if flagged else 0)
+
+
+if __name__ == '__main__':
+    main()
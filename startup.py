@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Startup timing and instrument capability cache
+
+power.py starts up as a small pipeline: GPIO setup, the VISA connection
+(reset, capabilities, configuration) and the emergency-off socket run
+concurrently. StartupTimer records every phase with its thread so the
+overlap is visible in the breakdown; CapabilityCache keeps what was
+learned about an instrument across restarts, so a known instrument needs
+no capability queries after a reboot.
+
+Usage:
+    timer = StartupTimer()
+    with timer.phase('connect'):
+        ...
+    print(timer.report())
+
+    cache = CapabilityCache('~/.cache/ngp800_capabilities.json')
+    capabilities = cache.get(resource_string, idn)
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+DEFAULT_CACHE_PATH = '~/.cache/ngp800_capabilities.json'
+
+
+class StartupTimer:
+    """
+    Start and end offsets of named startup phases
+    """
+
+    def __init__(self):
+        self.start = time.monotonic()
+        self.phases = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name):
+        """Time the enclosed block as phase `name`"""
+        begin = time.monotonic()
+        try:
+            yield
+        finally:
+            end = time.monotonic()
+            with self._lock:
+                self.phases.append((name, begin - self.start, end - self.start,
+                                    threading.current_thread().name))
+
+    @property
+    def total(self):
+        """Seconds from timer creation to the end of the last phase"""
+        return max((end for _, _, end, _ in self.phases), default=0.0)
+
+    def report(self):
+        """Per-phase breakdown, ordered by start time"""
+        lines = [f"  {'phase':<14} {'start':>9} {'end':>9} {'duration':>9}  thread"]
+        for name, begin, end, thread in sorted(self.phases, key=lambda p: p[1]):
+            lines.append(f"  {name:<14} {begin * 1000:>7.1f}ms {end * 1000:>7.1f}ms "
+                         f"{(end - begin) * 1000:>7.1f}ms  {thread}")
+        busy = sum(end - begin for _, begin, end, _ in self.phases)
+        lines.append(f"  total {self.total * 1000:.1f} ms "
+                     f"(sum of phases {busy * 1000:.1f} ms)")
+        return '\n'.join(lines)
+
+
+class CapabilityCache:
+    """
+    Instrument capabilities per resource string, validated by *IDN?
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH):
+        """
+        Args:
+            path: JSON cache file (created on first save)
+        """
+        self.path = os.path.expanduser(path)
+        try:
+            with open(self.path) as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def get(self, resource_string, idn):
+        """
+        Cached capabilities, or None if unknown or the instrument changed
+
+        Args:
+            resource_string: VISA resource string
+            idn: Current *IDN? response
+        """
+        entry = self.entries.get(resource_string)
+        if entry is None or entry.get('idn') != idn:
+            return None
+        return entry
+
+    def put(self, resource_string, capabilities):
+        """Store capabilities (must include 'idn') and save the file"""
+        self.entries[resource_string] = capabilities
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path + '.tmp', 'w') as f:
+                json.dump(self.entries, f, indent=4)
+            os.replace(self.path + '.tmp', self.path)
+        except OSError:
+            # A read-only home directory only costs the queries next time
+            pass
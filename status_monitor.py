@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Event-driven protection monitoring for the NGP800
+
+Instead of sweeping READ? over every channel, StatusMonitor watches the
+status byte with one cheap *STB? per poll and only reads the event
+registers when a summary bit is set. CV/CC transitions, protection trips
+(OVP, fuse/OCP, OPP, overtemperature) and command errors are delivered
+as events.
+
+The status byte is polled rather than waiting for a VISA service request,
+because SRQ over LAN is not available with every backend (pyvisa-py).
+
+Usage:
+    ngx.enable_status_events()
+    monitor = StatusMonitor(ngx, on_event=print)
+    monitor.start()
+"""
+
+import threading
+import time
+
+from event_log import default_log
+
+
+class StatusEvent:
+    """
+    One decoded status register event
+    """
+
+    def __init__(self, timestamp, channel, name, active):
+        """
+        Args:
+            timestamp: time.monotonic() when the event was read
+            channel: Channel number (None for instrument-wide events)
+            name: Event name, e.g. 'cc', 'ovp_tripped', 'error'
+            active: True if the condition is now active (ESR value for errors)
+        """
+        self.timestamp = timestamp
+        self.channel = channel
+        self.name = name
+        self.active = active
+
+    def __str__(self):
+        if self.channel is None:
+            return f"Status event: {self.name} (ESR {self.active})"
+        state = 'entered' if self.active else 'left'
+        return f"Status event Ch{self.channel}: {state} {self.name}"
+
+
+class StatusMonitor:
+    """
+    Background watcher of the NGP800 status byte
+    """
+
+    def __init__(self, ngx, interval=0.05, on_event=None, log=None):
+        """
+        Args:
+            ngx: NGP800Controller with enable_status_events() already called
+            interval: Seconds between *STB? polls (default: 0.05)
+            on_event: Optional callable receiving each StatusEvent
+            log: EventLog receiving errors (default: event_log.default_log())
+        """
+        self.ngx = ngx
+        self.log = log if log is not None else default_log()
+        self.interval = interval
+        self.on_event = on_event
+        self.poll_count = 0
+        self.event_count = 0
+        self.error_count = 0
+        # Latest known state per (channel, name), e.g. (1, 'cc') -> True
+        self.state = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def poll(self):
+        """
+        Poll once and dispatch any events
+
+        Returns:
+            list: StatusEvent objects found by this poll
+        """
+        self.poll_count += 1
+        timestamp = time.monotonic()
+        events = [StatusEvent(timestamp, channel, name, active)
+                  for channel, name, active in self.ngx.poll_status_events()]
+        for event in events:
+            self.event_count += 1
+            if event.channel is not None:
+                self.state[(event.channel, event.name)] = event.active
+            if self.on_event is not None:
+                self.on_event(event)
+        return events
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.poll()
+            except Exception as e:
+                self.error_count += 1
+                self.log.warning('status', "Status monitor error: {error}", error=str(e))
+            self._stop.wait(self.interval)
+
+    def start(self):
+        """Start polling on a daemon thread"""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='status-monitor',
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=1.0):
+        """
+        Stop polling
+
+        Args:
+            timeout: Maximum seconds to wait for an in-flight poll
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Streamed V/I telemetry from the NGP800
+
+MeasurementSampler polls the channels on a background thread and hands
+every reading to a list of sinks. A sink is any callable taking
+(timestamp, channel, voltage, current), with timestamp from
+time.monotonic(). Sinks run on the sampler thread and must be cheap -
+typically they only enqueue the sample.
+
+With max_interval set, the sampler adapts its rate: it sweeps every
+`interval` seconds around output transitions (notify_edge) and while a
+reading moves by more than voltage_delta/current_delta, and otherwise
+backs off exponentially up to max_interval. Flat parts of the ON window
+then cost a fraction of the SCPI traffic while transients keep full
+resolution.
+
+Usage:
+    sampler = MeasurementSampler(ngx, channels=[1, 2, 3, 4], interval=0.02)
+    sampler.add_sink(watchdog.feed)
+    sampler.start()
+    ...
+    sampler.stop()
+
+    # Adaptive: 50 Hz around edges and changes, down to 2 Hz when steady
+    sampler = MeasurementSampler(ngx, interval=0.02, max_interval=0.5)
+    ngx.set_general_output_state(True)
+    sampler.notify_edge()
+
+SampleRecorder is a sink that stores every sample, plus output edges
+marked with mark_edge(), in a compact binary file for cycle_analysis.py:
+
+    recorder = SampleRecorder('samples.bin')
+    sampler.add_sink(recorder.feed)
+    recorder.mark_edge(True)       # when switching the outputs ON
+"""
+
+import queue
+import threading
+import time
+
+from event_log import default_log
+
+
+# Record layout of SampleRecorder files. channel 0 marks an output edge,
+# with voltage 1.0 (ON) or 0.0 (OFF) and current 0.
+SAMPLE_FIELDS = [('t', '<f8'), ('channel', 'u1'), ('voltage', '<f4'), ('current', '<f4')]
+
+
+class MeasurementSampler:
+    """
+    Background sampler built around NGP800Controller.measure_channels
+    """
+
+    def __init__(self, ngx, channels=(1, 2, 3, 4), interval=0.05,
+                 max_interval=None, voltage_delta=0.05, current_delta=0.01,
+                 backoff=2.0, burst_time=0.5, log=None):
+        """
+        Args:
+            ngx: NGP800Controller instance
+            channels: Channel numbers to sample
+            interval: Target time between sweeps over all channels in seconds
+                      (the fastest rate when adaptive)
+            max_interval: Slowest time between sweeps in steady state, or
+                          None for a fixed rate (default)
+            voltage_delta: Voltage change in V that counts as activity
+            current_delta: Current change in A that counts as activity
+            backoff: Interval growth factor per quiet sweep
+            burst_time: Seconds of full-rate sampling after notify_edge()
+            log: EventLog receiving errors (default: event_log.default_log())
+        """
+        self.ngx = ngx
+        self.log = log if log is not None else default_log()
+        self.channels = list(channels)
+        self.interval = interval
+        self.max_interval = max_interval
+        self.voltage_delta = voltage_delta
+        self.current_delta = current_delta
+        self.backoff = backoff
+        self.burst_time = burst_time
+        self.current_interval = interval
+        self.sinks = []
+        self.sample_count = 0
+        self.sweep_count = 0
+        self.error_count = 0
+        self._last = {}
+        self._active = False
+        self._burst_until = 0.0
+        self._last_sweep = None
+        self._period = None
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def add_sink(self, sink):
+        """
+        Register a callable receiving (timestamp, channel, voltage, current)
+
+        Args:
+            sink: Callable invoked on the sampler thread for every sample
+        """
+        self.sinks.append(sink)
+
+    def sample_once(self):
+        """Read every channel once and forward the samples to the sinks"""
+        # One chained query per sweep, parsed in bulk
+        readings = self.ngx.measure_channels(self.channels)
+        timestamp = time.monotonic()
+        active = False
+        for channel, (voltage, current) in zip(self.channels, readings.tolist()):
+            self.sample_count += 1
+            last = self._last.get(channel)
+            if (last is None or abs(voltage - last[0]) > self.voltage_delta
+                    or abs(current - last[1]) > self.current_delta):
+                active = True
+                self._last[channel] = (voltage, current)
+            for sink in self.sinks:
+                sink(timestamp, channel, voltage, current)
+        self._active = active
+
+        # Smoothed time between sweeps, for effective_rate
+        if self._last_sweep is not None:
+            period = timestamp - self._last_sweep
+            self._period = period if self._period is None else \
+                0.9 * self._period + 0.1 * period
+        self._last_sweep = timestamp
+        self.sweep_count += 1
+
+    def notify_edge(self):
+        """
+        Sample at the full rate for burst_time seconds, starting now
+
+        Call it right before switching outputs; safe from any thread.
+        """
+        self._burst_until = time.monotonic() + self.burst_time
+        self.current_interval = self.interval
+        self._wake.set()
+
+    @property
+    def effective_rate(self):
+        """Measured sweeps per second (smoothed), 0 before two sweeps"""
+        return 1.0 / self._period if self._period else 0.0
+
+    def _next_interval(self):
+        """Full rate around edges and activity, exponential backoff otherwise"""
+        if self.max_interval is None:
+            return self.interval
+        if self._active or time.monotonic() < self._burst_until:
+            self.current_interval = self.interval
+        else:
+            self.current_interval = min(self.current_interval * self.backoff,
+                                        self.max_interval)
+        return self.current_interval
+
+    def _run(self):
+        next_sweep = time.monotonic()
+        while not self._stop.is_set():
+            try:
+                self.sample_once()
+            except Exception as e:
+                self.error_count += 1
+                self.log.warning('sampler', "Sampler error: {error}", error=str(e))
+            next_sweep += self._next_interval()
+            delay = next_sweep - time.monotonic()
+            if delay < 0:
+                # Running late: restart the schedule instead of bursting
+                next_sweep = time.monotonic()
+                delay = 0
+            if self._wake.wait(delay):
+                # Woken by an edge (or stop): sweep right away
+                self._wake.clear()
+                next_sweep = time.monotonic()
+
+    def start(self):
+        """Start sampling on a daemon thread"""
+        self._stop.clear()
+        self._wake.clear()
+        self._thread = threading.Thread(target=self._run, name='sampler',
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=1.0):
+        """
+        Stop sampling and wait for the thread to finish
+
+        Args:
+            timeout: Maximum seconds to wait for an in-flight measurement
+        """
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+
+class SampleRecorder:
+    """
+    Sink appending samples to a binary file of SAMPLE_FIELDS records
+
+    Samples are collected into a preallocated NumPy buffer on the caller's
+    thread; full buffers are written by a background thread, so the
+    sampler never waits on the disk. Timestamps are stored as wall-clock
+    seconds (time.time() scale) to stay meaningful across restarts.
+    """
+
+    def __init__(self, path, buffer_size=4096):
+        """
+        Args:
+            path: Output file, appended to if it exists
+            buffer_size: Records per write
+        """
+        import numpy as np
+
+        self.path = path
+        self.dtype = np.dtype(SAMPLE_FIELDS)
+        self.records = 0
+        self._buffer = np.zeros(buffer_size, dtype=self.dtype)
+        self._count = 0
+        self._offset = time.time() - time.monotonic()
+        self._lock = threading.Lock()
+        self._queue = queue.SimpleQueue()
+        self._file = open(path, 'ab')
+        self._thread = threading.Thread(target=self._write, name='sample-recorder',
+                                        daemon=True)
+        self._thread.start()
+
+    def _append(self, timestamp, channel, voltage, current):
+        with self._lock:
+            self._buffer[self._count] = (timestamp + self._offset, channel, voltage, current)
+            self._count += 1
+            self.records += 1
+            if self._count == len(self._buffer):
+                self._queue.put(self._buffer.tobytes())
+                self._count = 0
+
+    def feed(self, timestamp, channel, voltage, current):
+        """Store one sample (MeasurementSampler sink)"""
+        self._append(timestamp, channel, voltage, current)
+
+    def mark_edge(self, state, timestamp=None):
+        """
+        Record an output edge, the cycle boundary used by the analysis
+
+        Args:
+            state: True for ON, False for OFF
+            timestamp: time.monotonic() of the edge (default: now)
+        """
+        self._append(time.monotonic() if timestamp is None else timestamp,
+                     0, 1.0 if state else 0.0, 0.0)
+
+    def flush(self):
+        """Hand the partially filled buffer to the writer"""
+        with self._lock:
+            if self._count:
+                self._queue.put(self._buffer[:self._count].tobytes())
+                self._count = 0
+
+    def _write(self):
+        while True:
+            data = self._queue.get()
+            if data is None:
+                break
+            self._file.write(data)
+        self._file.flush()
+
+    def stop(self):
+        """Write everything recorded so far and close the file"""
+        if self._file.closed:
+            return
+        self.flush()
+        self._queue.put(None)
+        self._thread.join()
+        self._file.close()
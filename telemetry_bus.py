@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+"""
+Shared-memory telemetry bus: one publisher, any number of local readers
+
+Dashboards, loggers and watchdogs in other processes used to open their
+own sessions to the NGP800, which the instrument serializes. Instead, the
+process owning NGP800Controller publishes every sample into a ring buffer
+in shared memory, and readers attach by name - no extra instrument
+traffic, no sockets, no pickling.
+
+Layout (little-endian):
+
+    header   magic 'NGTB', version, capacity, record size,
+             head (records published so far), writer pid, created (time.time())
+    records  capacity x 32 bytes: seq u64, t f8, channel u32, voltage f4,
+             current f4 (channel 0 marks an output edge, voltage 1.0/0.0)
+
+Every record slot is a seqlock: the writer stores seq = 2n+1 before and
+2n+2 after writing record n. A reader accepts record n only if seq reads
+2n+2 both before and after copying it; anything else means the writer
+lapped the reader and the record is counted as lost. Readers never block
+the publisher. Timestamps are time.monotonic(), which is system-wide on
+Linux, so readers can compare them with their own clock.
+
+Usage:
+    # Publisher (power.py --bus)
+    bus = TelemetryPublisher('ngp800')
+    sampler.add_sink(bus.feed)
+
+    # Any local process
+    reader = TelemetryReader('ngp800')
+    for t, channel, voltage, current in reader.read():
+        ...
+    records = reader.read_array()      # NumPy structured array
+
+    # Live view
+    python3 telemetry_bus.py ngp800
+"""
+
+import argparse
+import os
+import struct
+import sys
+import threading
+import time
+from multiprocessing import shared_memory
+
+
+MAGIC = b'NGTB'
+VERSION = 1
+DEFAULT_NAME = 'ngp800_telemetry'
+
+_HEADER = struct.Struct('<4sIIIQQd')
+_HEAD_OFFSET = 16
+_HEAD = struct.Struct('<Q')
+_SEQ = struct.Struct('<Q')
+_PAYLOAD = struct.Struct('<dIff4x')
+RECORD_SIZE = _SEQ.size + _PAYLOAD.size
+HEADER_SIZE = 64
+
+# NumPy view of one record slot, for TelemetryReader.read_array()
+RECORD_DTYPE = {'names': ['seq', 't', 'channel', 'voltage', 'current'],
+                'formats': ['<u8', '<f8', '<u4', '<f4', '<f4'],
+                'offsets': [0, 8, 16, 20, 24],
+                'itemsize': RECORD_SIZE}
+
+
+# Segments created by publishers in this process
+_published = set()
+
+
+def _attach(name):
+    """Attach to an existing segment without adopting it"""
+    shm = shared_memory.SharedMemory(name=name)
+    if shm.name in _published:
+        return shm
+    # Python < 3.13 registers every attached segment with the resource
+    # tracker, which would unlink it when this process exits
+    try:
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, 'shared_memory')
+    except Exception:
+        pass
+    return shm
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class TelemetryPublisher:
+    """
+    Writer side of the bus; a MeasurementSampler sink
+    """
+
+    def __init__(self, name=DEFAULT_NAME, capacity=65536):
+        """
+        Create the shared segment
+
+        A segment left behind by a publisher that no longer runs is
+        replaced; one owned by a live process raises FileExistsError.
+
+        Args:
+            name: Segment name readers attach to
+            capacity: Records kept in the ring (default: 65536, about 2.7 min
+                      of 4 channels at 100 sweeps/s)
+        """
+        self.capacity = capacity
+        self.count = 0
+        size = HEADER_SIZE + capacity * RECORD_SIZE
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            stale = shared_memory.SharedMemory(name=name)
+            try:
+                magic, _, _, _, _, pid, _ = _HEADER.unpack_from(stale.buf, 0)
+                if magic == MAGIC and _pid_alive(pid):
+                    raise FileExistsError(f"Telemetry bus '{name}' is published "
+                                          f"by running process {pid}")
+            finally:
+                stale.close()
+            stale.unlink()
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        _published.add(self.shm.name)
+        self._buf = self.shm.buf
+        self._buf[:HEADER_SIZE] = bytes(HEADER_SIZE)
+        _HEADER.pack_into(self._buf, 0, MAGIC, VERSION, capacity, RECORD_SIZE,
+                          0, os.getpid(), time.time())
+        # feed() runs on the sampler thread, mark_edge() on the cycle thread
+        self._lock = threading.Lock()
+
+    @property
+    def name(self):
+        """Name used by readers to attach"""
+        return self.shm.name
+
+    def _publish(self, timestamp, channel, voltage, current):
+        with self._lock:
+            n = self.count
+            offset = HEADER_SIZE + (n % self.capacity) * RECORD_SIZE
+            _SEQ.pack_into(self._buf, offset, 2 * n + 1)
+            _PAYLOAD.pack_into(self._buf, offset + _SEQ.size,
+                               timestamp, channel, voltage, current)
+            _SEQ.pack_into(self._buf, offset, 2 * n + 2)
+            self.count = n + 1
+            _HEAD.pack_into(self._buf, _HEAD_OFFSET, n + 1)
+
+    def feed(self, timestamp, channel, voltage, current):
+        """
+        Publish one sample (MeasurementSampler sink)
+
+        Args:
+            timestamp: time.monotonic() of the sample
+            channel: Channel number
+            voltage: Measured voltage in V
+            current: Measured current in A
+        """
+        self._publish(timestamp, channel, voltage, current)
+
+    def mark_edge(self, state, timestamp=None):
+        """
+        Publish an output edge as a channel 0 record
+
+        Args:
+            state: True for ON, False for OFF
+            timestamp: time.monotonic() of the edge (default: now)
+        """
+        if timestamp is None:
+            timestamp = time.monotonic()
+        self._publish(timestamp, 0, 1.0 if state else 0.0, 0.0)
+
+    def close(self, unlink=True):
+        """
+        Release the segment
+
+        Args:
+            unlink: Remove it, so attached readers see no further data
+        """
+        if self._buf is None:
+            return
+        self._buf.release()
+        self._buf = None
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+            _published.discard(self.shm.name)
+
+    def stop(self):
+        """Close and remove the segment (power.py shutdown)"""
+        self.close()
+
+
+class TelemetryReader:
+    """
+    Attached view of a bus; each reader keeps its own position
+    """
+
+    def __init__(self, name=DEFAULT_NAME, from_start=False):
+        """
+        Args:
+            name: Segment name given to the publisher
+            from_start: Begin with the oldest record still in the ring
+                        instead of only new ones
+        """
+        self.shm = _attach(name)
+        self._buf = self.shm.buf
+        magic, version, self.capacity, record_size, _, self.writer_pid, \
+            self.created = _HEADER.unpack_from(self._buf, 0)
+        if magic != MAGIC or version != VERSION or record_size != RECORD_SIZE:
+            self.close()
+            raise ValueError(f"'{name}' is not a version {VERSION} telemetry bus")
+        self.lost = 0
+        head = self.head()
+        self.position = max(head - self.capacity, 0) if from_start else head
+        self._ring = None
+
+    def head(self):
+        """Number of records published so far"""
+        return _HEAD.unpack_from(self._buf, _HEAD_OFFSET)[0]
+
+    def _window(self):
+        """Records to read now, skipping what was already overwritten"""
+        head = self.head()
+        start = self.position
+        if head - start > self.capacity:
+            self.lost += head - self.capacity - start
+            start = head - self.capacity
+        return start, head
+
+    def read(self, max_records=None):
+        """
+        Records published since the previous call
+
+        Args:
+            max_records: Optional upper bound per call
+
+        Returns:
+            list: (timestamp, channel, voltage, current) tuples in order
+        """
+        start, head = self._window()
+        if max_records is not None:
+            head = min(head, start + max_records)
+        records = []
+        buf = self._buf
+        for n in range(start, head):
+            offset = HEADER_SIZE + (n % self.capacity) * RECORD_SIZE
+            expected = 2 * n + 2
+            seq = _SEQ.unpack_from(buf, offset)[0]
+            if seq < expected:
+                # Head was read ahead of the record; pick it up next time
+                head = n
+                break
+            record = _PAYLOAD.unpack_from(buf, offset + _SEQ.size)
+            if seq != expected or _SEQ.unpack_from(buf, offset)[0] != expected:
+                self.lost += 1
+                continue
+            records.append(record)
+        self.position = head
+        return records
+
+    def read_array(self):
+        """
+        Records published since the previous call, as a NumPy array
+
+        The ring is mapped without copying; the new records are copied out
+        in one vectorized step and validated against their sequence numbers.
+
+        Returns:
+            numpy.ndarray: Structured array with fields t, channel, voltage,
+                           current
+        """
+        import numpy as np
+
+        if self._ring is None:
+            self._ring = np.ndarray(self.capacity, dtype=np.dtype(RECORD_DTYPE),
+                                    buffer=self._buf, offset=HEADER_SIZE)
+        start, head = self._window()
+        index = np.arange(start, head, dtype=np.uint64)
+        slots = index % self.capacity
+        records = self._ring[slots]
+        expected = 2 * index + 2
+        valid = (records['seq'] == expected) & (self._ring['seq'][slots] == expected)
+        self.lost += int(np.count_nonzero(~valid))
+        self.position = head
+        return records[valid][['t', 'channel', 'voltage', 'current']]
+
+    def latest(self, channel):
+        """
+        Most recent sample of one channel still in the ring
+
+        Args:
+            channel: Channel number
+
+        Returns:
+            tuple: (timestamp, voltage, current), or None if there is none
+        """
+        buf = self._buf
+        head = self.head()
+        for n in range(head - 1, max(head - self.capacity, 0) - 1, -1):
+            offset = HEADER_SIZE + (n % self.capacity) * RECORD_SIZE
+            expected = 2 * n + 2
+            if _SEQ.unpack_from(buf, offset)[0] != expected:
+                continue
+            t, record_channel, voltage, current = _PAYLOAD.unpack_from(
+                buf, offset + _SEQ.size)
+            if _SEQ.unpack_from(buf, offset)[0] == expected and record_channel == channel:
+                return t, voltage, current
+        return None
+
+    def close(self):
+        """Detach; the segment stays for the publisher and other readers"""
+        if self._buf is None:
+            return
+        self._ring = None
+        self._buf.release()
+        self._buf = None
+        self.shm.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Show live V/I from a telemetry bus')
+    parser.add_argument('name', nargs='?', default=DEFAULT_NAME,
+                        help=f'Bus name (default: {DEFAULT_NAME})')
+    parser.add_argument('--interval', type=float, default=1.0,
+                        help='Seconds between updates (default: 1.0)')
+    args = parser.parse_args()
+
+    try:
+        reader = TelemetryReader(args.name)
+    except FileNotFoundError:
+        print(f"No telemetry bus '{args.name}' (start power.py --bus {args.name})")
+        sys.exit(1)
+    print(f"Attached to '{args.name}' published by PID {reader.writer_pid}, "
+          f"{reader.capacity} records")
+    latest = {}
+    try:
+        while True:
+            time.sleep(args.interval)
+            records = reader.read()
+            for t, channel, voltage, current in records:
+                latest[channel] = (t, voltage, current)
+            age = time.monotonic()
+            line = '  '.join(f"Ch{channel}: {v:7.3f} V {i:8.5f} A ({(age - t) * 1000:.0f} ms)"
+                             for channel, (t, v, i) in sorted(latest.items()) if channel)
+            print(f"{len(records) / args.interval:7.1f} rec/s  lost {reader.lost}  {line}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        reader.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+CommandQueue coalescing and ordering against a recording controller
+
+Usage:
+    python3 -m pytest tests
+"""
+
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from command_queue import CommandQueue
+from event_log import EventLog
+
+
+class RecordingController:
+    """Stands in for NGP800Controller.send_settings()"""
+
+    def __init__(self, fail=False):
+        self.rounds = []
+        self.fail = fail
+        self.release = threading.Event()
+        self.release.set()
+
+    def send_settings(self, settings, sync=True):
+        self.release.wait(5)
+        if self.fail:
+            raise OSError('link down')
+        self.rounds.append(list(settings))
+
+
+def test_setpoints_coalesce_per_channel_and_parameter():
+    ngx = RecordingController()
+    cq = CommandQueue(ngx)
+    for step in range(100):
+        cq.set_voltage(1, step / 10)
+        cq.set_current(1, 0.5)
+    cq.set_voltage(2, 3.3)
+    assert cq.depth == 3
+    cq.start()
+    assert cq.flush(5)
+    cq.stop(5)
+    # Last write wins, in order of first submission
+    assert ngx.rounds == [[(1, 'voltage', 9.9), (1, 'current', 0.5), (2, 'voltage', 3.3)]]
+    stats = cq.stats()
+    assert stats['submitted'] == 201
+    assert stats['coalesced'] == 198
+    assert stats['sent'] == 3
+    assert stats['rounds'] == 1
+
+
+def test_barriers_keep_order():
+    ngx = RecordingController()
+    cq = CommandQueue(ngx)
+    cq.set_voltage(1, 5.0)
+    cq.set_output_select(1, True)
+    cq.set_voltage(1, 6.0)
+    cq.set_voltage(1, 7.0)
+    cq.set_general_output_state(True)
+    cq.set_voltage(1, 8.0)
+    cq.start()
+    assert cq.flush(5)
+    cq.stop(5)
+    assert [setting for round_ in ngx.rounds for setting in round_] == [
+        (1, 'voltage', 5.0), (1, 'output_select', True),
+        (1, 'voltage', 7.0), (None, 'general', True),
+        (1, 'voltage', 8.0)]
+
+
+def test_writes_during_a_round_go_to_the_next_one():
+    ngx = RecordingController()
+    ngx.release.clear()
+    cq = CommandQueue(ngx)
+    cq.start()
+    cq.set_voltage(1, 1.0)
+    # Wait until the writer has taken the first round
+    while cq.depth:
+        time.sleep(0.001)
+    cq.set_voltage(1, 2.0)
+    cq.set_voltage(1, 3.0)
+    ngx.release.set()
+    assert cq.flush(5)
+    cq.stop(5)
+    assert ngx.rounds == [[(1, 'voltage', 1.0)], [(1, 'voltage', 3.0)]]
+
+
+def test_errors_are_counted_and_writes_after_stop_dropped():
+    cq = CommandQueue(RecordingController(fail=True), log=EventLog())
+    cq.set_voltage(1, 5.0)
+    cq.set_current(1, 0.1)
+    cq.start()
+    assert cq.flush(5)
+    cq.stop(5)
+    cq.set_voltage(1, 6.0)
+    assert isinstance(cq.last_error, OSError)
+    assert cq.dropped == 3
+    assert cq.depth == 0
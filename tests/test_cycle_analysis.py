@@ -0,0 +1,47 @@
+"""
+Anomaly flagging in cycle_analysis.flag_anomalies
+
+Usage:
+    python3 -m pytest tests
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import numpy as np
+
+from cycle_analysis import ANOMALY_BITS, MIN_ANOMALY_CYCLES, flag_anomalies
+
+
+def clean_columns(n, seed):
+    """Per-cycle metrics drawn iid around typical values"""
+    rng = np.random.default_rng(seed)
+    columns = {'cycle': np.arange(n)}
+    typical = {'v_mean': 5.0, 'i_mean': 0.1, 'v_ripple': 0.002,
+               'rise_time': 0.003, 'i_max': 0.15}
+    for name in ANOMALY_BITS:
+        columns[name] = typical[name] * (1.0 + 0.01 * rng.standard_normal(n))
+    return columns
+
+
+def test_clean_data_is_not_flagged():
+    for n in (12, 20, MIN_ANOMALY_CYCLES, 100, 1000):
+        for seed in range(20):
+            flags = flag_anomalies(clean_columns(n, seed))
+            assert not flags.any(), (n, seed, np.flatnonzero(flags))
+
+
+def test_short_runs_are_not_flagged():
+    columns = clean_columns(MIN_ANOMALY_CYCLES - 1, 0)
+    columns['v_mean'][5] *= 2.0
+    assert not flag_anomalies(columns).any()
+
+
+def test_outlier_is_flagged():
+    columns = clean_columns(100, 0)
+    columns['i_mean'][40] *= 1.5
+    flags = flag_anomalies(columns)
+    assert flags[40] == ANOMALY_BITS['i_mean']
+    assert np.count_nonzero(flags) == 1
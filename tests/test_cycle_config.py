@@ -0,0 +1,88 @@
+"""
+Configuration reload against the offline simulator
+
+Usage:
+    python3 -m pytest tests
+"""
+
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from cycle_config import (ConfigError, apply_setpoints, channel_changes,
+                          diff_config, load_config, revert_setpoints)
+from power import NGP800Controller, SCPIError, initialize_power_supply
+
+
+def write_config(path, channels):
+    with open(path, 'w') as f:
+        json.dump({'channels': {str(ch): {'voltage': v, 'current': i}
+                                for ch, (v, i) in channels.items()}}, f)
+    return load_config(str(path))
+
+
+def configured(setpoints):
+    ngx = NGP800Controller('SIM::NGP804')
+    ngx.set_error_policy('batch')
+    initialize_power_supply(ngx, setpoints)
+    return ngx
+
+
+def reload(ngx, old, new):
+    """What power.py does at a cycle boundary; returns the applied config"""
+    timing, changed, restart = diff_config(old, new)
+    added, removed = channel_changes(old, new)
+    try:
+        apply_setpoints(ngx, changed, added, removed)
+    except SCPIError:
+        revert_setpoints(ngx, old, changed, added, removed)
+        return old
+    return new
+
+
+def assert_matches(ngx, config):
+    for number, channel in ngx.instrument.channels.items():
+        assert channel.selected == (number in config['channels'])
+        assert ngx.intended.get(number, {}).get('output_select', False) == \
+            (number in config['channels'])
+    for number, (voltage, current) in config['channels'].items():
+        assert ngx.instrument.channels[number].voltage == voltage
+        assert ngx.instrument.channels[number].current == current
+        assert ngx.intended[number]['voltage'] == voltage
+        assert ngx.intended[number]['current'] == current
+
+
+def test_channels_added_and_removed(tmp_path):
+    old = write_config(tmp_path / 'a.json', {1: (25.0, 6.0), 2: (25.0, 6.0)})
+    ngx = configured(old['channels'])
+    new = write_config(tmp_path / 'b.json', {1: (24.0, 6.0), 3: (12.0, 1.0)})
+    applied = reload(ngx, old, new)
+    assert applied is new
+    assert_matches(ngx, new)
+
+
+def test_rejected_batch_restores_the_previous_setpoints(tmp_path):
+    old = write_config(tmp_path / 'a.json', {1: (25.0, 6.0), 2: (25.0, 6.0)})
+    ngx = configured(old['channels'])
+    # Channel 2 is above the simulated NGP804 rating, channel 1 is valid
+    new = write_config(tmp_path / 'b.json', {1: (20.0, 6.0), 2: (40.0, 6.0),
+                                              3: (12.0, 1.0)})
+    applied = reload(ngx, old, new)
+    assert applied is old
+    assert_matches(ngx, old)
+
+
+def test_invalid_channels_are_rejected_before_sending(tmp_path):
+    path = tmp_path / 'c.json'
+    with open(path, 'w') as f:
+        json.dump({'channels': {'3': {'voltage': 12.0, 'current': 1.0}}}, f)
+    with pytest.raises(ConfigError):
+        load_config(str(path), channel_count=2)
+    with open(path, 'w') as f:
+        json.dump({'channels': {'1': {'voltage': -1.0, 'current': 1.0}}}, f)
+    with pytest.raises(ConfigError):
+        load_config(str(path))
@@ -0,0 +1,91 @@
+"""
+DUT capture bookkeeping and P² quantiles without GPIO hardware
+
+Usage:
+    python3 -m pytest tests
+"""
+
+import csv
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from dut_capture import CSV_COLUMNS, DutCapture, P2Quantile, StreamingStats
+
+
+def run_cycles(path, count):
+    """Closes count cycles without starting a GPIO backend"""
+    capture = DutCapture(27, csv_path=str(path))
+    for cycle in range(count):
+        sent_ns = cycle * 1_000_000_000
+        capture.mark_power_on(sent_ns, sent_ns + 2_000_000)
+        capture._on_edge(sent_ns + 50_000_000, True)
+    capture.stop()
+    return capture
+
+
+def test_appended_runs_continue_the_numbering(tmp_path):
+    path = tmp_path / 'boot.csv'
+    first = run_cycles(path, 3)
+    second = run_cycles(path, 2)
+    assert (first.run, second.run) == (1, 2)
+    assert second.last.cycle == 5
+    with open(path, newline='') as f:
+        rows = list(csv.reader(f))
+    assert tuple(rows[0]) == CSV_COLUMNS
+    assert [(row[0], row[1]) for row in rows[1:]] == [
+        ('1', '1'), ('1', '2'), ('1', '3'), ('2', '4'), ('2', '5')]
+
+
+def test_only_a_summary_is_kept(tmp_path):
+    capture = run_cycles(tmp_path / 'boot.csv', 100)
+    assert capture.cycles == 100
+    assert capture.stats.count == 100
+    assert capture.last.boot_latency == pytest.approx(0.05)
+
+
+def test_foreign_csv_is_rejected(tmp_path):
+    path = tmp_path / 'boot.csv'
+    path.write_text('cycle,sent_ns\n1,0\n')
+    with pytest.raises(ValueError):
+        DutCapture(27, csv_path=str(path))
+
+
+@pytest.mark.parametrize('distribution', ['uniform', 'normal', 'lognormal'])
+@pytest.mark.parametrize('p', [0.5, 0.9, 0.99])
+def test_p2_matches_numpy_quantiles(distribution, p):
+    rng = np.random.default_rng(49)
+    samples = getattr(rng, distribution)(size=20000)
+    estimator = P2Quantile(p)
+    for x in samples:
+        estimator.add(float(x))
+    # Compared by rank, so the tolerance does not depend on the scale
+    rank = np.mean(samples <= estimator.value)
+    assert rank == pytest.approx(p, abs=0.005)
+    spread = np.quantile(samples, 0.999) - np.quantile(samples, 0.001)
+    assert estimator.value == pytest.approx(np.quantile(samples, p), abs=0.02 * spread)
+
+
+def test_p2_is_exact_for_few_samples():
+    samples = [0.4, 0.1, 0.5, 0.2, 0.3]
+    for p in (0.5, 0.9, 0.99):
+        estimator = P2Quantile(p)
+        assert estimator.value is None
+        for count, x in enumerate(samples, 1):
+            estimator.add(x)
+            assert estimator.value == np.quantile(samples[:count], p,
+                                                  method='inverted_cdf')
+
+
+def test_streaming_stats():
+    stats = StreamingStats()
+    assert str(stats) == 'no samples'
+    for x in np.linspace(0.001, 0.1, 1000):
+        stats.add(float(x))
+    assert (stats.count, stats.min, stats.max) == (1000, 0.001, 0.1)
+    assert stats.mean == pytest.approx(0.0505)
+    assert stats.quantiles[0.5].value == pytest.approx(0.0505, abs=0.001)
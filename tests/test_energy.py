@@ -0,0 +1,75 @@
+"""
+Energy and charge integration on known waveforms
+
+Usage:
+    python3 -m pytest tests
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from energy import EnergyAccumulator
+
+
+def feed_all(energy, channel, t, voltages, currents):
+    for sample in zip(t, voltages, currents):
+        energy.feed(sample[0], channel, sample[1], sample[2])
+
+
+def test_constant_load():
+    energy = EnergyAccumulator(channels=(1,))
+    t = np.linspace(0.0, 3600.0, 61)
+    feed_all(energy, 1, t, np.full(t.size, 12.0), np.full(t.size, 0.5))
+    wh, ah = energy.totals()[1]
+    assert wh == pytest.approx(6.0)
+    assert ah == pytest.approx(0.5)
+
+
+def test_current_ramp_is_exact():
+    # The trapezoidal rule is exact for a linear waveform
+    energy = EnergyAccumulator(channels=(1,))
+    t = np.array([0.0, 1000.0, 3600.0])
+    feed_all(energy, 1, t, np.ones(3), t / 3600.0)
+    wh, ah = energy.totals()[1]
+    assert wh == pytest.approx(0.5)
+    assert ah == pytest.approx(0.5)
+
+
+def test_sine_matches_feed_and_update():
+    t = np.linspace(0.0, 2.0, 2001)
+    voltages = 5.0 + np.sin(2 * np.pi * t)
+    currents = 1.0 + 0.5 * np.sin(2 * np.pi * t)
+    fed = EnergyAccumulator(channels=(1,))
+    feed_all(fed, 1, t, voltages, currents)
+    batched = EnergyAccumulator(channels=(1,))
+    batched.update(1, t[:1000], voltages[:1000], currents[:1000])
+    batched.update(1, t[1000:], voltages[1000:], currents[1000:])
+    # Over whole periods: mean(V*I) = 5 + 0.5 * 0.5, mean(I) = 1
+    assert fed.totals()[1][0] == pytest.approx(2 * 5.25 / 3600, rel=1e-5)
+    assert fed.totals()[1][1] == pytest.approx(2 / 3600, rel=1e-5)
+    assert batched.totals()[1] == pytest.approx(fed.totals()[1])
+
+
+def test_gaps_are_not_integrated():
+    energy = EnergyAccumulator(channels=(1,), max_gap=2.0)
+    feed_all(energy, 1, [0.0, 1.0, 100.0, 101.0], [1.0] * 4, [3.6] * 4)
+    energy.update(1, [500.0, 501.0], [1.0] * 2, [3.6] * 2)
+    wh, ah = energy.totals()[1]
+    assert wh == pytest.approx(3 * 3.6 / 3600)
+    assert ah == pytest.approx(3 * 3.6 / 3600)
+
+
+def test_cycles_reset_but_totals_accumulate():
+    energy = EnergyAccumulator(channels=(1, 2))
+    feed_all(energy, 1, [0.0, 3600.0], [2.0, 2.0], [1.0, 1.0])
+    assert energy.new_cycle() == {1: pytest.approx((2.0, 1.0)), 2: (0.0, 0.0)}
+    feed_all(energy, 1, [7200.0], [2.0], [1.0])
+    energy.feed(7200.0, 5, 1.0, 1.0)    # unknown channel, ignored
+    assert energy.cycle_totals()[1] == pytest.approx((2.0, 1.0))
+    assert energy.totals()[1] == pytest.approx((4.0, 2.0))
+    assert energy.cycles == 1
@@ -0,0 +1,73 @@
+"""
+NGP800Controller state tracking against the offline simulator
+
+Usage:
+    python3 -m pytest tests
+"""
+
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from cycle_config import apply_setpoints
+from power import NGP800Controller, deselect_channels
+
+
+def simulator(latency=0.0002):
+    ngx = NGP800Controller('SIM::NGP804')
+    # A little latency per message widens the window for interleaving
+    ngx.instrument.latency = latency
+    return ngx
+
+
+def test_intended_state_survives_concurrent_sampling():
+    ngx = simulator()
+    stop = threading.Event()
+
+    def sample():
+        # Yielding between exchanges lets them land inside the main
+        # thread's batches, as a sampler paced by its interval does
+        while not stop.is_set():
+            ngx.measure_channels([1, 2, 3, 4])
+            time.sleep(0)
+            ngx.measure_channel(3)
+            time.sleep(0)
+
+    sampler = threading.Thread(target=sample)
+    sampler.start()
+    try:
+        for step in range(50):
+            setpoints = {ch: (10.0 + ch + step * 0.01, 1.0 + ch * 0.1) for ch in (1, 2, 3, 4)}
+            apply_setpoints(ngx, setpoints)
+            with ngx.batch():
+                for channel in (1, 2, 3, 4):
+                    ngx.select_channel(channel)
+                    ngx.set_output_select(True)
+            deselect_channels(ngx, [2])
+    finally:
+        stop.set()
+        sampler.join()
+
+    assert set(ngx.intended) == {1, 2, 3, 4}
+    for channel in (1, 2, 3, 4):
+        voltage, current = setpoints[channel]
+        assert ngx.intended[channel]['voltage'] == voltage
+        assert ngx.intended[channel]['current'] == current
+        assert ngx.intended[channel]['output_select'] == (channel != 2)
+        simulated = ngx.instrument.channels[channel]
+        assert abs(simulated.voltage - voltage) < 1e-9
+        assert simulated.selected == (channel != 2)
+    ngx.close()
+
+
+def test_measurement_keeps_the_selection():
+    ngx = simulator(latency=0.0)
+    ngx.select_channel(2)
+    ngx.measure_channels([1, 3, 4])
+    ngx.measure_channel(4)
+    assert ngx.selected_channel == 2
+    assert ngx.instrument.selected == 2
+    ngx.close()
@@ -0,0 +1,80 @@
+"""
+ASCII and binary measurement reply parsing round trips
+
+Usage:
+    python3 -m pytest tests
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from scpi_parse import (READ_BLOCK_DTYPE, VECTOR_MIN_BYTES, parse_ascii_values,
+                        parse_block, parse_read_blocks, read_reply_size)
+
+
+def ascii_reply(pairs):
+    return (';'.join(f'{v!r},{i!r}' for v, i in pairs) + '\n').encode('ascii')
+
+
+def binary_reply(pairs):
+    records = b';'.join(b'#18' + np.array(pair, dtype='<f4').tobytes()
+                        for pair in pairs)
+    return records + b'\n'
+
+
+@pytest.mark.parametrize('channels', [1, 4, 64])
+def test_ascii_round_trip(channels):
+    # 1 and 4 channels take the split/float path, 64 the vectorized one
+    rng = np.random.default_rng(channels)
+    pairs = np.round(rng.uniform(0.0, 32.0, size=(channels, 2)), 4)
+    reply = ascii_reply(pairs.tolist())
+    assert (len(reply) >= VECTOR_MIN_BYTES) == (channels == 64)
+    values = parse_ascii_values(reply, count=channels * 2)
+    assert values.dtype == np.float64
+    assert np.array_equal(values.reshape(-1, 2), pairs)
+    assert np.array_equal(parse_ascii_values(reply.decode('ascii')), values)
+
+
+def test_ascii_into_preallocated_buffer():
+    out = np.zeros(8)
+    values = parse_ascii_values(b'25.0,0.1;24.9,0.2\n', out=out)
+    assert values.base is out
+    assert values.tolist() == [25.0, 0.1, 24.9, 0.2]
+
+
+@pytest.mark.parametrize('reply', [b'25.0,0.1;24.9\n', b'25.0,abc\n'])
+def test_ascii_rejects_malformed_replies(reply):
+    with pytest.raises(ValueError):
+        parse_ascii_values(reply, count=4)
+
+
+def test_binary_round_trip():
+    pairs = [(25.0, 0.125), (12.5, 1.5), (3.25, 0.0)]
+    reply = binary_reply(pairs)
+    assert len(reply) == read_reply_size(len(pairs))
+    records = parse_read_blocks(reply)
+    assert records.dtype == READ_BLOCK_DTYPE
+    assert list(zip(records['voltage'].tolist(), records['current'].tolist())) == pairs
+
+
+def test_binary_rejects_bad_framing():
+    reply = binary_reply([(1.0, 2.0), (3.0, 4.0)])
+    with pytest.raises(ValueError):
+        parse_read_blocks(reply[:-1])
+    with pytest.raises(ValueError):
+        parse_read_blocks(b'$' + reply[1:])
+
+
+def test_definite_length_block():
+    payload = np.arange(5, dtype='<f4')
+    buffer = b'xx#220' + payload.tobytes() + b'\n'
+    values, end = parse_block(buffer, offset=2)
+    assert np.array_equal(values, payload)
+    assert buffer[end:] == b'\n'
+    with pytest.raises(ValueError):
+        parse_block(b'#0' + payload.tobytes())
@@ -0,0 +1,71 @@
+"""
+Recording and per-thread replay of SCPI sessions
+
+Usage:
+    python3 -m pytest tests
+"""
+
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from power import NGP800Controller
+from scpi_session import ReplayMismatch
+
+
+def main_thread_work(ngx):
+    ngx.select_channel(1)
+    ngx.set_voltage(12.0)
+    ngx.set_output_select(True)
+    ngx.set_general_output_state(True)
+    return ngx.query('SOURce:VOLTage?')
+
+
+def sampler_work(ngx, results):
+    for _ in range(20):
+        results.append(ngx.measure_channels([1, 2]).tolist())
+
+
+def run(ngx, sampler_first):
+    """Main and sampler traffic, interleaved differently per call"""
+    results = []
+    sampler = threading.Thread(target=sampler_work, args=(ngx, results), name='sampler')
+    if sampler_first:
+        sampler.start()
+        sampler.join()
+        reply = main_thread_work(ngx)
+    else:
+        sampler.start()
+        reply = main_thread_work(ngx)
+        sampler.join()
+    return reply, results
+
+
+def test_replay_matches_per_thread(tmp_path):
+    path = str(tmp_path / 'run.scpi.gz')
+    recorder = NGP800Controller('SIM::NGP804', record_path=path)
+    recorded = run(recorder, sampler_first=False)
+    recorder.close()
+
+    replay = NGP800Controller(f'REPLAY::{path}')
+    replayed = run(replay, sampler_first=True)
+    assert replayed == recorded
+    assert replay.instrument.finished
+    assert replay.instrument.mismatches == 0
+
+
+def test_replay_rejects_different_commands(tmp_path):
+    path = str(tmp_path / 'run.scpi.gz')
+    recorder = NGP800Controller('SIM::NGP804', record_path=path)
+    recorder.select_channel(1)
+    recorder.set_voltage(12.0)
+    recorder.close()
+
+    replay = NGP800Controller(f'REPLAY::{path}')
+    replay.select_channel(1)
+    with pytest.raises(ReplayMismatch):
+        replay.set_voltage(13.0)
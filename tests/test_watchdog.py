@@ -0,0 +1,78 @@
+"""
+Watchdog trip latching and escalation
+
+Usage:
+    python3 -m pytest tests
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from emergency_off import EmergencyReport
+from power import NGP800Controller
+from watchdog import ThresholdRule, Watchdog
+
+
+class FakeEmergency:
+    """EmergencyOff stand-in with configurable confirmation"""
+
+    def __init__(self, trip_confirmed, trigger_confirmed=True):
+        self.trip_confirmed = trip_confirmed
+        self.trigger_confirmed = trigger_confirmed
+        self.trips = []
+        self.triggers = 0
+
+    def trip_channels(self, channels, timeout=None):
+        self.trips.append(list(channels))
+        return EmergencyReport(None, 0.001, 0.002 if self.trip_confirmed else None,
+                               self.trip_confirmed, timeout)
+
+    def trigger(self):
+        self.triggers += 1
+        return EmergencyReport(None, 0.001, 0.002 if self.trigger_confirmed else None,
+                               self.trigger_confirmed, 0.8)
+
+
+def run_trip(emergency, ngx=None):
+    watchdog = Watchdog(emergency, ngx=ngx, nice=0)
+    watchdog.add_rule(1, ThresholdRule('current', above=1.0))
+    watchdog.start()
+    watchdog.arm()
+    watchdog.feed(time.monotonic(), 1, 24.0, 2.0)
+    deadline = time.monotonic() + 2.0
+    while not watchdog.trips and time.monotonic() < deadline:
+        time.sleep(0.001)
+    watchdog.stop()
+    return watchdog
+
+
+def test_confirmed_trip_is_latched():
+    ngx = NGP800Controller('SIM::NGP804')
+    ngx.select_channel(1)
+    ngx.set_output_select(True)
+    emergency = FakeEmergency(trip_confirmed=True)
+    watchdog = run_trip(emergency, ngx)
+    assert watchdog.tripped == {1}
+    assert not watchdog.unconfirmed
+    assert emergency.triggers == 0
+    assert ngx.intended[1]['output_select'] is False
+
+
+def test_unconfirmed_trip_escalates_and_is_not_latched():
+    ngx = NGP800Controller('SIM::NGP804')
+    ngx.set_general_output_state(True)
+    emergency = FakeEmergency(trip_confirmed=False, trigger_confirmed=False)
+    watchdog = run_trip(emergency, ngx)
+    assert not watchdog.tripped
+    assert watchdog.unconfirmed == {1}
+    assert emergency.triggers == 1
+    assert watchdog.trips[0].escalation is not None
+    # Neither path confirmed: the main session switched the master off
+    assert ngx.intended_general is False
+    assert ngx.instrument.general is False
+    assert ngx.intended[1]['output_select'] is False
+    watchdog.latch([1])
+    assert watchdog.tripped == {1} and not watchdog.unconfirmed
@@ -0,0 +1,448 @@
+#!/usr/bin/env python3
+"""
+Overcurrent/undervoltage software watchdog for the NGP800
+
+Evaluates per-channel trip rules on streamed V/I samples (see
+telemetry.MeasurementSampler) and switches the affected outputs off
+through the pre-opened EmergencyOff channel, so a trip never waits for
+the main VISA session.
+
+The evaluation thread runs with raised scheduling priority where the OS
+allows it; trip reporting (printing, logging) is handed to a separate
+low-priority thread and never delays the next trip. The OFF exchange of a
+trip is bounded by the budget.
+
+A tripped channel is switched off and removed from the master switch, and
+once the instrument confirmed that, it is latched (tripped) and not
+evaluated again until reset() - only call it after the channel was
+deliberately selected again. An unconfirmed trip (budget exceeded or
+emergency socket down) escalates to the master OFF of EmergencyOff.trigger()
+and, failing that, of the main session; the channel stays in `unconfirmed`
+and keeps being evaluated until latch() is called for it (after it was
+deselected over the main session). With the controller given, its intended
+state records the channel as deselected at the trip, so a reconnect does
+not switch it back on.
+
+Usage:
+    watchdog = Watchdog(emergency, on_trip=print, ngx=ngx)
+    for channel in range(1, 5):
+        watchdog.add_rule(channel, ThresholdRule('current', above=5.5, samples=3))
+        watchdog.add_rule(channel, ThresholdRule('voltage', below=23.0, samples=3))
+    watchdog.start()
+    sampler.add_sink(watchdog.feed)
+    watchdog.arm()
+"""
+
+import os
+import queue
+import threading
+import time
+
+from event_log import default_log
+
+
+class ThresholdRule:
+    """
+    Trip when a value stays outside a limit for N consecutive samples
+    """
+
+    def __init__(self, quantity, above=None, below=None, samples=1):
+        """
+        Args:
+            quantity: 'voltage' or 'current'
+            above: Trip when the value is greater than this limit
+            below: Trip when the value is less than this limit
+            samples: Number of consecutive violating samples required
+        """
+        self.quantity = quantity
+        self.above = above
+        self.below = below
+        self.samples = samples
+        self.onset = None
+        self._count = 0
+
+    def reset(self):
+        """Clear the sustained-sample counter"""
+        self._count = 0
+        self.onset = None
+
+    def check(self, timestamp, voltage, current):
+        """
+        Evaluate one sample
+
+        Returns:
+            bool: True if the rule trips
+        """
+        value = voltage if self.quantity == 'voltage' else current
+        violated = ((self.above is not None and value > self.above) or
+                    (self.below is not None and value < self.below))
+        if not violated:
+            self._count = 0
+            self.onset = None
+            return False
+        if not self._count:
+            self.onset = timestamp
+        self._count += 1
+        return self._count >= self.samples
+
+    def __str__(self):
+        limits = []
+        if self.above is not None:
+            limits.append(f'> {self.above}')
+        if self.below is not None:
+            limits.append(f'< {self.below}')
+        return f"{self.quantity} {' or '.join(limits)} for {self.samples} samples"
+
+
+class RateRule:
+    """
+    Trip when a value changes faster than a limit for N consecutive samples
+    """
+
+    def __init__(self, quantity, max_rate, samples=1):
+        """
+        Args:
+            quantity: 'voltage' or 'current'
+            max_rate: Maximum allowed |d(value)/dt| in units per second
+            samples: Number of consecutive violating samples required
+        """
+        self.quantity = quantity
+        self.max_rate = max_rate
+        self.samples = samples
+        self.onset = None
+        self._count = 0
+        self._last = None
+
+    def reset(self):
+        """Forget the previous sample and the sustained-sample counter"""
+        self._count = 0
+        self._last = None
+        self.onset = None
+
+    def check(self, timestamp, voltage, current):
+        """
+        Evaluate one sample
+
+        Returns:
+            bool: True if the rule trips
+        """
+        value = voltage if self.quantity == 'voltage' else current
+        last = self._last
+        self._last = (timestamp, value)
+        if last is None or timestamp <= last[0]:
+            return False
+        rate = abs(value - last[1]) / (timestamp - last[0])
+        if rate <= self.max_rate:
+            self._count = 0
+            self.onset = None
+            return False
+        if not self._count:
+            self.onset = timestamp
+        self._count += 1
+        return self._count >= self.samples
+
+    def __str__(self):
+        unit = 'V' if self.quantity == 'voltage' else 'A'
+        return f"{self.quantity} rate > {self.max_rate} {unit}/s for {self.samples} samples"
+
+
+class TripEvent:
+    """
+    Record of one watchdog trip with its latency breakdown
+    """
+
+    def __init__(self, channel, rule, voltage, current, sample_time,
+                 detect_time, off_time, report, budget, onset_time=None,
+                 escalation=None):
+        """
+        Args:
+            channel: Tripped channel number
+            rule: Rule that tripped
+            voltage: Voltage of the tripping sample in V
+            current: Current of the tripping sample in A
+            sample_time: time.monotonic() of the tripping sample
+            detect_time: time.monotonic() when the rule fired
+            off_time: time.monotonic() when the OFF command completed
+            report: EmergencyReport of the OFF command
+            budget: Trip-time budget in seconds
+            onset_time: time.monotonic() of the first violating sample
+                        (default: the tripping sample)
+            escalation: EmergencyReport of the master OFF sent because the
+                        trip was not confirmed, or None
+        """
+        self.channel = channel
+        self.rule = rule
+        self.voltage = voltage
+        self.current = current
+        self.sample_time = sample_time
+        self.detect_time = detect_time
+        self.off_time = off_time
+        self.report = report
+        self.budget = budget
+        self.onset_time = sample_time if onset_time is None else onset_time
+        self.escalation = escalation
+
+    @property
+    def detect_to_off(self):
+        """Seconds from rule detection to outputs off"""
+        return self.off_time - self.detect_time
+
+    @property
+    def trip_time(self):
+        """Seconds from the tripping sample to outputs off"""
+        return self.off_time - self.sample_time
+
+    @property
+    def onset_to_off(self):
+        """
+        Seconds from the first violating sample to outputs off
+
+        Includes the samples a rule needs to confirm a fault, so it grows
+        with the sampler interval.
+        """
+        return self.off_time - self.onset_time
+
+    @property
+    def within_budget(self):
+        """True if the outputs were confirmed off within the budget"""
+        return self.report.confirmed and self.trip_time <= self.budget
+
+    def __str__(self):
+        status = 'OK' if self.within_budget else 'OVER BUDGET'
+        text = (f"Watchdog trip Ch{self.channel}: {self.rule} "
+                f"({self.voltage:.4f} V, {self.current:.6f} A) - "
+                f"detect-to-off {self.detect_to_off * 1000:.1f} ms, "
+                f"sample-to-off {self.trip_time * 1000:.1f} ms, "
+                f"onset-to-off {self.onset_to_off * 1000:.1f} ms [{status}]")
+        if self.escalation is not None:
+            state = 'confirmed' if self.escalation.confirmed else 'NOT confirmed'
+            text += f"; escalated to master OFF ({state})"
+        return text
+
+
+class Watchdog:
+    """
+    Per-channel trip rule evaluation on a high-priority thread
+    """
+
+    def __init__(self, emergency, budget=0.1, on_trip=None, nice=-10, log=None,
+                 ngx=None):
+        """
+        Args:
+            emergency: EmergencyOff instance used as the trip fast path
+            budget: Trip-time budget in seconds (default: 0.1); also the
+                    bound of the OFF exchange of each trip
+            on_trip: Optional callable receiving each TripEvent (low priority)
+            nice: Nice value for the evaluation thread if real-time
+                  scheduling is not permitted
+            log: EventLog receiving errors (default: event_log.default_log())
+            ngx: Optional NGP800Controller whose intended state records
+                 tripped channels as deselected, and whose session is the
+                 last resort for the master OFF
+        """
+        self.emergency = emergency
+        self.ngx = ngx
+        self.log = log if log is not None else default_log()
+        self.budget = budget
+        self.on_trip = on_trip
+        self.nice = nice
+        self.rules = {}
+        self.tripped = set()
+        self.unconfirmed = set()
+        self.trips = []
+        self.priority = 'normal'
+        self.armed = False
+        self._samples = queue.SimpleQueue()
+        self._events = queue.SimpleQueue()
+        self._threads = []
+
+    def add_rule(self, channel, rule):
+        """
+        Add a trip rule for one channel
+
+        Args:
+            channel: Channel number
+            rule: ThresholdRule, RateRule or any object with check()/reset()
+        """
+        self.rules.setdefault(channel, []).append(rule)
+
+    def set_rules(self, channel, rules):
+        """
+        Replace all trip rules of one channel (e.g. after new setpoints)
+
+        Args:
+            channel: Channel number
+            rules: List of rules; takes effect with the next sample
+        """
+        for rule in rules:
+            rule.reset()
+        self.rules[channel] = list(rules)
+
+    def sample_interval(self):
+        """
+        Slowest sampler interval that keeps fault onset to detection
+        within the budget
+
+        Returns:
+            float: budget divided by the largest samples count of any rule
+        """
+        samples = max((getattr(rule, 'samples', 1) for rules in self.rules.values()
+                       for rule in rules), default=1)
+        return self.budget / samples
+
+    def arm(self):
+        """Start evaluating samples (e.g. after the outputs have settled)"""
+        for rules in self.rules.values():
+            for rule in rules:
+                rule.reset()
+        self.armed = True
+
+    def disarm(self):
+        """Stop evaluating samples (e.g. before switching the outputs off)"""
+        self.armed = False
+
+    def reset(self, channel):
+        """Evaluate a channel again after it was deliberately re-selected"""
+        self.tripped.discard(channel)
+        self.unconfirmed.discard(channel)
+
+    def latch(self, channels):
+        """
+        Stop evaluating channels known to be off (e.g. after an unconfirmed
+        trip, once they were deselected over the main session)
+
+        Args:
+            channels: Channel numbers
+        """
+        self.tripped.update(channels)
+        self.unconfirmed.difference_update(channels)
+
+    def _intend_deselected(self, channels):
+        """Keep a reconnect from re-selecting tripped channels"""
+        if self.ngx is None:
+            return
+        # Without the session lock: a trip never waits for the main session
+        for channel in channels:
+            self.ngx.intended.setdefault(channel, {})['output_select'] = False
+
+    def _escalate(self):
+        """Master OFF after an unconfirmed trip; returns its EmergencyReport"""
+        escalation = self.emergency.trigger()
+        if not escalation.confirmed and self.ngx is not None:
+            try:
+                self.ngx.set_general_output_state(False)
+            except Exception as e:
+                self.log.error('watchdog', "Master OFF over the main session failed: "
+                               "{error}", error=str(e))
+        return escalation
+
+    def feed(self, timestamp, channel, voltage, current):
+        """
+        Sampler sink: queue one sample for evaluation
+
+        Args:
+            timestamp: time.monotonic() of the sample
+            channel: Channel number
+            voltage: Measured voltage in V
+            current: Measured current in A
+        """
+        if self.armed:
+            self._samples.put((timestamp, channel, voltage, current))
+
+    def _raise_priority(self):
+        """Raise the calling thread's priority as far as permitted"""
+        try:
+            os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(10))
+            self.priority = 'SCHED_FIFO'
+            return
+        except (AttributeError, OSError):
+            pass
+        try:
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), self.nice)
+            self.priority = f'nice {self.nice}'
+        except (AttributeError, OSError):
+            pass
+
+    def _evaluate(self, sample):
+        """Return the first rule tripped by a sample, or None"""
+        timestamp, channel, voltage, current = sample
+        if channel in self.tripped:
+            return None
+        for rule in self.rules.get(channel, ()):
+            if rule.check(timestamp, voltage, current):
+                return rule
+        return None
+
+    def _run(self):
+        self._raise_priority()
+        running = True
+        while running:
+            batch = [self._samples.get()]
+            # Collect everything already queued so that channels tripping
+            # in the same sweep are switched off with a single message
+            while True:
+                try:
+                    batch.append(self._samples.get_nowait())
+                except queue.Empty:
+                    break
+            if None in batch:
+                running = False
+                batch = batch[:batch.index(None)]
+            if not self.armed:
+                continue
+
+            hits = {}
+            for sample in batch:
+                rule = self._evaluate(sample)
+                if rule is not None and sample[1] not in hits:
+                    hits[sample[1]] = (rule, sample, time.monotonic(),
+                                       getattr(rule, 'onset', None))
+
+            if hits:
+                report = self.emergency.trip_channels(sorted(hits), timeout=self.budget)
+                off_time = time.monotonic()
+                self._intend_deselected(hits)
+                escalation = None
+                if report.confirmed:
+                    self.latch(hits)
+                else:
+                    # Not known to be off: keep evaluating, switch everything off
+                    self.unconfirmed.update(hits)
+                    escalation = self._escalate()
+                for channel, (rule, hit, detect_time, onset) in hits.items():
+                    event = TripEvent(channel, rule, hit[2], hit[3], hit[0],
+                                      detect_time, off_time, report, self.budget,
+                                      onset, escalation)
+                    self.trips.append(event)
+                    self._events.put(event)
+
+    def _report(self):
+        while True:
+            event = self._events.get()
+            if event is None:
+                break
+            if self.on_trip is not None:
+                try:
+                    self.on_trip(event)
+                except Exception as e:
+                    self.log.warning('watchdog', "Watchdog trip handler error: {error}",
+                                     error=str(e))
+
+    def start(self):
+        """Start the evaluation and reporting threads"""
+        self._threads = [
+            threading.Thread(target=self._run, name='watchdog', daemon=True),
+            threading.Thread(target=self._report, name='watchdog-report',
+                             daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        """Stop both threads"""
+        self.armed = False
+        self._samples.put(None)
+        self._events.put(None)
+        for thread in self._threads:
+            thread.join(timeout=1.0)
+        self._threads = []